@@ -16,6 +16,10 @@ from yotta.lib import access_common
 from yotta.lib import cmakegen
 # Target, , represents an installed target, internal
 from yotta.lib import target
+# dependency_graph, , the resolved graph of dependencies, internal
+from yotta.lib.dependency_graph import DependencyGraph
+# resolution_snapshot, , re-use the dependencies resolved for a build, internal
+from yotta.lib import resolution_snapshot
 # install, , install subcommand, internal
 from yotta import install
 # --config option, , , internal
@@ -23,6 +27,7 @@ from yotta import options
 
 def addOptions(parser, add_build_targets=True):
     options.config.addTo(parser)
+    options.jobs.addTo(parser, short_option=False)
     parser.add_argument('-g', '--generate-only', dest='generate_only',
         action='store_true', default=False,
         help='Only generate CMakeLists, don\'t run CMake or build'
@@ -55,6 +60,10 @@ def installAndBuild(args, following_args):
         Returns {status:0, build_status:0, generate_status:0, install_status:0} on success.
         If status: is nonzero there was some sort of error. Other properties
         are optional, and may not be set if that step was not attempted.
+
+        If dependencies were resolved, graph: is the DependencyGraph
+        (including test dependencies) that was used, so that it can be
+        re-used by subsequent steps (e.g. running tests).
     '''
     build_status = generate_status = install_status = 0
 
@@ -70,16 +79,6 @@ def installAndBuild(args, following_args):
     if not c:
         return {'status':1}
 
-    try:
-        target, errors = c.satisfyTarget(args.target, additional_config=args.config)
-    except access_common.AccessException as e:
-        logging.error(e)
-        return {'status':1}
-    if errors:
-        for error in errors:
-            logging.error(error)
-        return {'status':1}
-
     # run the install command before building, we need to add some options the
     # install command expects to be present to do this:
     vars(args)['component'] = None
@@ -97,17 +96,42 @@ def installAndBuild(args, following_args):
             # That's why this is 'all', and not 'none'.
             vars(args)['install_test_deps'] = 'all'
 
-    # install may exit non-zero for non-fatal errors (such as incompatible
-    # version specs), which it will display
-    install_status = install.execCommand(args, [])
+    # if nothing has changed since the last build, then the target and
+    # dependencies resolved for it can be used without installing or
+    # resolving anything:
+    graph = None
+    snapshot_used = False
+    if args.target:
+        # the installed target is only read here (not installed or updated),
+        # to find the build directory that the snapshot is in:
+        target = c.getTarget(args.target, additional_config=args.config)
+        if target:
+            graph = resolution_snapshot.load(
+                os.path.join(cwd, 'build', target.getName()),
+                c, args.target, args.config, args.install_test_deps
+            )
+    if graph is not None:
+        snapshot_used = True
+        target = graph.target
+    else:
+        try:
+            target, errors = c.satisfyTarget(args.target, additional_config=args.config)
+        except access_common.AccessException as e:
+            logging.error(e)
+            return {'status':1}
+        if errors:
+            for error in errors:
+                logging.error(error)
+            return {'status':1}
+
+        # install may exit non-zero for non-fatal errors (such as incompatible
+        # version specs), which it will display
+        install_status = install.execCommand(args, [])
+
+        graph = DependencyGraph.resolve(c, target, test=True)
 
     builddir = os.path.join(cwd, 'build', target.getName())
-
-    all_deps = c.getDependenciesRecursive(
-                      target = target,
-        available_components = [(c.getName(), c)],
-                        test = True
-    )
+    all_deps = graph.components()
 
     # if a dependency is missing the build will almost certainly fail, so don't try
     missing = 0
@@ -117,7 +141,14 @@ def installAndBuild(args, following_args):
             missing += 1
     if missing:
         logging.error('Missing dependencies prevent build. Use `yotta ls` to list them.')
-        return {'status': 1, 'install_status':install_status, 'missing_status':missing}
+        return {'status': 1, 'install_status':install_status, 'missing_status':missing, 'graph':graph}
+
+    if install_status != 0:
+        resolution_snapshot.discard(builddir)
+    elif not snapshot_used:
+        resolution_snapshot.save(
+            builddir, c, graph, args.target, args.config, args.install_test_deps
+        )
 
     generator = cmakegen.CMakeGen(builddir, target)
     # only pass available dependencies to
@@ -131,7 +162,7 @@ def installAndBuild(args, following_args):
     runScriptWithModules(c, all_deps.values(), 'preGenerate', script_environment)
 
     app = c if len(c.getBinaries()) else None
-    for error in generator.generateRecursive(c, all_deps, builddir, application=app):
+    for error in generator.generateRecursive(c, graph, builddir, application=app):
         logging.error(error)
         generate_status = 1
 
@@ -164,6 +195,7 @@ def installAndBuild(args, following_args):
         'missing_status': missing,
           'build_status': build_status,
        'generate_status': generate_status,
-        'install_status': install_status
+        'install_status': install_status,
+                 'graph': graph
     }
 
@@ -0,0 +1,121 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import logging
+import tempfile
+
+# bundle, , archives of everything needed to install a module, internal
+from yotta.lib import bundle
+# install_plan, , resolve and fetch dependencies in advance, internal
+from yotta.lib import install_plan
+# access_common, , things shared between different component access modules, internal
+from yotta.lib import access_common
+# registry_access, , access packages in the registry, internal
+from yotta.lib import registry_access
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# validate, , validate things, internal
+from yotta.lib import validate
+
+def addOptions(parser):
+    subparser = parser.add_subparsers(metavar='{create, install}', dest='subsubcommand')
+
+    parse_create = subparser.add_parser('create', description=
+        'Install the dependencies of the current module, and write them '+
+        '(and its target) to a single file.'
+    )
+    parse_create.add_argument('path', help='File to write the bundle to.')
+    parse_create.add_argument('targets', nargs='*', default=None,
+        help='Targets to include in the bundle (defaults to the current target).'
+    )
+    parse_create.add_argument('--test-dependencies', dest='install_test_deps',
+        choices=('none', 'all', 'own'), default='own',
+        help='Control the inclusion of dependencies necessary for building tests.'
+    )
+
+    parse_install = subparser.add_parser('install', description=
+        'Install the dependencies of the current module (and its target) '+
+        'from a bundle, without using the network.'
+    )
+    parse_install.add_argument('path', help='Bundle to install from.')
+
+def execCommand(args, following_args):
+    c = validate.currentDirectoryModule()
+    if not c:
+        return 1
+    if args.subsubcommand == 'create':
+        return createBundle(args, c)
+    elif args.subsubcommand == 'install':
+        return installBundle(args, c)
+    logging.error('use `yotta bundle create` or `yotta bundle install`')
+    return 1
+
+def _satisfy(c, target_name, additional_config, install_test_deps):
+    test = {'own':'toplevel', 'all':True, 'none':False}[install_test_deps]
+    target, errors = c.satisfyTarget(target_name, additional_config=additional_config)
+    if errors:
+        return None, None, errors
+    install_plan.fetchAll(c, target=target, test=test)
+    components, errors = c.satisfyDependenciesRecursive(
+                      target = target,
+        available_components = [(c.getName(), c)],
+                        test = test
+    )
+    return target, components, errors
+
+def createBundle(args, c):
+    target_names = args.targets or [args.target]
+    if not all(target_names):
+        logging.error('No target has been set, use "yotta target" to set one.')
+        return 1
+    resolutions = []
+    for target_name in target_names:
+        target, components, errors = _satisfy(c, target_name, args.config, args.install_test_deps)
+        if errors:
+            for error in errors:
+                logging.error(error)
+            return 1
+        resolutions.append((target_name, target, components))
+    added = bundle.create(args.path, c, resolutions, args.install_test_deps)
+    logging.info('wrote %d modules and targets to %s', added, args.path)
+    return 0
+
+def installBundle(args, c):
+    if not args.target:
+        logging.error('No target has been set, use "yotta target" to set one.')
+        return 1
+    temp_directory = tempfile.mkdtemp()
+    try:
+        try:
+            info = bundle.extract(args.path, temp_directory)
+        except bundle.InvalidBundle as e:
+            logging.error(e)
+            return 1
+        if args.target not in info['targets']:
+            logging.error(
+                'the bundle does not include target %s (it includes %s)',
+                args.target, ', '.join(sorted(info['targets'].keys()))
+            )
+            return 1
+        was_offline = access_common.isOffline()
+        registry_access.setSources(bundle.sources(temp_directory))
+        access_common.setOffline(True)
+        try:
+            target, components, errors = _satisfy(c, args.target, args.config, info['test_dependencies'])
+        finally:
+            access_common.setOffline(was_offline or None)
+            registry_access.setSources(None)
+        for error in errors:
+            logging.error(error)
+        if errors:
+            return 1
+        differences = bundle.differences(info, args.target, target, components)
+        for difference in differences:
+            logging.warning(difference)
+        logging.info('installed %s for %s from %s', c.getName(), args.target, args.path)
+        return 0
+    finally:
+        fsutils.rmRf(temp_directory)
@@ -0,0 +1,168 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+from __future__ import print_function
+import logging
+import tempfile
+import shutil
+import time
+import os
+
+# Component, , represents an installed component, internal
+from yotta.lib import component
+# Pack, , common parts of Components/Targets, internal
+from yotta.lib import pack
+# install_plan, , resolve and fetch dependencies in advance, internal
+from yotta.lib import install_plan
+# cache_maintenance, , inspect and maintain the download cache, internal
+from yotta.lib import cache_maintenance
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# validate, , validate things, internal
+from yotta.lib import validate
+# options, , common argument parser options, internal
+from yotta import options
+
+def addOptions(parser):
+    subparser = parser.add_subparsers(metavar='{stats, verify, gc, warm}', dest='subsubcommand')
+
+    parse_stats = subparser.add_parser('stats', description='Display the size of the cache, and how often it has been used by recent commands.')
+    parse_stats.add_argument('--largest', dest='largest', type=int, default=10,
+        help='Number of the largest cache entries to display.'
+    )
+
+    parse_verify = subparser.add_parser('verify', description='Check the hashes of all the cached tarballs.')
+    parse_verify.add_argument('--repair', dest='repair', default=False, action='store_true',
+        help='Remove corrupt entries from the cache, and rebuild the cache index.'
+    )
+    options.jobs.addTo(parse_verify)
+
+    subparser.add_parser('gc', description=
+        'Remove entries from the cache according to the maxCachedModules, '+
+        'maxCacheBytes and cacheEvictionPolicy settings, and clean up files '+
+        'left behind by interrupted commands.'
+    )
+
+    parse_warm = subparser.add_parser('warm', description=
+        'Download all of the dependencies of the current module (and its '+
+        'target) into the cache, without installing them.'
+    )
+    parse_warm.add_argument('--test-dependencies', dest='install_test_deps',
+        choices=('none', 'all', 'own'), default='own',
+        help='Control the inclusion of dependencies necessary for building tests.'
+    )
+    options.jobs.addTo(parse_warm)
+
+    subparser.choices.update({
+        '':subparser.choices['stats'],
+    })
+
+def _formatSize(size):
+    if size is None:
+        return 'unlimited'
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return '%.0f %s' % (size, unit) if unit == 'B' else '%.1f %s' % (size, unit)
+        size /= 1024.0
+    return '%.1f GiB' % size
+
+def execCommand(args, following_args):
+    sc = args.subsubcommand
+    if sc in ('stats', '', None):
+        return displayStatistics(getattr(args, 'largest', 10))
+    elif sc == 'verify':
+        return verifyCache(args.repair)
+    elif sc == 'gc':
+        return collectGarbage()
+    elif sc == 'warm':
+        return warmCache(args)
+
+def displayStatistics(largest):
+    stats = cache_maintenance.statistics(largest)
+    print('%d entries, %s (%s of extracted trees)' % (
+        stats['entries'], _formatSize(stats['bytes']), _formatSize(stats['tree_bytes'])
+    ))
+    print('limits: %s entries, %s, %s eviction' % (
+        stats['max_entries'], _formatSize(stats['max_bytes']), stats['policy']
+    ))
+    if stats['runs']:
+        print('recent commands:')
+        for run in stats['runs']:
+            total = run.get('hits', 0) + run.get('misses', 0)
+            print('  %s: %d hits, %d misses%s, %s downloaded' % (
+                time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run.get('t', 0))),
+                run.get('hits', 0),
+                run.get('misses', 0),
+                (' (%.0f%% hit rate)' % (100.0 * run.get('hits', 0) / total)) if total else '',
+                _formatSize(run.get('downloaded_bytes', 0))
+            ))
+        if stats['hit_rate'] is not None:
+            print('overall hit rate: %.0f%%' % (100.0 * stats['hit_rate']))
+    if stats['largest']:
+        print('largest entries:')
+        for entry in stats['largest']:
+            print('  %10s  %3d hits  %s' % (
+                _formatSize(entry.totalSize()), entry.hits, cache_maintenance.describe(entry.key)
+            ))
+    return 0
+
+def verifyCache(repair):
+    results = cache_maintenance.verify(repair=repair)
+    for key in results['corrupt']:
+        logging.error('corrupt: %s', cache_maintenance.describe(key))
+    for key in results['missing']:
+        logging.warning('missing: %s', key)
+    logging.info(
+        '%d ok, %d corrupt, %d missing, %d without a hash to check',
+        len(results['ok']), len(results['corrupt']), len(results['missing']), len(results['unverifiable'])
+    )
+    if results['corrupt'] and not repair:
+        logging.info('use `yotta cache verify --repair` to remove corrupt entries')
+        return 1
+    return 0
+
+def collectGarbage():
+    removed = cache_maintenance.collectGarbage()
+    logging.info(
+        'evicted %d entries, removed %d temporary files, %d orphaned trees, %d old partial downloads and %d old validation results',
+        removed['evicted'], removed['temporary'], removed['trees'], removed['partial'], removed['validation']
+    )
+    return 0
+
+def warmCache(args):
+    c = validate.currentDirectoryModule()
+    if not c:
+        return 1
+    if not args.target:
+        logging.error('No target has been set, use "yotta target" to set one.')
+        return 1
+    # resolve and fetch everything as if nothing was installed, in a
+    # temporary copy of the module (modules are installed into it from the
+    # cache as they are downloaded, which is cheap)
+    temp_directory = tempfile.mkdtemp()
+    try:
+        for fname in (component.Component_Description_File, pack.Shrinkwrap_Fname):
+            if os.path.isfile(os.path.join(c.path, fname)):
+                shutil.copy(os.path.join(c.path, fname), os.path.join(temp_directory, fname))
+        temp_component = component.Component(temp_directory)
+        target, errors = temp_component.satisfyTarget(args.target, additional_config=args.config)
+        if errors:
+            for error in errors:
+                logging.error(error)
+            return 1
+        test = {'own':'toplevel', 'all':True, 'none':False}[args.install_test_deps]
+        install_plan.fetchAll(temp_component, target=target, test=test)
+        components, errors = temp_component.satisfyDependenciesRecursive(
+                          target = target,
+            available_components = [(temp_component.getName(), temp_component)],
+                            test = test
+        )
+        for error in errors:
+            logging.error(error)
+        logging.info('%d modules and %d targets are in the cache', len(components), len(target.hierarchy))
+        return 1 if errors else 0
+    finally:
+        fsutils.rmRf(temp_directory)
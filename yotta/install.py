@@ -14,6 +14,8 @@ from yotta.lib import component
 from yotta.lib import access
 # access, , get components, internal
 from yotta.lib import access_common
+# install_plan, , resolve and fetch dependencies in advance, internal
+from yotta.lib import install_plan
 
 # folders, , get places to install things, internal
 from yotta.lib import folders
@@ -22,6 +24,7 @@ from yotta import options
 
 def addOptions(parser):
     options.config.addTo(parser)
+    options.jobs.addTo(parser)
     parser.add_argument('component', default=None, nargs='?',
         help='If specified, install this module instead of installing '+
              'the dependencies of the current module.'
@@ -30,6 +33,10 @@ def addOptions(parser):
         choices=('none', 'all', 'own'), default='own',
         help='Control the installation of dependencies necessary for building tests.'
     )
+    parser.add_argument('--plan', dest='plan_only', default=False, action='store_true',
+        help='Resolve the dependencies that would be installed, and display '+
+             'them (and the total download size) without installing anything.'
+    )
     group = parser.add_mutually_exclusive_group()
     group.add_argument('--global', '-g', dest='act_globally', default=False, action='store_true',
         help='Install globally instead of in the current working directory.'
@@ -66,6 +73,12 @@ def checkPrintStatus(errors, components, top_component, target):
     for error in errors:
         logging.error(error)
         status = 1
+    offline_errors = [e for e in errors if isinstance(e, access_common.OfflineUnavailable)]
+    if offline_errors:
+        logging.error(
+            '%d dependencies are not available offline: install them while online first',
+            len(offline_errors)
+        )
     for c in list(components.values()) + [top_component]:
         if c and c.getError():
             logging.error('%s %s', c.getName(), c.getError())
@@ -84,6 +97,35 @@ def checkPrintStatus(errors, components, top_component, target):
     return status
 
 
+def displayPlan(plan):
+    ''' Print the modules that an install plan would download, and the total
+        download size, return nonzero if there were errors resolving the
+        plan.
+    '''
+    status = 0
+    for error in plan.errors:
+        logging.error(error)
+        status = 1
+    total_bytes = 0
+    unknown_size = 0
+    sizes = plan.downloadSizes()
+    for m, size in sizes:
+        if size is None:
+            unknown_size += 1
+            size_str = 'unknown size'
+        else:
+            total_bytes += size
+            size_str = '%s bytes' % size
+        print(u'%s %s %s %s sha256:%s (%s)' % (
+            m.getName(), m.getVersion().friendly_version, m.source(), m.url(), m.sha256(), size_str
+        ))
+    for m in plan.unresolved():
+        print(u'%s: dependencies will be resolved after downloading' % m.getName())
+    print(u'%s modules to download, %s bytes%s' % (
+        len(sizes), total_bytes, (' (+%s of unknown size)' % unknown_size) if unknown_size else ''
+    ))
+    return status
+
 def installDeps(args, current_component):
     # settings, , load and save settings, internal
     from yotta.lib import settings
@@ -114,6 +156,18 @@ def installDeps(args, current_component):
         # module into the global modules dir
         raise NotImplementedError()
     else:
+        test = {'own':'toplevel', 'all':True, 'none':False}[args.install_test_deps]
+        if getattr(args, 'plan_only', False):
+            return displayPlan(install_plan.resolve(
+                current_component, target=target, test=test, traverse_links=True
+            ))
+        # resolve as much of the dependency graph as possible before
+        # downloading anything, then download everything at once. Any errors
+        # here will recur (and be reported) when satisfying the dependencies
+        # below:
+        install_plan.fetchAll(
+            current_component, target=target, test=test, traverse_links=True
+        )
         # satisfyDependenciesRecursive will always prefer to install
         # dependencies in the yotta_modules directory of the top-level module,
         # so it's safe to set traverse_links here when we're only *installing*
@@ -123,7 +177,7 @@ def installDeps(args, current_component):
                           target = target,
                   traverse_links = True,
             available_components = [(current_component.getName(), current_component)],
-                            test = {'own':'toplevel', 'all':True, 'none':False}[args.install_test_deps]
+                            test = test
         )
         return checkPrintStatus(errors, components, current_component, target)
 
@@ -176,11 +230,14 @@ def installComponentAsDependency(args, current_component):
     # !!! should only install dependencies necessary for the one thing that
     # we're installing (but existing components should be made available to
     # satisfy dependencies)
+    test = {'own':'toplevel', 'all':True, 'none':False}[args.install_test_deps]
+    install_plan.fetchAll(
+        current_component, target=target, test=test, traverse_links=False
+    )
     components, errors = current_component.satisfyDependenciesRecursive(
                       target = target,
         available_components = [(current_component.getName(), current_component)],
-                        test = {'own':'toplevel', 'all':True, 'none':False}[args.install_test_deps]
-
+                        test = test
     )
     return checkPrintStatus(errors, components, current_component, target)
 
@@ -21,6 +21,8 @@ from yotta.lib import hg_access
 from yotta.lib import fsutils
 # sourceparse, , parse version source urls, internal
 from yotta.lib import sourceparse
+# module_store, , shared store of installed modules, internal
+from yotta.lib import module_store
 
 # Version requirement strings we want to support:
 #
@@ -58,6 +60,11 @@ def remoteComponentFor(name, version_required, registry='modules'):
             '%s' % (e)
         )
 
+    if vs.source_type != 'registry' and access_common.isOffline():
+        raise access_common.OfflineUnavailable(
+            '%s cannot be fetched from "%s" offline' % (name, version_required)
+        )
+
     if vs.source_type == 'registry':
         if registry not in ('modules', 'targets'):
             raise Exception('no known registry namespace "%s"' % registry)
@@ -108,6 +115,12 @@ def latestSuitableVersion(name, version_required, registry='modules', quiet=Fals
         spec = remote_component.versionSpec()
         v = spec.select(vers)
         logger.debug("%s selected %s from %s", spec, v, vers)
+        if not v and access_common.isOffline():
+            raise access_common.OfflineUnavailable(
+                'No cached version of "%s" from the %s registry matches "%s" (offline)' % (
+                    name, registry, spec
+                )
+            )
         if not v:
             raise access_common.Unavailable(
                 'The %s registry does not provide a version of "%s" matching "%s"' % (
@@ -202,21 +215,28 @@ def latestSuitableVersion(name, version_required, registry='modules', quiet=Fals
     return None
 
 def searchPathsFor(name, spec, search_paths, type='module', inherit_shrinkwrap=None):
-    for path in search_paths:
-        check_path = os.path.join(path, name)
+    cls = _clsForType(type)
+    if hasattr(search_paths, 'candidates'):
+        # (a search_paths.SearchPaths index)
+        check_paths = search_paths.candidates(name)
+    else:
+        check_paths = [os.path.join(path, name) for path in search_paths]
+    for check_path in check_paths:
         logger.debug("check path %s for %s" % (check_path, name))
-        instance = _clsForType(type)(
-                     check_path,
-                   installed_linked = fsutils.isLink(check_path),
-            latest_suitable_version = None,
-                 inherit_shrinkwrap = inherit_shrinkwrap
-        )
-        if instance:
-            logger.debug("got %s v=%s spec %s matches? %s", instance, instance.getVersion(), spec, spec.match(instance.getVersion()))
-            if spec.match(instance.getVersion()):
-                return instance
+        # only read what's needed to check the version of each candidate, and
+        # create the full Component/Target for the one that matches:
+        header = cls.probe(check_path, installed_linked=module_store.isUserLink(check_path))
+        if header:
+            logger.debug("got %s v=%s spec %s matches? %s", header, header.getVersion(), spec, spec.match(header.getVersion()))
+            if spec.match(header.getVersion()):
+                return cls(
+                             check_path,
+                       installed_linked = header.installedLinked(),
+                latest_suitable_version = None,
+                     inherit_shrinkwrap = inherit_shrinkwrap
+                )
         else:
-            logger.debug("got %s", instance)
+            logger.debug("no valid %s at %s", type, check_path)
     return None
 
 def _registryNamespaceForType(type):
@@ -323,9 +343,13 @@ def _satisfyVersionByInstallingVersion(name, version_required, working_directory
         This function is not normally called via `satisfyVersionByInstalling',
         which looks up a suitable remote version object.
     '''
+    # Pack, , base class for targets and components, internal
+    from yotta.lib import pack
+
     assert(version)
     logger.info('download %s', version)
     version.unpackInto(working_directory)
+    pack.invalidate(working_directory)
     r = _clsForType(type)(working_directory, inherit_shrinkwrap = inherit_shrinkwrap)
     if not r:
         raise Exception(
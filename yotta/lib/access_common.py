@@ -10,9 +10,10 @@ import os
 import hashlib
 import tempfile
 import shutil
-import functools
-import random
 import errno
+import stat
+import time
+import threading
 
 # version, , represent versions and specifications, internal
 from yotta.lib import version
@@ -24,10 +25,42 @@ from yotta.lib import folders
 from yotta.lib import ordered_json
 # settings, , load and save settings, internal
 from yotta.lib import settings
+# module_store, , shared store of installed modules, internal
+from yotta.lib import module_store
+# cache_index, , sizes and usage of cached tarballs, internal
+from yotta.lib import cache_index
 
 logger = logging.getLogger('access')
 cache_logger = logging.getLogger('cache')
 
+# extracted trees of cached tarballs are kept in this subdirectory of the
+# cache, so that modules can be installed from the cache without extracting
+# them again
+Trees_Subdirectory = 'trees'
+
+# lock files for each cache key are kept in this subdirectory of the cache.
+# Anything reading a cached tarball (or its tree) holds a shared lock on its
+# key, and anything that adds or removes it holds an exclusive lock, so that
+# any number of yotta processes can share the same cache.
+Locks_Subdirectory = 'locks'
+
+# cached tarballs are stored in subdirectories named by the first characters
+# of their keys (see cache_index.shardFor), so that the cache directory does
+# not become one huge directory. Downloads in progress are kept in the cache
+# directory itself until they are moved to their key.
+
+# arbitrary default limits on the size of the cache:
+Default_Max_Cached_Modules = 400
+Default_Max_Cache_Bytes = 1024 * 1024 * 1024
+Default_Eviction_Policy = 'lru'
+
+# downloads are read in chunks of this size
+Download_Chunk_Size = 64 * 1024
+
+# interrupted downloads (of files with a known hash) are kept in the cache
+# directory with this suffix, so that they can be resumed
+Partial_Suffix = '.partial'
+
 class AccessException(Exception):
     pass
 
@@ -47,6 +80,10 @@ class NotInCache(KeyError):
     pass
 
 
+class OfflineUnavailable(Unavailable):
+    pass
+
+
 class RemoteVersion(version.Version):
     def __init__(self, version_string, url=None, name='unknown', friendly_source='unknown', friendly_version=None):
         self.name = name
@@ -58,6 +95,19 @@ class RemoteVersion(version.Version):
     def unpackInto(self, directory):
         raise NotImplementedError
 
+    def getDescription(self):
+        ''' Return the description (the parsed module.json or target.json
+            file) of this version if it is available without downloading the
+            version, otherwise None.
+        '''
+        return None
+
+    def downloadSize(self):
+        ''' Return the number of bytes that must be downloaded to unpack this
+            version (0 if it is already cached), or None if this is not known.
+        '''
+        return None
+
     def __repr__(self):
         return u'%s@%s from %s' % (self.name, self.friendly_version, self.friendly_source)
     def __str__(self):
@@ -90,16 +140,79 @@ class RemoteComponent(object):
     def remoteType(cls):
         raise NotImplementedError
 
+_offline = None
+def setOffline(offline):
+    ''' Set whether the network may be used (overrides the "offline"
+        setting, unless offline is None).
+    '''
+    global _offline
+    _offline = None if offline is None else bool(offline)
+
+def isOffline():
+    ''' Return True if the network must not be used: modules may only come
+        from the cache, or from what is already installed.
+    '''
+    if _offline is not None:
+        return _offline
+    # settings read from environment variables are strings:
+    offline = settings.get('offline')
+    if hasattr(offline, 'lower'):
+        return offline.lower() in ('1', 'true', 'yes', 'on')
+    return bool(offline)
+
+# cache hits and misses (and bytes downloaded) by this process
+_run_statistics = {'hits': 0, 'misses': 0, 'downloaded_bytes': 0}
+_run_statistics_lock = threading.Lock()
+
+def _countRun(name, n=1):
+    with _run_statistics_lock:
+        _run_statistics[name] += n
+
+def runStatistics():
+    ''' Return a copy of the cache statistics of this process. '''
+    with _run_statistics_lock:
+        return dict(_run_statistics)
+
+def saveRunStatistics():
+    ''' Save the cache statistics of this process (if it used the cache at
+        all), so that they can be displayed by `yotta cache stats`.
+    '''
+    statistics = runStatistics()
+    if not any(statistics.values()):
+        return
+    statistics['t'] = time.time()
+    try:
+        cache_index.recordRun(statistics)
+    except (IOError, OSError) as e:
+        cache_logger.debug('failed to save cache statistics: %s', e)
+
 _max_cached_modules = None
 def getMaxCachedModules():
     global _max_cached_modules
     if _max_cached_modules is None:
         _max_cached_modules = settings.get('maxCachedModules')
         if _max_cached_modules is None:
-            # arbitrary default value
-            _max_cached_modules = 400
+            _max_cached_modules = Default_Max_Cached_Modules
     return _max_cached_modules
 
+def getMaxCacheBytes():
+    max_cache_bytes = settings.get('maxCacheBytes')
+    if max_cache_bytes is None:
+        return Default_Max_Cache_Bytes
+    # settings read from environment variables are strings:
+    try:
+        return int(max_cache_bytes)
+    except (TypeError, ValueError):
+        logger.warning('invalid maxCacheBytes setting "%s" ignored', max_cache_bytes)
+        return Default_Max_Cache_Bytes
+
+def getEvictionPolicy():
+    policy = settings.get('cacheEvictionPolicy') or Default_Eviction_Policy
+    if policy not in ('lru', 'lfu'):
+        logger.warning('unknown cacheEvictionPolicy "%s": using "%s"', policy, Default_Eviction_Policy)
+        return Default_Eviction_Policy
+    return policy
+
 def _encodeCacheKey(cache_key):
     import sys
     # if we're under python 2, and cache_key is unicode (it will be, but check
@@ -109,76 +222,76 @@ def _encodeCacheKey(cache_key):
         return cache_key.encode('ascii')
     return cache_key
 
-def pruneCache():
-    ''' Prune the cache '''
-    cache_dir = folders.cacheDirectory()
-    def fullpath(f):
-        return os.path.join(cache_dir, f)
-    def getMTimeSafe(f):
-        # it's possible that another process removed the file before we stat
-        # it, handle this gracefully
-        try:
-            return os.stat(f).st_mtime
-        except FileNotFoundError:
-            import time
-            return time.clock()
-    # ensure cache exists
-    fsutils.mkDirP(cache_dir)
-    max_cached_modules = getMaxCachedModules()
-    for f in sorted(
-            [f for f in os.listdir(cache_dir) if
-                os.path.isfile(fullpath(f)) and not f.endswith('.json') and not f.endswith('.locked')
-            ],
-            key = lambda f: getMTimeSafe(fullpath(f)),
-            reverse = True
-        )[max_cached_modules:]:
-        cache_logger.debug('cleaning up cache file %s', f)
-        removeFromCache(f)
-    cache_logger.debug('cache pruned to %s items', max_cached_modules)
-
-def sometimesPruneCache(p):
-    ''' return decorator to prune cache after calling fn with a probability of p'''
-    def decorator(fn):
-        @functools.wraps(fn)
-        def wrapped(*args, **kwargs):
-            r = fn(*args, **kwargs)
-            if random.random() < p:
-                pruneCache()
-            return r
-        return wrapped
-    return decorator
+def cachedTarballPath(cache_key):
+    ''' Return the path of the cached tarball cache_key (which may not exist).
+        Its origin information is stored alongside it, with a .json suffix.
+    '''
+    return os.path.join(folders.cacheDirectory(), cache_index.shardFor(cache_key), cache_key)
 
-def unpackFrom(tar_file_path, to_directory):
-    # first unpack into a sibling directory of the specified directory, and
-    # then move it into place.
+def _downloadPath(download_key):
+    return os.path.join(folders.cacheDirectory(), download_key)
 
+def pruneCache(keep=()):
+    ''' Prune the cache to the maxCachedModules and maxCacheBytes settings,
+        removing entries in the order given by the cacheEvictionPolicy
+        setting ("lru" or "lfu"). Entries with keys in keep are not removed.
+    '''
+    evict = cache_index.evictionCandidates(
+        getMaxCachedModules(), getMaxCacheBytes(), getEvictionPolicy(), keep=keep
+    )
+    for cache_key in evict:
+        cache_logger.debug('cleaning up cache entry %s', cache_key)
+        removeFromCache(cache_key)
+    if evict:
+        cache_index.compact()
+    cache_logger.debug(
+        'cache pruned to %s items, %s bytes', *cache_index.totals()
+    )
+
+def _pruneIfNecessary(cache_key):
+    # the index keeps running totals, so this is cheap enough to check every
+    # time something is added to the cache. The entry that was just added is
+    # about to be used, so it is never evicted.
+    if cache_index.exceeds(getMaxCachedModules(), getMaxCacheBytes()):
+        pruneCache(keep=(cache_key,))
+
+def _extractMembers(tf, into_directory):
     # we expect our tarballs to contain a single top-level directory. We strip
     # off this name as we extract to minimise the path length
+    strip_dirname = ''
+    # get the extraction directory name from the first part of the
+    # extraction paths: it should be the same for all members of
+    # the archive. (The members are checked as they are extracted, so that
+    # this works for streams: callers must remove the partially extracted
+    # directory if this fails.)
+    for m in tf:
+        split_path = fsutils.fullySplitPath(m.name)
+        logger.debug('process member: %s %s', m.name, split_path)
+        if os.path.isabs(m.name) or '..' in split_path:
+            raise ValueError('archive uses invalid paths')
+        if not strip_dirname:
+            if len(split_path) != 1 or not len(split_path[0]):
+                raise ValueError('archive does not appear to contain a single module')
+            strip_dirname = split_path[0]
+            continue
+        else:
+            if split_path[0] != strip_dirname:
+                raise ValueError('archive does not appear to contain a single module')
+        m.name = os.path.join(*split_path[1:])
+        tf.extract(m, path=into_directory)
+
+def _extractTarball(tar_file_path, into_directory):
+    with tarfile.open(tar_file_path) as tf:
+        _extractMembers(tf, into_directory)
 
+def unpackFrom(tar_file_path, to_directory):
+    # first unpack into a sibling directory of the specified directory, and
+    # then move it into place.
     into_parent_dir = os.path.dirname(to_directory)
     fsutils.mkDirP(into_parent_dir)
     temp_directory = tempfile.mkdtemp(dir=into_parent_dir)
     try:
-        with tarfile.open(tar_file_path) as tf:
-            strip_dirname = ''
-            # get the extraction directory name from the first part of the
-            # extraction paths: it should be the same for all members of
-            # the archive
-            for m in tf.getmembers():
-                split_path = fsutils.fullySplitPath(m.name)
-                logger.debug('process member: %s %s', m.name, split_path)
-                if os.path.isabs(m.name) or '..' in split_path:
-                    raise ValueError('archive uses invalid paths')
-                if not strip_dirname:
-                    if len(split_path) != 1 or not len(split_path[0]):
-                        raise ValueError('archive does not appear to contain a single module')
-                    strip_dirname = split_path[0]
-                    continue
-                else:
-                    if split_path[0] != strip_dirname:
-                        raise ValueError('archive does not appear to contain a single module')
-                m.name = os.path.join(*split_path[1:])
-                tf.extract(m, path=temp_directory)
+        _extractTarball(tar_file_path, temp_directory)
         # make sure the destination directory doesn't exist:
         fsutils.rmRf(to_directory)
         shutil.move(temp_directory, to_directory)
@@ -194,16 +307,190 @@ def unpackFrom(tar_file_path, to_directory):
             # if anything has failed, cleanup
             fsutils.rmRf(temp_directory)
 
+def _treePath(cache_key):
+    return os.path.join(folders.cacheDirectory(), Trees_Subdirectory, cache_key)
+
+def _makeReadOnly(directory):
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for f in filenames:
+            path = os.path.join(dirpath, f)
+            if not os.path.islink(path):
+                os.chmod(path, os.stat(path).st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+def _cachedTree(cache_key):
+    ''' Return the path of the extracted tree for the cached tarball
+        cache_key, extracting it first if necessary. Raises NotInCache if the
+        tarball is not in the cache.
+    '''
+    tar_file_path = cachedTarballPath(cache_key)
+    if not os.path.isfile(tar_file_path):
+        cache_logger.debug('%s not in cache', cache_key)
+        raise NotInCache('not in cache')
+    tree = _treePath(cache_key)
+    if os.path.isdir(tree):
+        return tree
+    trees_dir = os.path.dirname(tree)
+    fsutils.mkDirP(trees_dir)
+    temp_directory = tempfile.mkdtemp(dir=trees_dir, suffix='.locked')
+    try:
+        try:
+            _extractTarball(tar_file_path, temp_directory)
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                raise NotInCache('not in cache')
+            logger.error('failed to extract tarfile %s', e)
+            fsutils.rmF(tar_file_path)
+            raise
+        _publishTree(cache_key, temp_directory)
+        temp_directory = None
+    finally:
+        if temp_directory is not None:
+            fsutils.rmRf(temp_directory)
+    return tree
+
+def _publishTree(cache_key, temp_directory):
+    ''' Move the tree extracted into temp_directory (in the trees directory of
+        the cache) into place as the tree for cache_key. temp_directory is
+        removed if someone else has already done the same.
+    '''
+    tree = _treePath(cache_key)
+    # trees are shared by everything that is installed from them, so
+    # make sure that they aren't accidentally modified in place
+    _makeReadOnly(temp_directory)
+    tree_size = fsutils.directorySize(temp_directory)
+    try:
+        os.rename(temp_directory, tree)
+    except OSError as e:
+        # someone else extracted the same tree first, which is fine
+        fsutils.rmRf(temp_directory)
+        if not os.path.isdir(tree):
+            raise
+    else:
+        cache_index.recordTree(cache_key, tree_size)
+        _pruneIfNecessary(cache_key)
+
+def _mayModifyItself(tree):
+    ''' Return True if the module (or target) in tree has a postInstall
+        script (which may modify its own files), or if we can't tell.
+    '''
+    for description_file in ('module.json', 'target.json'):
+        description_path = os.path.join(tree, description_file)
+        if not os.path.isfile(description_path):
+            continue
+        try:
+            description = ordered_json.load(description_path)
+        except (IOError, OSError, ValueError):
+            return True
+        if 'postInstall' in (description.get('scripts', None) or {}):
+            return True
+    return False
+
+def _shouldLinkTree(tree):
+    ''' Files from the extracted tree are only hard-linked into place if the
+        "linkFromCache" setting is true (it is off by default, because the
+        linked files are shared with the cache), and the module won't modify
+        itself.
+    '''
+    if not settings.get('linkFromCache'):
+        return False
+    return not _mayModifyItself(tree)
+
+def _materializeTree(tree, to_directory):
+    ''' Recreate the cached tree at to_directory. Files are copied (and are
+        writable), unless _shouldLinkTree allows them to be hard links to
+        the read-only files in the cache: linked files share their inodes
+        with the cache, so editing one in place would change the cached tree
+        for everything else that uses it.
+    '''
+    into_parent_dir = os.path.dirname(to_directory)
+    fsutils.mkDirP(into_parent_dir)
+    temp_directory = tempfile.mkdtemp(dir=into_parent_dir)
+    try:
+        # linkOrCopyTree creates the directory itself
+        os.rmdir(temp_directory)
+        fsutils.linkOrCopyTree(tree, temp_directory, hardlink=_shouldLinkTree(tree))
+        # make sure the destination directory doesn't exist:
+        fsutils.rmRf(to_directory)
+        shutil.move(temp_directory, to_directory)
+        temp_directory = None
+        logger.debug('materialized %s into %s', tree, to_directory)
+    finally:
+        if temp_directory is not None:
+            fsutils.rmRf(temp_directory)
+
+def _discardTree(cache_key):
+    ''' Remove the extracted tree for cache_key, if it exists. It is first
+        moved out of the way, so that it is never seen partially removed.
+    '''
+    tree = _treePath(cache_key)
+    if not os.path.isdir(tree):
+        return
+    temp_directory = tempfile.mkdtemp(dir=os.path.dirname(tree), suffix='.locked')
+    try:
+        os.rename(tree, os.path.join(temp_directory, cache_key))
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+    finally:
+        fsutils.rmRf(temp_directory)
+
 def removeFromCache(cache_key):
-    f = os.path.join(folders.cacheDirectory(), cache_key)
+    ''' Remove cache_key from the cache, unless it is currently being used by
+        another thread or process (in which case it is left alone).
+    '''
+    lock = cacheLock(cache_key)
+    if not lock.acquire(blocking=False):
+        cache_logger.debug('%s is in use, not removed from the cache', cache_key)
+        return
     try:
+        f = cachedTarballPath(cache_key)
+        # remove the tarball first, so that nothing will try to use the
+        # metadata or tree after they've been removed
         fsutils.rmF(f)
-        # remove any metadata too, if it exists
         fsutils.rmF(f + '.json')
+        _discardTree(cache_key)
+        cache_index.recordRemove(cache_key)
+        lock.remove()
     except OSError as e:
         # if we failed to remove either file, then it might be because another
         # instance of yotta is using it, so just skip it this time.
         pass
+    finally:
+        lock.release()
+
+def _removeDownload(download_key):
+    f = _downloadPath(download_key)
+    fsutils.rmF(f)
+    fsutils.rmF(f + '.json')
+
+def cacheLock(cache_key, shared=False):
+    ''' Return a lock (an fsutils.FileLock) on cache_key. '''
+    locks_dir = os.path.join(folders.cacheDirectory(), Locks_Subdirectory)
+    fsutils.mkDirP(locks_dir)
+    return fsutils.FileLock(os.path.join(locks_dir, cache_key + '.lock'), shared=shared)
+
+def cachedOrigins():
+    ''' Return a list of (cache key, origin info) for the cached tarballs
+        that have origin information (the information passed to
+        unpackTarballStream when they were downloaded).
+    '''
+    r = []
+    for entry in sorted(cache_index.entries(), key=lambda e: e.key):
+        path = cachedTarballPath(entry.key)
+        if not os.path.isfile(path):
+            continue
+        try:
+            r.append((entry.key, ordered_json.load(path + '.json')))
+        except (IOError, OSError, ValueError) as e:
+            cache_logger.debug('ignoring unreadable cache metadata %s: %s', entry.key, e)
+    return r
+
+def isInCache(cache_key):
+    ''' Return True if the specified cache key exists in the cache. '''
+    if cache_key is None:
+        return False
+    cache_key = _encodeCacheKey(cache_key)
+    return os.path.isfile(cachedTarballPath(cache_key))
 
 def unpackFromCache(cache_key, to_directory):
     ''' If the specified cache key exists, unpack the tarball into the
@@ -214,14 +501,29 @@ def unpackFromCache(cache_key, to_directory):
 
     cache_key = _encodeCacheKey(cache_key)
 
-    cache_dir = folders.cacheDirectory()
-    fsutils.mkDirP(cache_dir)
-    path = os.path.join(cache_dir, cache_key)
+    path = cachedTarballPath(cache_key)
     logger.debug('attempt to unpack from cache %s -> %s', path, to_directory)
+    if not os.path.isfile(path):
+        cache_logger.debug('%s not in cache', cache_key)
+        raise NotInCache('not in cache')
+    with cacheLock(cache_key, shared=True):
+        _unpackFromCache(cache_key, path, to_directory)
+
+def _unpackFromCache(cache_key, path, to_directory):
     try:
-        unpackFrom(path, to_directory)
+        tree = _cachedTree(cache_key)
+        cache_index.recordHit(cache_key)
+        if module_store.isEnabled() and not _mayModifyItself(tree):
+            module_store.linkInto(cache_key, tree, path + '.json', to_directory)
+            cache_logger.debug('linked %s from the module store into %s', cache_key, to_directory)
+            return
+        _materializeTree(tree, to_directory)
+        origin_path = os.path.join(to_directory, '.yotta_origin.json')
         try:
-            shutil.copy(path + '.json', os.path.join(to_directory, '.yotta_origin.json'))
+            # (the tarball may contain an origin file, which will be
+            # read-only if it was linked from the tree)
+            fsutils.rmF(origin_path)
+            shutil.copy(path + '.json', origin_path)
         except IOError as e:
             if e.errno == errno.ENOENT:
                 pass
@@ -239,11 +541,172 @@ def unpackFromCache(cache_key, to_directory):
         else:
             raise
 
-def _downloadToCache(stream, hashinfo={}, origin_info=dict()):
+def unpackFromCacheOrFetch(cache_key, into_directory, fetch):
+    ''' Unpack cache_key from the cache into into_directory or, if it is not
+        in the cache, call fetch() to download it (using unpackTarballStream
+        with the same cache_key).
+
+        fetch is called with the exclusive lock on cache_key held, so when
+        several threads or invocations of yotta need the same thing at once
+        only one downloads it, and the others then unpack it from the cache.
+    '''
+    try:
+        unpackFromCache(cache_key, into_directory)
+        _countRun('hits')
+        return
+    except NotInCache as e:
+        if cache_key is None or getMaxCachedModules() == 0:
+            _countRun('misses')
+            return fetch()
+    cache_key = _encodeCacheKey(cache_key)
+    with cacheLock(cache_key):
+        try:
+            unpackFromCache(cache_key, into_directory)
+            cache_logger.debug('%s was added to the cache while waiting for it', cache_key)
+            _countRun('hits')
+            return
+        except NotInCache as e:
+            pass
+        _countRun('misses')
+        return fetch()
+
+class PartialDownload(object):
+    ''' The part of a file that has been downloaded so far, kept so that if
+        the download is interrupted it can be resumed (with a Range request)
+        instead of starting again. Partial downloads are identified by the URL
+        and the expected sha256 hash of the file.
+    '''
+    def __init__(self, url, sha256):
+        self.key = hashlib.sha256(('%s\n%s' % (url, sha256)).encode('utf-8')).hexdigest() + Partial_Suffix
+        self.path = _downloadPath(self.key)
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                return 0
+            raise
+
+    def discard(self):
+        _removeDownload(self.key)
+
+    def rangeHeaders(self):
+        ''' Return the headers to request the rest of the file. '''
+        size = self.size()
+        if size:
+            return {'Range': 'bytes=%d-' % size}
+        return {}
+
+    def resumedBy(self, response):
+        ''' Return True if response (to a request with rangeHeaders()) is the
+            rest of the file. Otherwise the partial download is discarded,
+            and it will be started again from the beginning.
+        '''
+        size = self.size()
+        if size and response.status_code == 206 and \
+           response.headers.get('Content-Range', '').startswith('bytes %d-' % size):
+            logger.info('resuming download after %s bytes', size)
+            return True
+        self.discard()
+        return False
+
+def partialDownload(url, sha256):
+    ''' Return the PartialDownload for url, or None if downloads of url can't
+        be resumed (because its hash isn't known, or the cache is disabled).
+    '''
+    if not sha256 or getMaxCachedModules() == 0:
+        return None
+    return PartialDownload(url, sha256)
+
+
+class _TeeReader(object):
+    ''' A file-like object that reads a streaming response, writing what is
+        read to a file and adding it to a hash as it goes, so that a tarball
+        can be extracted while it is downloaded.
+
+        If prefix is not None it is a file whose first prefix_size bytes are
+        the start of the response, which was downloaded previously: they are
+        read (but not written) first.
+    '''
+    def __init__(self, stream, f, hasher, prefix=None, prefix_size=0):
+        self.chunks = stream.iter_content(Download_Chunk_Size)
+        self.f = f
+        self.hasher = hasher
+        self.prefix = prefix
+        self.prefix_remaining = prefix_size
+        self.size = 0
+        self.chunk = b''
+        self.offset = 0
+        # set if reading the stream itself fails (rather than something
+        # done with what was read)
+        self.interrupted = False
+
+    def _nextChunk(self):
+        if self.prefix_remaining:
+            chunk = self.prefix.read(min(Download_Chunk_Size, self.prefix_remaining))
+            if not chunk:
+                raise IOError('partial download was truncated')
+            self.prefix_remaining -= len(chunk)
+            if self.hasher is not None:
+                self.hasher.update(chunk)
+            self.size += len(chunk)
+            return chunk
+        while True:
+            try:
+                chunk = next(self.chunks, None)
+            except Exception:
+                self.interrupted = True
+                raise
+            if chunk is None:
+                return b''
+            if not chunk:
+                continue
+            self.f.write(chunk)
+            if self.hasher is not None:
+                self.hasher.update(chunk)
+            self.size += len(chunk)
+            return chunk
+
+    def read(self, size=-1):
+        parts = []
+        while size != 0:
+            if self.offset == len(self.chunk):
+                self.chunk = self._nextChunk()
+                self.offset = 0
+                if not self.chunk:
+                    break
+            end = len(self.chunk) if size < 0 else min(len(self.chunk), self.offset + size)
+            parts.append(self.chunk[self.offset:end])
+            if size > 0:
+                size -= end - self.offset
+            self.offset = end
+        return b''.join(parts)
+
+    def drain(self):
+        ''' Read (and write, and hash) the rest of the stream. '''
+        self.chunk = b''
+        self.offset = 0
+        while self._nextChunk():
+            pass
+
+
+def _downloadToCache(stream, hashinfo={}, origin_info=dict(), extract_into=None, partial=None):
     ''' Download the specified stream to a temporary cache directory, and
         returns a cache key that can be used to access/remove the file.
-        You should use either removeFromCache(cache_key) or _moveCachedFile to
+        You should use either _removeDownload(cache_key) or _moveCachedFile to
         move the downloaded file to a known key after downloading.
+
+        If extract_into is not None the tarball is also extracted into that
+        (empty) directory as it is downloaded, so that it doesn't have to be
+        read back from disk. If anything fails (including checking the hash)
+        the downloaded file is removed, and the caller must remove
+        extract_into.
+
+        If partial (a PartialDownload) is not None then stream must be the
+        rest of the file that it contains (or all of it, if it is empty). If
+        reading the stream fails what has been downloaded is kept in partial,
+        so that the download can be resumed.
     '''
     hash_name  = None
     hash_value = None
@@ -266,48 +729,73 @@ def _downloadToCache(stream, hashinfo={}, origin_info=dict()):
     fsutils.mkDirP(cache_dir)
     file_size = 0
 
-    (download_file, download_fname) = tempfile.mkstemp(dir=cache_dir, suffix='.locked')
+    prefix = None
+    prefix_size = 0
+    if partial is None:
+        (download_file, download_fname) = tempfile.mkstemp(dir=cache_dir, suffix='.locked')
+        download_file = os.fdopen(download_file, 'wb')
+    else:
+        download_fname = partial.path
+        download_file = open(download_fname, 'ab')
+        prefix_size = partial.size()
+        if prefix_size:
+            prefix = open(download_fname, 'rb')
+    reader = None
+    try:
+        with download_file as f:
+            reader = _TeeReader(stream, f, m, prefix, prefix_size)
+            if extract_into is not None:
+                # (the compression is detected from the stream)
+                with tarfile.open(fileobj=reader, mode='r|*', bufsize=Download_Chunk_Size) as tf:
+                    _extractMembers(tf, extract_into)
+            # read anything after the end of the archive (or everything if
+            # it isn't being extracted), so that it is all hashed
+            reader.drain()
 
-    with os.fdopen(download_file, 'wb') as f:
-        f.seek(0)
-        for chunk in stream.iter_content(4096):
-            f.write(chunk)
             if hash_name:
-                m.update(chunk)
-
-        if hash_name:
-            calculated_hash = m.hexdigest()
-            logger.debug(
-                'calculated %s hash: %s check against: %s' % (
-                    hash_name, calculated_hash, hash_value
+                calculated_hash = m.hexdigest()
+                logger.debug(
+                    'calculated %s hash: %s check against: %s' % (
+                        hash_name, calculated_hash, hash_value
+                    )
                 )
-            )
-            if hash_value and (hash_value != calculated_hash):
-                raise Exception('Hash verification failed.')
-        file_size = f.tell()
-        logger.debug('wrote tarfile of size: %s to %s', file_size, download_fname)
-        f.truncate()
-
-    extended_origin_info = {
-        'hash': hashinfo,
-        'size': file_size
-    }
-    extended_origin_info.update(origin_info)
-    ordered_json.dump(download_fname + '.json', extended_origin_info)
+                if hash_value and (hash_value != calculated_hash):
+                    raise Exception('Hash verification failed.')
+            file_size = reader.size
+            logger.debug('wrote tarfile of size: %s to %s', file_size, download_fname)
+            _countRun('downloaded_bytes', file_size - prefix_size)
+
+        extended_origin_info = {
+            'hash': hashinfo,
+            'size': file_size
+        }
+        extended_origin_info.update(origin_info)
+        ordered_json.dump(download_fname + '.json', extended_origin_info)
+    except:
+        if partial is not None and reader is not None and reader.interrupted:
+            logger.debug('keeping %s bytes of interrupted download %s', partial.size(), download_fname)
+        else:
+            fsutils.rmF(download_fname)
+            fsutils.rmF(download_fname + '.json')
+        raise
+    finally:
+        if prefix is not None:
+            prefix.close()
     return os.path.basename(download_fname)
 
 def _moveCachedFile(from_key, to_key):
     ''' Move a file atomically within the cache: used to make cached files
         available at known keys, so they can be used by other processes.
     '''
-    cache_dir = folders.cacheDirectory()
-    from_path = os.path.join(cache_dir, from_key)
-    to_path   = os.path.join(cache_dir, to_key)
+    from_path = _downloadPath(from_key)
+    to_path   = cachedTarballPath(to_key)
     try:
+        fsutils.mkDirP(os.path.dirname(to_path))
+        # move the metadata first: the tarball existing is what makes the
+        # key available, and it must have its metadata when it does
+        if os.path.isfile(from_path + '.json'):
+            os.rename(from_path+'.json', to_path+'.json')
         os.rename(from_path, to_path)
-        # if moving the actual file was successful, then try to move the
-        # metadata:
-        os.rename(from_path+'.json', to_path+'.json')
     except Exception as e:
         # if the source doesn't exist, or the destination doesn't exist, remove
         # the file instead.
@@ -317,15 +805,21 @@ def _moveCachedFile(from_key, to_key):
         if (isinstance(e, OSError) and e.errno == errno.ENOENT) or \
            (isinstance(e, getattr(__builtins__, "WindowsError", type(None))) and e.errno == 183):
             fsutils.rmF(from_path)
+            fsutils.rmF(from_path + '.json')
         else:
             raise
 
-@sometimesPruneCache(0.05)
-def unpackTarballStream(stream, into_directory, hash={}, cache_key=None, origin_info=dict()):
+def unpackTarballStream(stream, into_directory, hash={}, cache_key=None, origin_info=dict(), partial=None):
     ''' Unpack a responses stream that contains a tarball into a directory. If
         a hash is provided, then it will be used as a cache key (for future
         requests you can try to retrieve the key value from the cache first,
         before making the request)
+
+        If partial (see partialDownload) is not None the stream is the rest
+        of what has already been downloaded to it, and if the stream is
+        interrupted then what was downloaded is kept there. It must only be
+        used with the cache lock for cache_key held (see
+        unpackFromCacheOrFetch).
     '''
     cache_key = _encodeCacheKey(cache_key)
 
@@ -335,14 +829,48 @@ def unpackTarballStream(stream, into_directory, hash={}, cache_key=None, origin_
     if getMaxCachedModules() == 0:
         cache_key = None
 
-    new_cache_key = _downloadToCache(stream, hash, origin_info)
-    unpackFromCache(new_cache_key, into_directory)
-
     if cache_key is None:
-        # if we didn't provide a cache key, there's no point in storing the cache
-        removeFromCache(new_cache_key)
-    else:
-        # otherwise make this file available at the known cache key
-        _moveCachedFile(new_cache_key, cache_key)
-
+        # if we didn't provide a cache key, there's no point in storing the
+        # cache (or an extracted tree), so extract directly next to the
+        # destination and then move it into place
+        into_parent_dir = os.path.dirname(into_directory)
+        fsutils.mkDirP(into_parent_dir)
+        temp_directory = tempfile.mkdtemp(dir=into_parent_dir)
+        try:
+            download_key = _downloadToCache(stream, hash, origin_info, extract_into=temp_directory, partial=partial)
+            try:
+                shutil.copy(_downloadPath(download_key) + '.json', os.path.join(temp_directory, '.yotta_origin.json'))
+            finally:
+                _removeDownload(download_key)
+            # make sure the destination directory doesn't exist:
+            fsutils.rmRf(into_directory)
+            shutil.move(temp_directory, into_directory)
+            temp_directory = None
+            logger.debug('extraction complete %s', into_directory)
+        finally:
+            if temp_directory is not None:
+                fsutils.rmRf(temp_directory)
+        return
 
+    # otherwise extract the tree in the cache while downloading, then make
+    # the file and its tree available at the known cache key (replacing any
+    # tree extracted from a previous file with the same key), and unpack it
+    # from there
+    trees_dir = os.path.dirname(_treePath(cache_key))
+    fsutils.mkDirP(trees_dir)
+    temp_tree = tempfile.mkdtemp(dir=trees_dir, suffix='.locked')
+    try:
+        download_key = _downloadToCache(stream, hash, origin_info, extract_into=temp_tree, partial=partial)
+        with cacheLock(cache_key):
+            _discardTree(cache_key)
+            size = os.path.getsize(_downloadPath(download_key))
+            _moveCachedFile(download_key, cache_key)
+            if os.path.isfile(cachedTarballPath(cache_key)):
+                cache_index.recordAdd(cache_key, size)
+                _publishTree(cache_key, temp_tree)
+                temp_tree = None
+                _pruneIfNecessary(cache_key)
+            unpackFromCache(cache_key, into_directory)
+    finally:
+        if temp_tree is not None:
+            fsutils.rmRf(temp_tree)
@@ -0,0 +1,175 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import os
+import logging
+import tarfile
+import tempfile
+
+# Ordered JSON, , read & write json, internal
+from yotta.lib import ordered_json
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# directory_source, , directories used as registries, internal
+from yotta.lib import directory_source
+# registry_access, , access packages in the registry, internal
+from yotta.lib import registry_access
+
+# A bundle is a single (uncompressed) tar archive of a directory source (see
+# directory_source) holding every module and target needed to install a
+# module for one or more targets, along with a description of how they were
+# resolved:
+#
+#   bundle.json
+#   <modules|targets>/<name>/versions/<version>/tarball
+#   <modules|targets>/<name>/versions/<version>/version.json
+#
+# where bundle.json is:
+#
+#   {
+#     "format": 1,
+#     "module": {"name": ..., "version": ...},
+#     "test_dependencies": "own"|"all"|"none",
+#     "targets": {
+#       "<target as specified>": {
+#         "hierarchy": [{"name": ..., "version": ...}, ...],
+#         "modules": {"<name>": "<version>", ...}
+#       }
+#     }
+#   }
+#
+# Installing from a bundle uses it as the only (authoritative) source of
+# modules and targets, with network access disabled.
+
+Bundle_Info_Fname = 'bundle.json'
+Bundle_Format = 1
+
+logger = logging.getLogger('bundle')
+
+class InvalidBundle(Exception):
+    pass
+
+def _versionInfo(pack):
+    return {'name': pack.getName(), 'version': str(pack.getVersion())}
+
+def create(path, top_component, resolutions, test_dependencies='own'):
+    ''' Write a bundle to path.
+
+        resolutions is a list of (target name, DerivedTarget, components)
+        where components is the {name: Component} dictionary of the
+        dependencies of top_component that were resolved for that target
+        (as returned by satisfyDependenciesRecursive). The top-level
+        component itself is not included in the bundle.
+
+        test_dependencies is the --test-dependencies option the dependencies
+        were resolved with, which is used again when installing.
+
+        Returns the number of module and target versions in the bundle.
+    '''
+    path = os.path.abspath(os.path.expanduser(path))
+    temp_directory = tempfile.mkdtemp()
+    try:
+        info = {
+            'format': Bundle_Format,
+            'module': _versionInfo(top_component),
+            'test_dependencies': test_dependencies,
+            'targets': {}
+        }
+        added = 0
+        for target_name, target, components in resolutions:
+            modules = {}
+            for name, c in components.items():
+                if name == top_component.getName():
+                    continue
+                if directory_source.add(temp_directory, 'modules', c):
+                    added += 1
+                modules[name] = str(c.getVersion())
+            for t in target.hierarchy:
+                if directory_source.add(temp_directory, 'targets', t):
+                    added += 1
+            info['targets'][target_name] = {
+                'hierarchy': [_versionInfo(t) for t in target.hierarchy],
+                  'modules': modules
+            }
+        ordered_json.dump(os.path.join(temp_directory, Bundle_Info_Fname), info)
+
+        fsutils.mkDirP(os.path.dirname(path))
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.locked')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                with tarfile.open(fileobj=f, mode='w') as tf:
+                    # bundle.json first, so that it can be read without
+                    # reading the whole bundle:
+                    tf.add(os.path.join(temp_directory, Bundle_Info_Fname), Bundle_Info_Fname)
+                    for namespace in ('modules', 'targets'):
+                        if os.path.isdir(os.path.join(temp_directory, namespace)):
+                            tf.add(os.path.join(temp_directory, namespace), namespace)
+            os.chmod(temp_path, 0o644)
+            fsutils.rmF(path)
+            os.rename(temp_path, path)
+        except:
+            fsutils.rmF(temp_path)
+            raise
+        return added
+    finally:
+        fsutils.rmRf(temp_directory)
+
+def extract(path, into_directory):
+    ''' Extract the bundle at path into into_directory, and return its
+        description (the contents of bundle.json).
+    '''
+    try:
+        tf = tarfile.open(path, mode='r')
+    except (IOError, OSError, tarfile.TarError) as e:
+        raise InvalidBundle('%s could not be read: %s' % (path, e))
+    with tf:
+        for member in tf:
+            name = os.path.normpath(member.name)
+            if os.path.isabs(name) or name.split(os.sep)[0] == '..' or \
+               not (member.isfile() or member.isdir()):
+                raise InvalidBundle('%s contains an invalid file: %s' % (path, member.name))
+            tf.extract(member, into_directory)
+    try:
+        info = ordered_json.load(os.path.join(into_directory, Bundle_Info_Fname))
+    except (IOError, OSError, ValueError) as e:
+        raise InvalidBundle('%s is not a bundle: %s' % (path, e))
+    if info.get('format', None) != Bundle_Format or 'targets' not in info:
+        raise InvalidBundle('%s has an unsupported format (%s)' % (path, info.get('format', None)))
+    info.setdefault('test_dependencies', 'own')
+    return info
+
+def sources(directory):
+    ''' Return the "sources" setting to use when installing from a bundle
+        extracted into directory: the public registry is only listed so that
+        it is never preferred over the bundle.
+    '''
+    return [
+        {'type': 'directory', 'path': directory, 'policy': 'authoritative'},
+        {'type': 'registry', 'url': registry_access.Registry_Base_URL, 'policy': 'fallback-only'}
+    ]
+
+def differences(info, target_name, target, components):
+    ''' Return a list of descriptions of the differences between what was
+        installed for target_name, and what was resolved when the bundle
+        was created.
+    '''
+    if target_name not in info['targets']:
+        return ['the bundle was not created for target %s' % target_name]
+    expected = info['targets'][target_name]
+    r = []
+    hierarchy = [_versionInfo(t) for t in target.hierarchy]
+    if hierarchy != expected['hierarchy']:
+        r.append('target hierarchy is %s, expected %s' % (
+            ', '.join('%s@%s' % (t['name'], t['version']) for t in hierarchy),
+            ', '.join('%s@%s' % (t['name'], t['version']) for t in expected['hierarchy'])
+        ))
+    for name, version in sorted(expected['modules'].items()):
+        c = components.get(name, None)
+        if not c:
+            r.append('%s is not installed' % name)
+        elif str(c.getVersion()) != version:
+            r.append('%s@%s is installed, expected %s' % (name, c.getVersion(), version))
+    return r
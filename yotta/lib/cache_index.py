@@ -0,0 +1,448 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import os
+import json
+import time
+import errno
+import logging
+import tempfile
+import threading
+
+# folders, , where yotta stores things, internal
+from yotta.lib import folders
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+
+# The index of the download cache records the size, last access time and
+# number of hits of each cached tarball (and its extracted tree), so that the
+# cache can be pruned to a size limit without listing and stat-ing every file
+# in it.
+#
+# The index is an append-only journal of JSON lines in the cache directory,
+# which any number of yotta processes may append to. Each process replays the
+# journal once, and then only reads what other processes have appended since,
+# so keeping it up to date is cheap. The journal is compacted (atomically
+# replaced by one line per entry) when it grows much larger than the number
+# of entries, and after the cache has been pruned.
+#
+# Appending to the journal and compacting it are done with the lock file of
+# the index held, so that compaction can't lose records appended by others.
+#
+# The index is only used to decide what to evict: an entry that is missing
+# from it is never evicted, and an entry that is in it but whose files have
+# already been removed is harmless. If the journal is deleted it is rebuilt by
+# scanning the cache directory.
+
+Index_Fname = 'index'
+Index_Lock_Fname = 'index.lock'
+
+# a summary of the cache hits and misses of each recent invocation of yotta is
+# kept in this file (see recordRun):
+Runs_Fname = 'runs'
+Recent_Runs = 20
+
+# files in the cache that aren't (complete) cached tarballs: metadata,
+# downloads in progress, and interrupted downloads
+Not_Tarball_Suffixes = ('.json', '.locked', '.partial')
+
+# compact the journal when it has this many times more lines than entries:
+Compact_Factor = 4
+Compact_Min_Lines = 256
+
+logger = logging.getLogger('cache')
+
+# private state
+_lock = threading.Lock()
+_state = {
+    'directory': None,
+    'inode': None,
+    'offset': 0,
+    'lines': 0,
+    'entries': {},
+    'total_bytes': 0
+}
+
+class Entry(object):
+    def __init__(self, key, size=0, tree_size=0, last_access=0, hits=0):
+        self.key = key
+        self.size = size
+        self.tree_size = tree_size
+        self.last_access = last_access
+        self.hits = hits
+
+    def totalSize(self):
+        return self.size + self.tree_size
+
+    def __repr__(self):
+        return '<cache entry %s: %s bytes, %s hits, last used %s>' % (
+            self.key, self.totalSize(), self.hits, self.last_access
+        )
+
+
+class _IndexLock(object):
+    ''' Hold the lock on this process's copy of the index, and the lock file
+        of the journal.
+    '''
+    def __enter__(self):
+        _lock.acquire()
+        try:
+            cache_dir = folders.cacheDirectory()
+            fsutils.mkDirP(cache_dir)
+            self.file_lock = fsutils.FileLock(os.path.join(cache_dir, Index_Lock_Fname))
+            self.file_lock.acquire()
+        except:
+            _lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.file_lock.release()
+        finally:
+            _lock.release()
+
+
+def indexPath():
+    return os.path.join(folders.cacheDirectory(), Index_Fname)
+
+def shardFor(cache_key):
+    ''' Return the subdirectory of the cache that cache_key is stored in. '''
+    return cache_key[:2]
+
+def _apply(record):
+    entries = _state['entries']
+    op = record.get('op')
+    key = record.get('key')
+    if not key:
+        return
+    entry = entries.get(key, None)
+    if entry is not None:
+        _state['total_bytes'] -= entry.totalSize()
+    if op == 'rm':
+        entries.pop(key, None)
+        return
+    if entry is None:
+        if op == 'hit':
+            # the entry was added by a process whose record was lost: we
+            # don't know its size, so it is left out of the index
+            return
+        entry = Entry(key)
+        entries[key] = entry
+    t = record.get('t', 0)
+    if op == 'add':
+        entry.size = record.get('size', 0)
+        entry.tree_size = 0
+        entry.hits = record.get('hits', 0)
+        entry.last_access = t
+    elif op == 'tree':
+        entry.tree_size = record.get('size', 0)
+    elif op == 'hit':
+        entry.hits += 1
+        entry.last_access = max(entry.last_access, t)
+    _state['total_bytes'] += entry.totalSize()
+
+def _reset(directory):
+    _state['directory'] = directory
+    _state['inode'] = None
+    _state['offset'] = 0
+    _state['lines'] = 0
+    _state['entries'] = {}
+    _state['total_bytes'] = 0
+
+def _readFrom(f):
+    f.seek(_state['offset'])
+    data = f.read()
+    # ignore anything after the last complete line: it is either being
+    # written right now, or was left by a process that was killed
+    end = data.rfind(b'\n') + 1
+    for line in data[:end].splitlines():
+        _state['lines'] += 1
+        try:
+            _apply(json.loads(line.decode('utf-8')))
+        except (ValueError, AttributeError) as e:
+            logger.debug('ignoring invalid cache index record %r', line)
+    _state['offset'] += end
+
+def _refresh():
+    ''' Bring the in-memory index up to date with the journal. Must be called
+        with _IndexLock held.
+    '''
+    directory = folders.cacheDirectory()
+    if _state['directory'] != directory:
+        _reset(directory)
+    path = indexPath()
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        _rebuild()
+        st = os.stat(path)
+    if st.st_ino != _state['inode'] or st.st_size < _state['offset']:
+        # the journal was compacted (or replaced) by someone else
+        _reset(directory)
+        _state['inode'] = st.st_ino
+    if st.st_size > _state['offset']:
+        with open(path, 'rb') as f:
+            _readFrom(f)
+
+def _append(record):
+    ''' Append a record to the journal. Must be called with _IndexLock held. '''
+    line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+    # each record is a single small write to a file opened for appending, so
+    # records from different processes are not interleaved
+    fd = os.open(indexPath(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+def _write(records):
+    ''' Atomically replace the journal with records. Must be called with
+        _IndexLock held.
+    '''
+    cache_dir = folders.cacheDirectory()
+    fsutils.mkDirP(cache_dir)
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.locked')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for record in records:
+                f.write((json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8'))
+        os.chmod(temp_path, 0o644)
+        try:
+            os.rename(temp_path, indexPath())
+        except OSError as e:
+            # windows can't rename over an existing file
+            if e.errno != errno.EEXIST:
+                raise
+            fsutils.rmF(indexPath())
+            os.rename(temp_path, indexPath())
+    except:
+        fsutils.rmF(temp_path)
+        raise
+
+def _entryRecords(entries):
+    r = []
+    for entry in entries:
+        r.append({'op':'add', 'key':entry.key, 'size':entry.size, 'hits':entry.hits, 't':entry.last_access})
+        if entry.tree_size:
+            r.append({'op':'tree', 'key':entry.key, 'size':entry.tree_size})
+    return r
+
+def _scanEntries(cache_dir, trees_subdirectory):
+    ''' Scan the cache directory for cached tarballs, moving any that are
+        stored in the cache directory itself (by versions of yotta before the
+        cache was sharded) into their shard.
+    '''
+    entries = []
+    try:
+        names = os.listdir(cache_dir)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return entries
+        raise
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        if len(name) == 2 and os.path.isdir(path):
+            for f in os.listdir(path):
+                if not f.endswith(Not_Tarball_Suffixes):
+                    entries.append((f, os.path.join(path, f)))
+        elif name not in (Index_Fname, Index_Lock_Fname, Runs_Fname) and \
+             not name.endswith(Not_Tarball_Suffixes) and os.path.isfile(path):
+            shard_dir = os.path.join(cache_dir, shardFor(name))
+            fsutils.mkDirP(shard_dir)
+            try:
+                os.rename(path, os.path.join(shard_dir, name))
+                if os.path.isfile(path + '.json'):
+                    os.rename(path + '.json', os.path.join(shard_dir, name + '.json'))
+            except OSError as e:
+                logger.debug('failed to move %s into the sharded cache: %s', name, e)
+                continue
+            entries.append((name, os.path.join(shard_dir, name)))
+    r = []
+    for key, path in entries:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        r.append(Entry(
+                    key = key,
+                   size = st.st_size,
+              tree_size = fsutils.directorySize(os.path.join(cache_dir, trees_subdirectory, key)),
+            last_access = st.st_mtime
+        ))
+    return r
+
+def _rebuild():
+    ''' Rebuild the journal by scanning the cache directory. Must be called
+        with _IndexLock held.
+    '''
+    # avoid a circular import: access_common owns the cache layout
+    from yotta.lib import access_common
+    cache_dir = folders.cacheDirectory()
+    logger.debug('rebuilding cache index for %s', cache_dir)
+    entries = _scanEntries(cache_dir, access_common.Trees_Subdirectory)
+    _write(_entryRecords(entries))
+    _reset(cache_dir)
+
+def _maybeCompact():
+    ''' Compact the journal if it is much longer than necessary. Must be
+        called with _IndexLock held.
+    '''
+    if _state['lines'] > max(Compact_Min_Lines, Compact_Factor * len(_state['entries'])):
+        _compact()
+
+def _compact():
+    _refresh()
+    logger.debug('compacting cache index: %s lines, %s entries', _state['lines'], len(_state['entries']))
+    entries = list(_state['entries'].values())
+    _write(_entryRecords(entries))
+    _reset(folders.cacheDirectory())
+    _refresh()
+
+def _record(record):
+    with _IndexLock():
+        _refresh()
+        _append(record)
+        _refresh()
+        _maybeCompact()
+
+def recordAdd(cache_key, size):
+    ''' Record that a tarball of size bytes was added to the cache. '''
+    _record({'op':'add', 'key':cache_key, 'size':size, 't':time.time()})
+
+def recordTree(cache_key, size):
+    ''' Record that the tree of a cached tarball was extracted, using size
+        bytes.
+    '''
+    _record({'op':'tree', 'key':cache_key, 'size':size})
+
+def recordHit(cache_key):
+    ''' Record that a cached tarball was used. '''
+    _record({'op':'hit', 'key':cache_key, 't':time.time()})
+
+def recordRemove(cache_key):
+    ''' Record that a tarball was removed from the cache. '''
+    with _IndexLock():
+        _refresh()
+        # (temporary downloads are never indexed)
+        if cache_key in _state['entries']:
+            _append({'op':'rm', 'key':cache_key})
+            _refresh()
+
+def entries():
+    ''' Return a list of the indexed cache entries. '''
+    with _IndexLock():
+        _refresh()
+        return list(_state['entries'].values())
+
+def totals():
+    ''' Return (number of entries, total bytes) of the indexed cache. '''
+    with _IndexLock():
+        _refresh()
+        return (len(_state['entries']), _state['total_bytes'])
+
+def exceeds(max_entries, max_bytes):
+    ''' Return True if the cache is larger than either limit (None means no
+        limit).
+    '''
+    count, total_bytes = totals()
+    return (max_entries is not None and count > max_entries) or \
+           (max_bytes is not None and total_bytes > max_bytes)
+
+def evictionCandidates(max_entries, max_bytes, policy='lru', keep=()):
+    ''' Return the keys that should be removed (in order) to bring the cache
+        within max_entries entries and max_bytes bytes (None means no limit),
+        without removing any of the keys in keep.
+
+        The policy is either 'lru' (evict the least recently used entries
+        first), or 'lfu' (evict the least frequently used entries first, and
+        the least recently used of those with the same number of hits).
+    '''
+    if policy == 'lfu':
+        sort_key = lambda e: (e.hits, e.last_access)
+    elif policy == 'lru':
+        sort_key = lambda e: e.last_access
+    else:
+        raise ValueError('unknown cache eviction policy "%s"' % policy)
+    with _IndexLock():
+        _refresh()
+        count = len(_state['entries'])
+        total_bytes = _state['total_bytes']
+        ordered = sorted(_state['entries'].values(), key=sort_key)
+    r = []
+    for entry in ordered:
+        if (max_entries is None or count <= max_entries) and \
+           (max_bytes is None or total_bytes <= max_bytes):
+            break
+        if entry.key in keep:
+            continue
+        r.append(entry.key)
+        count -= 1
+        total_bytes -= entry.totalSize()
+    return r
+
+def compact():
+    ''' Replace the journal with the minimum number of records needed to
+        describe the current entries.
+    '''
+    with _IndexLock():
+        _compact()
+
+def rebuild():
+    ''' Discard the index and rebuild it by scanning the cache directory. '''
+    with _IndexLock():
+        _rebuild()
+        _refresh()
+
+def _runsPath():
+    return os.path.join(folders.cacheDirectory(), Runs_Fname)
+
+def _readRuns():
+    try:
+        with open(_runsPath(), 'rb') as f:
+            lines = f.read().splitlines()
+    except IOError as e:
+        if e.errno == errno.ENOENT:
+            return []
+        raise
+    r = []
+    for line in lines:
+        try:
+            r.append(json.loads(line.decode('utf-8')))
+        except ValueError:
+            pass
+    return r
+
+def recordRun(statistics):
+    ''' Record the cache statistics (a dictionary) of an invocation of
+        yotta. Only the most recent Recent_Runs are kept.
+    '''
+    with _IndexLock():
+        line = (json.dumps(statistics, separators=(',', ':')) + '\n').encode('utf-8')
+        fd = os.open(_runsPath(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        runs = _readRuns()
+        if len(runs) > 2 * Recent_Runs:
+            cache_dir = folders.cacheDirectory()
+            fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.locked')
+            with os.fdopen(fd, 'wb') as f:
+                for run in runs[-Recent_Runs:]:
+                    f.write((json.dumps(run, separators=(',', ':')) + '\n').encode('utf-8'))
+            os.chmod(temp_path, 0o644)
+            fsutils.rmF(_runsPath())
+            os.rename(temp_path, _runsPath())
+
+def recentRuns():
+    ''' Return the statistics recorded by recordRun for recent invocations
+        of yotta, oldest first.
+    '''
+    with _IndexLock():
+        return _readRuns()[-Recent_Runs:]
@@ -0,0 +1,177 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import os
+import time
+import errno
+import hashlib
+import logging
+
+# folders, , where yotta stores things, internal
+from yotta.lib import folders
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# Ordered JSON, , read & write json, internal
+from yotta.lib import ordered_json
+# pool, , shared thread pool, internal
+from yotta.lib import pool
+# cache_index, , sizes and usage of cached tarballs, internal
+from yotta.lib import cache_index
+# access_common, , things shared between different component access modules, internal
+from yotta.lib import access_common
+# schema_validation, , validate descriptions against JSON schemas, internal
+from yotta.lib import schema_validation
+
+# Inspecting and maintaining the download cache (see `yotta cache`).
+
+# temporary files in the cache older than this are left over from yotta
+# processes that were killed, and are removed by collectGarbage:
+Stale_Temporary_Age = 60 * 60
+# interrupted downloads are kept for this long, so they can be resumed:
+Stale_Partial_Age = 7 * 24 * 60 * 60
+# saved schema validation results are only useful while the same version of
+# yotta is used (the schemas change between versions):
+Stale_Validation_Age = 30 * 24 * 60 * 60
+
+logger = logging.getLogger('cache')
+
+def originInfo(cache_key):
+    ''' Return the origin information saved with a cached tarball, or an
+        empty dictionary if it can't be read.
+    '''
+    try:
+        return ordered_json.load(access_common.cachedTarballPath(cache_key) + '.json')
+    except (IOError, OSError, ValueError):
+        return {}
+
+def describe(cache_key):
+    ''' Return a human-readable description of a cache entry (the URL it
+        was downloaded from, if it is known).
+    '''
+    return originInfo(cache_key).get('url', None) or cache_key
+
+def statistics(largest=10):
+    ''' Return a dictionary describing the cache: the number of entries and
+        their total size, the configured limits, the statistics of recent
+        invocations of yotta, and the largest entries.
+    '''
+    entries = cache_index.entries()
+    runs = cache_index.recentRuns()
+    hits = sum(run.get('hits', 0) for run in runs)
+    misses = sum(run.get('misses', 0) for run in runs)
+    return {
+                'entries': len(entries),
+                  'bytes': sum(e.totalSize() for e in entries),
+             'tree_bytes': sum(e.tree_size for e in entries),
+            'max_entries': access_common.getMaxCachedModules(),
+              'max_bytes': access_common.getMaxCacheBytes(),
+                 'policy': access_common.getEvictionPolicy(),
+                   'runs': runs,
+               'hit_rate': (float(hits) / (hits + misses)) if (hits + misses) else None,
+                'largest': sorted(entries, key=lambda e: e.totalSize(), reverse=True)[:largest]
+    }
+
+def _fileSHA256(path):
+    m = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(access_common.Download_Chunk_Size), b''):
+            m.update(chunk)
+    return m.hexdigest()
+
+def _verifyEntry(cache_key):
+    expected = (originInfo(cache_key).get('hash', None) or {}).get('sha256', None)
+    try:
+        calculated = _fileSHA256(access_common.cachedTarballPath(cache_key))
+    except (IOError, OSError) as e:
+        if e.errno == errno.ENOENT:
+            return 'missing'
+        raise
+    if not expected:
+        return 'unverifiable'
+    if calculated != expected:
+        logger.debug('%s: expected sha256 %s, calculated %s', cache_key, expected, calculated)
+        return 'corrupt'
+    return 'ok'
+
+def verify(repair=False):
+    ''' Check the sha256 hash of every cached tarball (in parallel) against
+        the hash it was downloaded with.
+
+        Returns a dictionary of {'ok'|'corrupt'|'missing'|'unverifiable':
+        [cache keys]}, where missing entries are in the index, but not in the
+        cache, and unverifiable entries were downloaded without a hash.
+
+        If repair is True then corrupt entries are removed, and the index is
+        rebuilt.
+    '''
+    keys = sorted(e.key for e in cache_index.entries())
+    r = {'ok': [], 'corrupt': [], 'missing': [], 'unverifiable': []}
+    for key, result in zip(keys, pool.map(_verifyEntry, keys)):
+        r[result].append(key)
+    if repair:
+        for key in r['corrupt']:
+            logger.info('removing corrupt cache entry %s', describe(key))
+            access_common.removeFromCache(key)
+        cache_index.rebuild()
+    return r
+
+def _isStale(path, age, now):
+    try:
+        return (now - os.lstat(path).st_mtime) > age
+    except OSError:
+        return False
+
+def collectGarbage():
+    ''' Apply the eviction policy to the cache, and remove anything that was
+        left behind by yotta processes that were killed: temporary files,
+        extracted trees without a tarball, old interrupted downloads, and old
+        saved schema validation results.
+
+        Returns a dictionary of the number of things removed.
+    '''
+    r = {'evicted': 0, 'temporary': 0, 'trees': 0, 'partial': 0, 'validation': 0}
+    count_before = len(cache_index.entries())
+    access_common.pruneCache()
+    r['evicted'] = count_before - len(cache_index.entries())
+
+    now = time.time()
+    cache_dir = folders.cacheDirectory()
+    trees_dir = os.path.join(cache_dir, access_common.Trees_Subdirectory)
+    for directory in (cache_dir, trees_dir):
+        try:
+            names = os.listdir(directory)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            raise
+        for name in names:
+            path = os.path.join(directory, name)
+            if name.endswith('.locked') and _isStale(path, Stale_Temporary_Age, now):
+                fsutils.rmRf(path)
+                r['temporary'] += 1
+            elif name.endswith(access_common.Partial_Suffix) and _isStale(path, Stale_Partial_Age, now):
+                fsutils.rmF(path)
+                fsutils.rmF(path + '.json')
+                r['partial'] += 1
+            elif directory == trees_dir and not name.endswith('.locked') and \
+                 not access_common.isInCache(name):
+                lock = access_common.cacheLock(name)
+                if lock.acquire(blocking=False):
+                    try:
+                        if not access_common.isInCache(name):
+                            access_common._discardTree(name)
+                            r['trees'] += 1
+                    finally:
+                        lock.release()
+    validation_dir = os.path.join(cache_dir, schema_validation.Validation_Subdirectory)
+    for dirpath, dirnames, filenames in os.walk(validation_dir):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if _isStale(path, Stale_Validation_Age if not name.endswith('.locked') else Stale_Temporary_Age, now):
+                fsutils.rmF(path)
+                r['validation'] += 1
+    cache_index.compact()
+    return r
@@ -5,9 +5,14 @@
 
 # standard library modules, , ,
 import os
+import json
+import errno
+import hashlib
 import logging
 import re
 import itertools
+import tempfile
+import time
 from collections import defaultdict
 from collections import OrderedDict
 
@@ -23,6 +28,21 @@ logger = logging.getLogger('cmakegen')
 
 Ignore_Subdirs = set(('build','yotta_modules', 'yotta_targets', 'CMake'))
 
+# The generation manifest records, for each component that CMakeLists were
+# generated for, a hash of everything that went into generating them apart
+# from the files in the component, the modification times of the directories
+# in the component (which change whenever anything is added, removed or
+# renamed in them: the contents of files are never used by the generator, only
+# their names), and the files that were generated. If none of these have
+# changed, the next generation re-uses the files instead of walking the
+# component and rendering them again.
+Generation_Manifest_Fname = 'yotta_generation.json'
+Generation_Manifest_Format = 1
+# modification times are only as precise as the filesystem's clock, so a
+# directory modified this recently (in seconds) might be modified again
+# without its modification time changing: it's always walked again next time
+Generation_Recent_Interval = 2
+
 jinja_environment = Environment(loader=FileSystemLoader(Template_Dir), trim_blocks=True, lstrip_blocks=True)
 
 def replaceBackslashes(s):
@@ -37,6 +57,19 @@ jinja_environment.filters['sanitizePreprocessorSymbol'] = sanitizePreprocessorSy
 jinja_environment.globals['list'] = list
 jinja_environment.globals['pathJoin'] = os.path.join
 
+def _stat(path):
+    try:
+        return os.stat(path)
+    except OSError as e:
+        if e.errno in (errno.ENOENT, errno.ENOTDIR):
+            return None
+        raise
+
+def _modificationTime(st):
+    if st is None:
+        return None
+    return getattr(st, 'st_mtime_ns', st.st_mtime)
+
 class SourceFile(object):
     def __init__(self, fullpath, relpath, lang):
         super(SourceFile, self).__init__()
@@ -57,11 +90,15 @@ class CMakeGen(object):
         self.config_json_file = None
         self.build_info_include_file = None
         self.build_uuid = None
+        # when generating a component, the list of files written for it
+        self._generated_files = None
 
     def _writeFile(self, path, contents):
         dirname = os.path.dirname(path)
         fsutils.mkDirP(dirname)
         self.writeIfDifferent(path, contents)
+        if self._generated_files is not None:
+            self._generated_files.append(path)
 
     def configure(self, component, all_dependencies):
         ''' Ensure all config-time files have been generated. Return a
@@ -95,11 +132,16 @@ class CMakeGen(object):
                'build_info_include': self.build_info_include_file
         }
 
-    def generateRecursive(self, component, all_components, builddir=None, modbuilddir=None, processed_components=None, application=None):
+    def generateRecursive(self, component, graph, builddir=None, modbuilddir=None, application=None):
         ''' generate top-level CMakeLists for this component and its
             dependencies: the CMakeLists are all generated in self.buildroot,
             which MUST be out-of-source
 
+            graph is the dependency_graph.DependencyGraph of component
+            (including test dependencies) that was used to configure: the
+            dependencies of every component are taken from it, rather than
+            being resolved again for each one.
+
             !!! NOTE: experimenting with a slightly different way of doing
             things here, this function is a generator that yields any errors
             produced, so the correct use is:
@@ -114,56 +156,201 @@ class CMakeGen(object):
         if modbuilddir is None:
             modbuilddir = os.path.join(builddir, 'ym')
 
-        if processed_components is None:
-            processed_components = dict()
         if not self.target:
             yield 'Target "%s" is not a valid build target' % self.target
 
-        toplevel = not len(processed_components)
-
+        previous_manifest = self._loadGenerationManifest()
+        manifest = {}
+        processed_components = dict()
+        # depth-first, in dependency order (this is iterative rather than
+        # recursive so that deep dependency graphs don't hit the recursion
+        # limit): each entry in the stack is an iterator over the
+        # (component, builddir) pairs that remain to be generated at that level
+        pending = [iter([(component, builddir)])]
+        while pending:
+            next_component = next(pending[-1], None)
+            if next_component is None:
+                pending.pop()
+                continue
+            c, c_builddir = next_component
+            toplevel = not len(processed_components)
+            errors, new_dependencies = self._generateComponent(
+                c, graph, c_builddir, modbuilddir, processed_components, application, toplevel,
+                previous_manifest, manifest
+            )
+            for error in errors:
+                yield error
+            pending.append(iter([
+                (dep, os.path.join(modbuilddir, name)) for name, dep in new_dependencies.items()
+            ]))
+        self._saveGenerationManifest(manifest)
+
+    def _generateComponent(self, component, graph, builddir, modbuilddir, processed_components, application, toplevel, previous_manifest, manifest):
+        ''' Generate the build files for a single component, returning
+            (errors, {name:component} of the dependencies that it is
+            responsible for building).
+
+            The files are only generated if the record in previous_manifest
+            shows that they are out of date: the record of the files that
+            are now current is added to manifest.
+        '''
+        errors = []
         logger.debug('generate build files: %s (target=%s)' % (component, self.target))
         # because of the way c-family language includes work we need to put the
         # public header directories of all components that this component
         # depends on (directly OR indirectly) into the search path, which means
-        # we need to first enumerate all the direct and indirect dependencies
-        recursive_deps = component.getDependenciesRecursive(
-            available_components = all_components,
-                          target = self.target,
-                  available_only = True,
-                            test = True
-        )
-        dependencies = component.getDependencies(
-                  all_components,
-                          target = self.target,
-                  available_only = True,
-                            test = True
-        )
+        # we need all the direct and indirect dependencies: these are memoized
+        # by the graph
+        name = component.getName()
+        recursive_deps = graph.recursiveDependencies(name, available_only=True)
+        all_dependencies = graph.dependencies(name)
 
-        for name, dep in dependencies.items():
+        for dep_name, dep in all_dependencies.items():
             # if dep is a test dependency, then it might not be required (if
             # we're not building tests). We don't actually know at this point
             if not dep:
                 if dep.isTestDependency():
-                    logger.debug('Test dependency "%s" of "%s" is not installed.' % (name, component))
+                    logger.debug('Test dependency "%s" of "%s" is not installed.' % (dep_name, component))
                 else:
-                    yield 'Required dependency "%s" of "%s" is not installed.' % (name, component)
+                    errors.append('Required dependency "%s" of "%s" is not installed.' % (dep_name, component))
+        dependencies = OrderedDict((k, v) for k, v in all_dependencies.items() if v)
         # ensure this component is assumed to have been installed before we
         # check for its dependencies, in case it has a circular dependency on
         # itself
-        processed_components[component.getName()] = component
-        new_dependencies = OrderedDict([(name,c) for name,c in dependencies.items() if c and not name in processed_components])
-        self.generate(builddir, modbuilddir, component, new_dependencies, dependencies, recursive_deps, application, toplevel)
+        processed_components[name] = component
+        new_dependencies = OrderedDict([(n,c) for n,c in dependencies.items() if not n in processed_components])
+        if toplevel:
+            # the top-level CMakeLists include the build info definitions
+            # (which include the time of the build), so they're different
+            # every time:
+            self.generate(builddir, modbuilddir, component, new_dependencies, dependencies, recursive_deps, application, toplevel)
+        else:
+            key = replaceBackslashes(os.path.relpath(builddir, self.buildroot))
+            inputs = self._generationInputs(
+                builddir, modbuilddir, component, new_dependencies, dependencies, recursive_deps, application
+            )
+            record = previous_manifest.get(key, None)
+            if self._generatedFilesAreCurrent(record, inputs):
+                logger.debug('build files for %s are up to date', component)
+            else:
+                # record the state of the directories before walking them, so
+                # that anything changed while generating is noticed next time
+                record = {
+                         'inputs': inputs,
+                    'directories': self._sourceDirectoryStamps(component),
+                      'generated': None
+                }
+                self._generated_files = []
+                try:
+                    self.generate(builddir, modbuilddir, component, new_dependencies, dependencies, recursive_deps, application, toplevel)
+                    record['generated'] = self._generated_files
+                finally:
+                    self._generated_files = None
+            manifest[key] = record
 
         logger.debug('recursive deps of %s:' % component)
         for d in recursive_deps.values():
             logger.debug('    %s' % d)
 
         processed_components.update(new_dependencies)
-        for name, c in new_dependencies.items():
-            for error in self.generateRecursive(
-                c, all_components, os.path.join(modbuilddir, name), modbuilddir, processed_components, application=application
-            ):
-                yield error
+        return (errors, new_dependencies)
+
+    def _generationInputs(self, builddir, modbuilddir, component, active_dependencies, immediate_dependencies, all_dependencies, application):
+        ''' Return a hash of everything (apart from the directories in the
+            component) that generating the (non-top-level) build files for
+            component depends on.
+        '''
+        # yotta version, , the generated files change between versions
+        import yotta
+        inputs = [
+            yotta.__version__,
+            self.buildroot,
+            builddir,
+            modbuilddir,
+            self.target.getName(),
+            list(self.target.getAdditionalIncludes()),
+            self.config_include_file,
+            application.path if application is not None else None,
+            component.path,
+            component.isTestDependency(),
+            component.description,
+            component.ignore_patterns,
+            [(name, str(c.getVersion())) for name, c in active_dependencies.items()],
+            [(name, c.path, c.isTestDependency()) for name, c in immediate_dependencies.items()],
+            [
+                (name, c.path, c.isTestDependency(), c.getExtraSysIncludes(), c.getExtraIncludes())
+                for name, c in all_dependencies.items()
+            ]
+        ]
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _sourceDirectoryStamps(self, component):
+        ''' Return {path:modification time} of the directories in component
+            that generating its build files might list.
+        '''
+        directories = [component.path]
+        for f in sorted(os.listdir(component.path)):
+            if f in Ignore_Subdirs or f.startswith('.') or f.startswith('_'):
+                continue
+            path = os.path.join(component.path, f)
+            if not os.path.isdir(path):
+                continue
+            # ignored files in the resource directory are still resources
+            if f in ('resource',):
+                walk = os.walk(path)
+            else:
+                walk = component.walk(path)
+            for root, dirs, files in walk:
+                directories.append(root)
+        recent = time.time() - Generation_Recent_Interval
+        r = {}
+        for d in directories:
+            st = _stat(d)
+            if st is not None and st.st_mtime > recent:
+                r[d] = 'modified recently'
+            else:
+                r[d] = _modificationTime(st)
+        return r
+
+    def _generatedFilesAreCurrent(self, record, inputs):
+        if record is None or record['inputs'] != inputs:
+            return False
+        for path, stamp in record['directories'].items():
+            if _modificationTime(_stat(path)) != stamp:
+                return False
+        for path in record['generated']:
+            if not os.path.isfile(path):
+                return False
+        return True
+
+    def _loadGenerationManifest(self):
+        try:
+            with open(os.path.join(self.buildroot, Generation_Manifest_Fname), 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('format', None) != Generation_Manifest_Format:
+                return {}
+            records = manifest['components']
+            for record in records.values():
+                if not set(('inputs', 'directories', 'generated')) <= set(record):
+                    return {}
+            return records
+        except (IOError, OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.debug('no usable generation manifest in %s: %s', self.buildroot, e)
+            return {}
+
+    def _saveGenerationManifest(self, records):
+        manifest = {
+                'format': Generation_Manifest_Format,
+            'components': records
+        }
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.buildroot, suffix='.locked')
+            with os.fdopen(fd, 'w') as f:
+                f.write(json.dumps(manifest, sort_keys=True))
+            fsutils.rmF(os.path.join(self.buildroot, Generation_Manifest_Fname))
+            os.rename(temp_path, os.path.join(self.buildroot, Generation_Manifest_Fname))
+        except (IOError, OSError) as e:
+            logger.debug('failed to save generation manifest: %s', e)
 
     def checkStandardSourceDir(self, dirname, component):
         # validate, , validate various things, internal
@@ -614,7 +801,7 @@ class CMakeGen(object):
         cmake_files = []
         source_dir = os.path.join(component.path, 'source')
         if os.path.exists(source_dir):
-            for root, dires, files in os.walk(os.path.join(component.path, 'source')):
+            for root, dires, files in component.walk(os.path.join(component.path, 'source')):
                 for f in files:
                     name, ext = os.path.splitext(f)
                     if ext.lower() == '.cmake' and not component.ignores(os.path.relpath(os.path.join(root, f), component.path)):
@@ -682,7 +869,7 @@ class CMakeGen(object):
 
         # Find cmake files
         cmake_files = []
-        for root, dires, files in os.walk(os.path.join(component.path, dirname)):
+        for root, dires, files in component.walk(os.path.join(component.path, dirname)):
             for f in files:
                 name, ext = os.path.splitext(f)
                 if ext.lower() == '.cmake' and not component.ignores(os.path.relpath(os.path.join(root, f), component.path)):
@@ -728,7 +915,7 @@ class CMakeGen(object):
 
         # Find cmake files
         cmake_files = []
-        for root, dires, files in os.walk(os.path.join(component.path, dirname)):
+        for root, dires, files in component.walk(os.path.join(component.path, dirname)):
             for f in files:
                 name, ext = os.path.splitext(f)
                 if ext.lower() == '.cmake' and not component.ignores(os.path.relpath(os.path.join(root, f), component.path)):
@@ -760,7 +947,7 @@ class CMakeGen(object):
         header_exts     = set(('.h',))
 
         sources = []
-        for root, dires, files in os.walk(directory):
+        for root, dires, files in component.walk(directory):
             for f in sorted(files):
                 name, ext = os.path.splitext(f)
                 ext = ext.lower()
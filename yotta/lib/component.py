@@ -12,11 +12,13 @@ from collections import OrderedDict
 from yotta.lib import access
 from yotta.lib import access_common
 # pool, , shared thread pool, internal
-#from pool import pool
+from yotta.lib import pool
 # vcs, , represent version controlled directories, internal
 from yotta.lib import vcs
-# fsutils, , misc filesystem utils, internal
-from yotta.lib import fsutils
+# module_store, , shared store of installed modules, internal
+from yotta.lib import module_store
+# search_paths, , index of directories searched for installed modules, internal
+from yotta.lib import search_paths
 # Pack, , common parts of Components/Targets, internal
 from yotta.lib import pack
 
@@ -63,6 +65,69 @@ def _truthyConfValue(v):
         # everything else is truthy!
         return True
 
+def dependencySpecsForDescription(description, shrinkwrap_mapping=None, target=None):
+    ''' Returns [DependencySpec] for the dependencies listed in a module
+        description (the parsed contents of a module.json file), with any
+        versions pegged by shrinkwrap_mapping ({name:version}) applied.
+
+        These are returned in the order that they are listed in the
+        description: this is so that dependency resolution proceeds in a
+        predictable way.
+    '''
+    if shrinkwrap_mapping is None:
+        shrinkwrap_mapping = {}
+    specifying_module = description.get('name', None)
+    deps = []
+
+    def specForDependency(name, version_spec, istest):
+        shrinkwrap_version_req = None
+        if name in shrinkwrap_mapping:
+            # exact version, and pull from registry:
+            shrinkwrap_version_req = shrinkwrap_mapping[name]
+            logger.debug(
+                'respecting %s shrinkwrap version %s for %s', specifying_module, shrinkwrap_version_req, name
+            )
+        return pack.DependencySpec(
+                                     name,
+                                     version_spec,
+                                     istest,
+            shrinkwrap_version_req = shrinkwrap_version_req,
+                 specifying_module = specifying_module
+        )
+
+    deps += [specForDependency(x[0], x[1], False) for x in description.get('dependencies', {}).items()]
+    target_deps = description.get('targetDependencies', {})
+    if target is not None:
+        for conf_key, target_conf_deps in target_deps.items():
+            if _truthyConfValue(target.getConfigValue(conf_key)) or conf_key in target.getSimilarTo_Deprecated():
+                logger.debug(
+                    'Adding target-dependent dependency specs for target config %s to component %s' %
+                    (conf_key, specifying_module)
+                )
+                deps += [specForDependency(x[0], x[1], False) for x in target_conf_deps.items()]
+
+
+    deps += [specForDependency(x[0], x[1], True) for x in description.get('testDependencies', {}).items()]
+    target_deps = description.get('testTargetDependencies', {})
+    if target is not None:
+        for conf_key, target_conf_deps in target_deps.items():
+            if _truthyConfValue(target.getConfigValue(conf_key)) or conf_key in target.getSimilarTo_Deprecated():
+                logger.debug(
+                    'Adding test-target-dependent dependency specs for target config %s to component %s' %
+                    (conf_key, specifying_module)
+                )
+                deps += [specForDependency(x[0], x[1], True) for x in target_conf_deps.items()]
+
+    # remove duplicates (use the first occurrence)
+    seen = set()
+    r = []
+    for dep in deps:
+        if not dep.name in seen:
+            r.append(dep)
+            seen.add(dep.name)
+
+    return r
+
 # API
 class Component(pack.Pack):
     def __init__(
@@ -133,6 +198,25 @@ class Component(pack.Pack):
         self.dependencies_failed = False
         self.is_test_dependency = test_dependency
 
+    @classmethod
+    def probe(cls, path, installed_linked=False):
+        ''' Return a pack.PackHeader for the module at path if a valid
+            Component would be created for it, otherwise None, without
+            reading anything except its description.
+        '''
+        if (not os.path.exists(os.path.join(path, Component_Description_File))) and \
+           os.path.exists(os.path.join(path, Component_Description_File_Fallback)):
+            description_filename = Component_Description_File_Fallback
+        else:
+            description_filename = Component_Description_File
+        return pack.probe(
+                              path,
+              description_filename,
+                  installed_linked,
+            # modules that specify both "bin" and "lib" are invalid:
+            valid = lambda d: not ('bin' in d and 'lib' in d)
+        )
+
     def getDependencySpecs(self, target=None):
         ''' Returns [DependencySpec]
 
@@ -140,57 +224,11 @@ class Component(pack.Pack):
             component description file: this is so that dependency resolution
             proceeds in a predictable way.
         '''
-        deps = []
-
-        def specForDependency(name, version_spec, istest):
-            shrinkwrap = self.getShrinkwrapMapping()
-            shrinkwrap_version_req = None
-            if name in shrinkwrap:
-                # exact version, and pull from registry:
-                shrinkwrap_version_req = shrinkwrap[name]
-                logger.debug(
-                    'respecting %s shrinkwrap version %s for %s', self.getName(), shrinkwrap_version_req, name
-                )
-            return pack.DependencySpec(
-                                         name,
-                                         version_spec,
-                                         istest,
-                shrinkwrap_version_req = shrinkwrap_version_req,
-                     specifying_module = self.getName()
-            )
-
-        deps += [specForDependency(x[0], x[1], False) for x in self.description.get('dependencies', {}).items()]
-        target_deps = self.description.get('targetDependencies', {})
-        if target is not None:
-            for conf_key, target_conf_deps in target_deps.items():
-                if _truthyConfValue(target.getConfigValue(conf_key)) or conf_key in target.getSimilarTo_Deprecated():
-                    logger.debug(
-                        'Adding target-dependent dependency specs for target config %s to component %s' %
-                        (conf_key, self.getName())
-                    )
-                    deps += [specForDependency(x[0], x[1], False) for x in target_conf_deps.items()]
-
-
-        deps += [specForDependency(x[0], x[1], True) for x in self.description.get('testDependencies', {}).items()]
-        target_deps = self.description.get('testTargetDependencies', {})
-        if target is not None:
-            for conf_key, target_conf_deps in target_deps.items():
-                if _truthyConfValue(target.getConfigValue(conf_key)) or conf_key in target.getSimilarTo_Deprecated():
-                    logger.debug(
-                        'Adding test-target-dependent dependency specs for target config %s to component %s' %
-                        (conf_key, self.getName())
-                    )
-                    deps += [specForDependency(x[0], x[1], True) for x in target_conf_deps.items()]
-
-        # remove duplicates (use the first occurrence)
-        seen = set()
-        r = []
-        for dep in deps:
-            if not dep.name in seen:
-                r.append(dep)
-                seen.add(dep.name)
-
-        return r
+        return dependencySpecsForDescription(
+                       self.description,
+            shrinkwrap_mapping = self.getShrinkwrapMapping(),
+                        target = target
+        )
 
     def hasDependency(self, name, target=None, test_dependencies=False):
         ''' Check if this module has any dependencies with the specified name
@@ -282,9 +320,12 @@ class Component(pack.Pack):
         '''
         # sourceparse, , parse version source urls, internal
         from yotta.lib import sourceparse
-        errors = []
         modules_path = self.modulesPath()
         def satisfyDep(dspec):
+            # returns (component, error): errors are collected in
+            # specification order below, so that they are reported
+            # deterministically even when dependencies are satisfied in
+            # parallel
             try:
                 r = provider(
                   dspec,
@@ -303,21 +344,26 @@ class Component(pack.Pack):
                     )
                     logger.debug('%s %s', r.getName(), msg)
                     r.setError(msg)
-                return r
+                return (r, None)
             except access_common.Unavailable as e:
-                errors.append(e)
                 self.dependencies_failed = True
+                return (None, e)
             except vcs.VCSError as e:
-                errors.append(e)
                 self.dependencies_failed = True
+                return (None, e)
         specs = self.getDependencySpecs(target=target)
         if not test:
             # filter out things that aren't test dependencies if necessary:
             specs = [x for x in specs if not x.is_test_dependency]
-        #dependencies = pool.map(
-        dependencies = map(
+        # the dependencies of a single module all have different names, so
+        # they can be satisfied (downloaded and unpacked) in parallel: the
+        # available_components and search_dirs are only read by providers,
+        # and are updated by the caller once the whole set has been satisfied
+        results = pool.map(
             satisfyDep, specs
         )
+        dependencies = [r for r, e in results]
+        errors = [e for r, e in results if e is not None]
         self.installed_dependencies = True
         # stable order is important!
         return (OrderedDict([((d and d.getName()) or specs[i].name, d) for i, d in enumerate(dependencies)]), errors)
@@ -361,7 +407,9 @@ class Component(pack.Pack):
                     dependency tree are found by their users lower down.
 
                     These directories are searched in order, and finally the
-                    current directory is checked.
+                    current directory is checked. A list is converted into a
+                    search_paths.SearchPaths index, which is shared by the
+                    recursive calls.
 
                 target:
                     None (default), or a Target object. If specified the target
@@ -400,8 +448,8 @@ class Component(pack.Pack):
                 return False
             return True
         available_components = self.ensureOrderedDict(available_components)
-        if search_dirs is None:
-            search_dirs = []
+        if not isinstance(search_dirs, search_paths.SearchPaths):
+            search_dirs = search_paths.SearchPaths(search_dirs or [])
         if _processed is None:
             _processed = set()
         assert(test in [True, False, 'toplevel'])
@@ -486,7 +534,7 @@ class Component(pack.Pack):
         r = Component(
                                default_path,
              test_dependency = dspec.is_test_dependency,
-            installed_linked = fsutils.isLink(default_path),
+            installed_linked = module_store.isUserLink(default_path),
           inherit_shrinkwrap = dep_of.getShrinkwrap()
         )
         return r
@@ -561,7 +609,9 @@ class Component(pack.Pack):
                     dependency tree are found by their users lower down.
 
                     These directories are searched in order, and finally the
-                    current directory is checked.
+                    current directory is checked. A list is converted into a
+                    search_paths.SearchPaths index, which is shared by the
+                    recursive calls.
 
                 update_installed:
                     False (default), True, or set(): whether to check the
@@ -619,11 +669,11 @@ class Component(pack.Pack):
             # match the version specification) - if we do, then we shouldn't
             # try to install, but should return that anyway:
             default_path = os.path.join(self.modulesPath(), dspec.name)
-            if fsutils.isLink(default_path):
+            if module_store.isUserLink(default_path):
                 r = Component(
                                        default_path,
                      test_dependency = dspec.is_test_dependency,
-                    installed_linked = fsutils.isLink(default_path),
+                    installed_linked = module_store.isUserLink(default_path),
                   inherit_shrinkwrap = dep_of.getShrinkwrap()
                 )
                 if r:
@@ -639,6 +689,8 @@ class Component(pack.Pack):
                 self.modulesPath(),
                 inherit_shrinkwrap = dep_of.getShrinkwrap()
             )
+            if isinstance(search_dirs, search_paths.SearchPaths):
+                search_dirs.installed(self.modulesPath(), dspec.name)
             if not r:
                 logger.error('could not install %s' % dspec.name)
             if r is not None:
@@ -0,0 +1,307 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import logging
+import threading
+from collections import OrderedDict
+from collections import namedtuple
+
+logger = logging.getLogger('components')
+
+# The resolved dependency graph of a module: which modules are used, and which
+# module depends on which, for one target. Resolving the graph means reading
+# every module.json (and searching yotta_modules directories) in the tree, so
+# commands resolve it once and pass the DependencyGraph to everything that
+# needs it, instead of each step calling getDependenciesRecursive (and then
+# getDependencies for each module to rediscover the edges).
+#
+# A graph is never modified once it has been constructed. If the installed
+# modules change (for example after installing or updating), resolve a new
+# one.
+
+class Edge(namedtuple('Edge', ['source', 'name', 'spec', 'target_conditional'])):
+    ''' A dependency of the module named source on the module name, as
+        specified by spec (a pack.DependencySpec). target_conditional is True
+        for dependencies that were listed in targetDependencies or
+        testTargetDependencies (and so only exist for some targets).
+    '''
+    __slots__ = ()
+
+    @property
+    def test(self):
+        return self.spec.is_test_dependency
+
+    @property
+    def kind(self):
+        ''' 'test', 'target' or 'normal' (test dependencies that are also
+            target-conditional are 'test').
+        '''
+        if self.test:
+            return 'test'
+        elif self.target_conditional:
+            return 'target'
+        else:
+            return 'normal'
+
+
+class DependencyGraph(object):
+    ''' The dependencies of root (a Component) for target, as resolved from
+        the installed modules. test has the same meaning as for
+        Component.getDependenciesRecursive: whether test dependencies are
+        included (True, False, or 'toplevel' for only those of root).
+
+        Nodes are identified by module name, and iterating over the graph
+        gives the names of the nodes in resolution order (root first).
+    '''
+    def __init__(self, root, components, target=None, test=False):
+        ''' Create the graph from components, the {name:Component} that
+            root.getDependenciesRecursive returned for the same target and
+            test arguments. Use DependencyGraph.resolve() to do both.
+        '''
+        self.root = root
+        self.target = target
+        self.test = test
+        self._components = OrderedDict(components)
+        self._nodes = OrderedDict([(root.getName(), root)])
+        for name, c in self._components.items():
+            self._nodes.setdefault(name, c)
+        self._position = dict((name, i) for i, name in enumerate(self._nodes))
+
+        self._edges = {}
+        dependents = dict((name, []) for name in self._nodes)
+        for name, c in self._nodes.items():
+            edges = tuple(
+                e for e in self._edgesFrom(c) if e.name in self._nodes
+            )
+            self._edges[name] = edges
+            for e in edges:
+                if name not in dependents[e.name]:
+                    dependents[e.name].append(name)
+        self._dependents = dict((name, tuple(d)) for name, d in dependents.items())
+
+        self._order, self._cycles = self._stronglyConnected()
+        # transitive closures are calculated when they're first needed
+        self._closures = None
+        self._recursive = {}
+        self._closures_lock = threading.Lock()
+
+    @classmethod
+    def resolve(cls, component, target, test=False):
+        ''' Resolve the graph of the (already installed) dependencies of
+            component. Missing dependencies are included as invalid
+            Components, in the same way as by getDependenciesRecursive.
+        '''
+        components = component.getDependenciesRecursive(
+                          target = target,
+            available_components = [(component.getName(), component)],
+                            test = test
+        )
+        return cls(component, components, target, test)
+
+    def _followsTestDependencies(self, component):
+        # the same rules as Component.__getDependenciesRecursiveWithProvider:
+        # test dependencies of test dependencies are never followed
+        if component.isTestDependency():
+            return False
+        if self.test == 'toplevel':
+            return component is self.root
+        return bool(self.test)
+
+    def _edgesFrom(self, component):
+        if not component:
+            return []
+        include_test = self._followsTestDependencies(component)
+        unconditional = component.description.get('dependencies', {})
+        unconditional_test = component.description.get('testDependencies', {})
+        r = []
+        for spec in component.getDependencySpecs(target=self.target):
+            if spec.is_test_dependency:
+                if not include_test:
+                    continue
+                conditional = spec.name not in unconditional_test
+            else:
+                conditional = spec.name not in unconditional
+            r.append(Edge(component.getName(), spec.name, spec, conditional))
+        return r
+
+    def _stronglyConnected(self):
+        ''' Tarjan's algorithm (iteratively, so that deep graphs don't hit
+            the recursion limit). Returns (topological order, cycles).
+        '''
+        successors = dict(
+            (name, [e.name for e in edges]) for name, edges in self._edges.items()
+        )
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        order = []
+        cycles = []
+        for start in self._nodes:
+            if start in index:
+                continue
+            work = [(start, 0)]
+            while work:
+                v, i = work[-1]
+                if i == 0 and v not in index:
+                    index[v] = low[v] = len(index)
+                    stack.append(v)
+                    on_stack.add(v)
+                if i < len(successors[v]):
+                    work[-1] = (v, i + 1)
+                    w = successors[v][i]
+                    if w not in index:
+                        work.append((w, 0))
+                    elif w in on_stack:
+                        low[v] = min(low[v], index[w])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[v])
+                if low[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack.remove(w)
+                        component.append(w)
+                        if w == v:
+                            break
+                    component.sort(key=self._position.get)
+                    # SCCs are completed after everything they depend on, so
+                    # this is already a topological order
+                    order += component
+                    if len(component) > 1 or v in successors[v]:
+                        cycles.append(tuple(component))
+        return tuple(order), tuple(cycles)
+
+    def _calculateClosures(self):
+        scc_of = {}
+        for cycle in self._cycles:
+            for name in cycle:
+                scc_of[name] = cycle
+        closures = {}
+        for name in self._order:
+            if name in closures:
+                continue
+            members = scc_of.get(name, (name,))
+            r = set(members) if name in scc_of else set()
+            for member in members:
+                for e in self._edges[member]:
+                    if e.name not in members:
+                        r.add(e.name)
+                        r.update(closures[e.name])
+            r = frozenset(r)
+            for member in members:
+                closures[member] = r
+        return closures
+
+    def __contains__(self, name):
+        return name in self._nodes
+
+    def __getitem__(self, name):
+        return self._nodes[name]
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __repr__(self):
+        return '<DependencyGraph of %s for %s: %d modules>' % (self.root.getName(), self.target, len(self))
+
+    def components(self, available_only=False):
+        ''' Return {name:Component} of everything root depends on (directly
+            or indirectly), in the same form as getDependenciesRecursive.
+        '''
+        if available_only:
+            return OrderedDict((k, v) for k, v in self._components.items() if v)
+        return OrderedDict(self._components)
+
+    def edges(self, name):
+        ''' Return the Edges from the named module to its dependencies, in
+            the order that they are specified.
+        '''
+        return self._edges[name]
+
+    def dependencies(self, name, available_only=False):
+        ''' Return {name:Component} of the direct dependencies of the named
+            module, in the same form as getDependencies.
+        '''
+        r = OrderedDict((e.name, self._nodes[e.name]) for e in self._edges[name])
+        if available_only:
+            r = OrderedDict((k, v) for k, v in r.items() if v)
+        return r
+
+    def dependents(self, name):
+        ''' Return the names of the modules that directly depend on the named
+            module.
+        '''
+        return self._dependents[name]
+
+    def topologicalOrder(self):
+        ''' Return the names of all of the modules, with every module after
+            the modules it depends on (except where they depend on each other
+            in a cycle).
+        '''
+        return self._order
+
+    def cycles(self):
+        ''' Return a tuple of the cycles in the graph, each a tuple of the
+            names of modules that (directly or indirectly) depend on each
+            other. A module that depends on itself is a cycle of one.
+        '''
+        return self._cycles
+
+    def transitiveClosure(self, name):
+        ''' Return the frozenset of names of everything the named module
+            depends on, directly or indirectly (which includes the module
+            itself only if it's part of a cycle).
+        '''
+        with self._closures_lock:
+            if self._closures is None:
+                self._closures = self._calculateClosures()
+            return self._closures[name]
+
+    def _resolutionOrder(self, name):
+        # the order that getDependenciesRecursive on the named module would
+        # visit the modules in its closure: its direct dependencies, and then
+        # depth-first the dependencies of each that hasn't already been
+        # processed
+        order = OrderedDict()
+        processed = set()
+        def expand(n):
+            processed.add(n)
+            for e in self._edges[n]:
+                order.setdefault(e.name, self._nodes[e.name])
+            return iter([
+                e.name for e in self._edges[n] if self._nodes[e.name] and e.name not in processed
+            ])
+        stack = [expand(name)]
+        while stack:
+            n = next(stack[-1], None)
+            if n is None:
+                stack.pop()
+            elif n not in processed:
+                stack.append(expand(n))
+        return order
+
+    def recursiveDependencies(self, name, available_only=False):
+        ''' Return {name:Component} of the transitive closure of the named
+            module, in the same order as getDependenciesRecursive would for
+            that module (which matters, for example, for the order of include
+            directories).
+        '''
+        with self._closures_lock:
+            r = self._recursive.get(name, None)
+        if r is None:
+            r = self._resolutionOrder(name)
+            with self._closures_lock:
+                self._recursive[name] = r
+        if available_only:
+            return OrderedDict((k, v) for k, v in r.items() if v)
+        return OrderedDict(r)
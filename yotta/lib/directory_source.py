@@ -0,0 +1,159 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import os
+import errno
+import shutil
+import hashlib
+import logging
+import tempfile
+
+# Ordered JSON, , read & write json, internal
+from yotta.lib import ordered_json
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# access_common, , things shared between different component access modules, internal
+from yotta.lib import access_common
+
+# A directory source is a local (or network-mounted) directory that is used
+# in place of a registry. It is configured in the "sources" setting as:
+#
+#   {"type": "directory", "path": "/path/to/mirror"}
+#
+# and uses the same layout as the registry URLs:
+#
+#   <path>/<modules|targets>/<name>/versions/<version>/tarball
+#   <path>/<modules|targets>/<name>/versions/<version>/version.json
+#
+# where version.json is the same information that the registry returns for
+# each version in its versions listing (including the sha256 hash of the
+# tarball, which is checked when it is unpacked).
+
+Version_Info_Fname = 'version.json'
+Tarball_Fname = 'tarball'
+
+logger = logging.getLogger('access')
+
+def versionsDirectory(root, namespace, name):
+    return os.path.join(root, namespace, name, 'versions')
+
+def listVersions(root, namespace, name):
+    ''' Return a list of the version information (as in a registry versions
+        listing) of each version of the named module or target in the
+        directory, or None if there are no versions of it.
+    '''
+    versions_dir = versionsDirectory(root, namespace, name)
+    try:
+        version_dirs = sorted(os.listdir(versions_dir))
+    except OSError as e:
+        if e.errno in (errno.ENOENT, errno.ENOTDIR):
+            return None
+        raise
+    r = []
+    for v in version_dirs:
+        info_path = os.path.join(versions_dir, v, Version_Info_Fname)
+        if not os.path.isfile(os.path.join(versions_dir, v, Tarball_Fname)):
+            continue
+        try:
+            r.append(ordered_json.load(info_path))
+        except (IOError, OSError, ValueError) as e:
+            logger.warning('ignoring invalid version %s in %s: %s', v, versions_dir, e)
+    return r or None
+
+
+class _FileStream(object):
+    ''' Provide the iter_content method of a requests streaming response for
+        a local file, so that it can be used with unpackTarballStream. '''
+    def __init__(self, f):
+        self.f = f
+
+    def iter_content(self, chunk_size):
+        while True:
+            chunk = self.f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def unpackTarball(path, into_directory, sha256, origin_info):
+    ''' Unpack the tarball at path into into_directory, checking its hash and
+        adding it to the download cache.
+    '''
+    try:
+        f = open(path, 'rb')
+    except IOError as e:
+        if e.errno == errno.ENOENT:
+            raise access_common.Unavailable('%s does not exist' % path)
+        raise
+    with f:
+        access_common.unpackTarballStream(
+                    stream = _FileStream(f),
+            into_directory = into_directory,
+                      hash = {'sha256': sha256} if sha256 else {},
+                 cache_key = sha256,
+               origin_info = origin_info
+        )
+
+def _writeAtomically(path, write_fn):
+    ''' Call write_fn with a binary file object, and then atomically move
+        what was written to path (so that other users of the directory never
+        see partial files).
+    '''
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.locked')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_fn(f)
+        # directory sources are usually shared, so make them readable by
+        # everyone (mkstemp creates files only readable by their owner)
+        os.chmod(temp_path, 0o644)
+        os.rename(temp_path, path)
+    except:
+        fsutils.rmF(temp_path)
+        raise
+
+def _fileSHA256(path):
+    m = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            m.update(chunk)
+    return m.hexdigest()
+
+def add(root, namespace, pack):
+    ''' Add the installed module or target `pack` to the directory source at
+        root. The tarball it was downloaded from is used if it is still in
+        the download cache, otherwise a new tarball is generated from the
+        installed files.
+
+        Returns False if this version was already present, True otherwise.
+    '''
+    name = pack.getName()
+    version = str(pack.getVersion())
+    version_dir = os.path.join(versionsDirectory(root, namespace, name), version)
+    info_path = os.path.join(version_dir, Version_Info_Fname)
+    tarball_path = os.path.join(version_dir, Tarball_Fname)
+    if os.path.isfile(info_path) and os.path.isfile(tarball_path):
+        return False
+    fsutils.mkDirP(version_dir)
+
+    # pack.origin() reads the origin info saved when the module was unpacked
+    pack.origin()
+    cached_sha256 = (pack.origin_info or {}).get('hash', {}).get('sha256', None)
+    if cached_sha256 and access_common.isInCache(cached_sha256):
+        logger.debug('add %s@%s from cache', name, version)
+        def writeTarball(f):
+            with open(access_common.cachedTarballPath(cached_sha256), 'rb') as src:
+                shutil.copyfileobj(src, f)
+    else:
+        logger.debug('add %s@%s from %s', name, version, pack.path)
+        writeTarball = pack.generateTarball
+    _writeAtomically(tarball_path, writeTarball)
+
+    info = ordered_json.dumps({
+               'version': version,
+                  'hash': {'sha256': _fileSHA256(tarball_path)},
+           'description': pack.description
+    }) + '\n'
+    _writeAtomically(info_path, lambda f: f.write(info.encode('utf-8')))
+    return True
@@ -8,6 +8,7 @@ import os
 import errno
 import shutil
 import stat
+import threading
 
 def mkDirP(path):
     try:
@@ -71,6 +72,52 @@ def rmRf(path):
             raise
 
 
+def directorySize(path):
+    ''' Return the total size of the files in the directory tree at path. '''
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for f in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, f)).st_size
+            except OSError:
+                pass
+    return total
+
+def linkOrCopyTree(source, destination, hardlink=True):
+    ''' Recreate the directory tree at source at destination (which must not
+        exist). Files are hard-linked if hardlink is True and the filesystem
+        supports it, otherwise they are copied (and made writable by their
+        owner, in case the source files were read-only). Symlinks are
+        recreated as symlinks.
+
+        Returns True if any files were hard-linked.
+    '''
+    linked = False
+    os.mkdir(destination)
+    for dirpath, dirnames, filenames in os.walk(source):
+        dest_dir = os.path.join(destination, os.path.relpath(dirpath, source))
+        for name in dirnames + filenames:
+            src = os.path.join(dirpath, name)
+            dst = os.path.normpath(os.path.join(dest_dir, name))
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dst)
+            elif os.path.isdir(src):
+                os.mkdir(dst)
+            else:
+                if hardlink:
+                    try:
+                        os.link(src, dst)
+                        linked = True
+                        continue
+                    except (OSError, AttributeError):
+                        # cross-device links, filesystems that don't support
+                        # links, and platforms without os.link: copy instead
+                        # (and don't keep trying to link)
+                        hardlink = False
+                shutil.copy2(src, dst)
+                os.chmod(dst, os.stat(dst).st_mode | stat.S_IWUSR)
+    return linked
+
 def fullySplitPath(path):
     components = []
     while True:
@@ -101,6 +148,8 @@ realpath      = _platform_fsutils.realpath
 dropRootPrivs = _platform_fsutils.dropRootPrivs
 rmLink        = _platform_fsutils.rmLink
 which         = _platform_fsutils.which
+_lockFile     = _platform_fsutils._lockFile
+_unlockFile   = _platform_fsutils._unlockFile
 
 # !!! FIXME: the logic in the "except" block below probably doesn't work in Windows
 def symlink(source, link_name):
@@ -111,3 +160,90 @@ def symlink(source, link_name):
     except OSError as exception:
         if exception.errno != errno.EEXIST and (tryReadLink(link_name) != source):
             raise
+
+# {path: [fd, count]} of the file locks held by each thread
+_held_locks = threading.local()
+
+class FileLock(object):
+    ''' An advisory lock on the file at path (which is created if it does not
+        exist), for use as a context manager. Locks exclude other processes
+        and other threads, but a thread that already holds the lock on a path
+        may acquire it again without blocking: in either mode if it holds it
+        exclusively, but only shared if it holds it shared (a shared lock
+        can't be upgraded without releasing it, which would let other writers
+        in, so acquiring it exclusively fails, or raises RuntimeError if
+        blocking).
+    '''
+    def __init__(self, path, shared=False):
+        self.path = path
+        self.shared = shared
+        self.held = False
+
+    def _heldLocks(self):
+        if not hasattr(_held_locks, 'paths'):
+            _held_locks.paths = {}
+        return _held_locks.paths
+
+    def acquire(self, blocking=True):
+        ''' Acquire the lock, returning True if it was acquired (which is
+            always the case if blocking is True).
+        '''
+        held = self._heldLocks()
+        if self.path in held:
+            if held[self.path][2] and not self.shared:
+                if not blocking:
+                    return False
+                raise RuntimeError(
+                    'an exclusive lock on %s was requested by a thread that holds a shared lock on it' % self.path
+                )
+            held[self.path][1] += 1
+            self.held = True
+            return True
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                if not _lockFile(fd, self.shared, blocking):
+                    os.close(fd)
+                    return False
+                # if the lock file was removed (see remove()) while we were
+                # waiting, then we locked a file nobody else will: try again
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    break
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    os.close(fd)
+                    raise
+            os.close(fd)
+        held[self.path] = [fd, 1, self.shared]
+        self.held = True
+        return True
+
+    def release(self):
+        if not self.held:
+            return
+        self.held = False
+        held = self._heldLocks()
+        held[self.path][1] -= 1
+        if held[self.path][1] == 0:
+            fd = held.pop(self.path)[0]
+            try:
+                _unlockFile(fd)
+            finally:
+                os.close(fd)
+
+    def remove(self):
+        ''' Remove the lock file while the lock is held exclusively, so that
+            lock files don't accumulate.
+        '''
+        try:
+            os.unlink(self.path)
+        except OSError:
+            # (not possible on windows while it is open, which is fine)
+            pass
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -6,6 +6,8 @@
 # standard library modules, , ,
 import os
 import pwd
+import errno
+import fcntl
 import multiprocessing
 import logging
 import sys
@@ -110,3 +112,23 @@ def which(program):
     return None
 
 
+
+def _lockFile(fd, shared, blocking):
+    ''' Lock the open file fd, returning False if blocking is False and the
+        lock is held by someone else.
+    '''
+    flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        flags |= fcntl.LOCK_NB
+    try:
+        # flock locks belong to the open file, so (unlike lockf) they also
+        # exclude other threads of the same process
+        fcntl.flock(fd, flags)
+    except (IOError, OSError) as e:
+        if not blocking and e.errno in (errno.EAGAIN, errno.EACCES, errno.EWOULDBLOCK):
+            return False
+        raise
+    return True
+
+def _unlockFile(fd):
+    fcntl.flock(fd, fcntl.LOCK_UN)
@@ -11,6 +11,9 @@
 # ntfsutils, 2-clause BSD, NTFS link handling, pip install ntfsutils
 import ntfsutils.junction as junction #pylint: disable=import-error
 import os
+import time
+import errno
+import msvcrt #pylint: disable=import-error
 
 def dropRootPrivs(fn):
     ''' decorator to drop su/sudo privilages before running a function on
@@ -72,4 +75,25 @@ def which(program):
     # not found
     return None
 
+def _lockFile(fd, shared, blocking):
+    ''' Lock the open file fd, returning False if blocking is False and the
+        lock is held by someone else.
 
+        ** windows has no shared locks, so all locks are exclusive **
+    '''
+    while True:
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except (IOError, OSError) as e:
+            if e.errno not in (errno.EACCES, errno.EDEADLOCK):
+                raise
+        if not blocking:
+            return False
+        # (LK_LOCK only retries for 10 seconds, so poll instead)
+        time.sleep(0.05)
+
+def _unlockFile(fd):
+    os.lseek(fd, 0, os.SEEK_SET)
+    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
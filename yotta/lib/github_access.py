@@ -22,6 +22,8 @@ from yotta.lib import access_common
 from yotta.lib import auth
 # globalconf, share global arguments between modules, internal
 from yotta.lib import globalconf
+# sessions, , shared HTTP sessions, internal
+from yotta.lib import sessions
 
 # Constants
 _github_url = 'https://api.github.com'
@@ -146,16 +148,14 @@ def _getTipArchiveURL(repo):
 def _getTarball(url, into_directory, cache_key, origin_info=None):
     '''unpack the specified tarball url into the specified directory'''
 
-    try:
-        access_common.unpackFromCache(cache_key, into_directory)
-    except KeyError as e:
+    def fetch():
         tok = settings.getProperty('github', 'authtoken')
         headers = {}
         if tok is not None:
             headers['Authorization'] = 'token ' + str(tok)
 
         logger.debug('GET %s', url)
-        response = requests.get(url, allow_redirects=True, stream=True, headers=headers)
+        response = sessions.get(url, allow_redirects=True, stream=True, headers=headers)
         response.raise_for_status()
 
         logger.debug('getting file: %s', url)
@@ -172,6 +172,8 @@ def _getTarball(url, into_directory, cache_key, origin_info=None):
                origin_info = origin_info
         )
 
+    access_common.unpackFromCacheOrFetch(cache_key, into_directory, fetch)
+
 
 
 def _createCacheKey(*args):
@@ -0,0 +1,183 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import re
+import fnmatch
+import threading
+
+# PyPi/standard library > 3.4
+# it has to be PurePath
+from pathlib import PurePath, PureWindowsPath
+
+# Match paths against the ignore patterns of a module (the defaults and those
+# in its .yotta_ignore file).
+#
+# A path is ignored if it, or any of its parent directories, matches any of
+# the patterns under the rules of PurePath.match, where the path is taken to
+# be relative to the root (/) of the module:
+#
+#  * an anchored pattern (/a/b) matches a path with exactly the same number of
+#    parts, each part matching the corresponding part of the pattern;
+#  * a relative pattern (a/b) matches the last parts of a path (the root
+#    itself counts as a part, so */b matches /b);
+#
+# with each part matched using fnmatch (case-insensitively on Windows). So
+# relative patterns can match any consecutive parts of the path, and anchored
+# patterns its first parts, and as everything in an ignored directory is also
+# ignored, the directory results are saved, and walkers can skip the contents
+# of ignored directories.
+
+if isinstance(PurePath(), PureWindowsPath):
+    def _casefold(s):
+        return s.lower()
+else:
+    def _casefold(s):
+        return s
+
+# private state
+_matchers = {}
+_lock = threading.Lock()
+
+
+class _Pattern(object):
+    def __init__(self, pattern):
+        self.pattern = pattern
+        parsed = PurePath(_casefold(pattern))
+        if not parsed.parts:
+            raise ValueError('empty ignore pattern "%s"' % pattern)
+        self.drive = parsed.drive
+        self.root = parsed.root
+        self.anchored = bool(self.drive or self.root)
+        # the parts as parsed by PurePath: without trailing slashes, or '.'
+        # parts, which PurePath.match also ignored
+        self.part_patterns = parsed.parts[1:] if self.anchored else parsed.parts
+        self.parts = [re.compile(fnmatch.translate(p)).match for p in self.part_patterns]
+
+    def matchesPrefix(self, anchor_drive, anchor_root, parts):
+        ''' Return True if this (anchored) pattern matches the first parts of
+            the path. '''
+        if self.drive and self.drive != anchor_drive:
+            return False
+        if self.root and self.root != anchor_root:
+            return False
+        if len(parts) < len(self.parts):
+            return False
+        for part, match in zip(parts, self.parts):
+            if not match(part):
+                return False
+        return True
+
+    def matchesEnd(self, parts):
+        ''' Return True if this (relative) pattern matches the last parts of
+            parts. '''
+        if len(self.parts) > len(parts):
+            return False
+        for part, match in zip(reversed(parts), reversed(self.parts)):
+            if not match(part):
+                return False
+        return True
+
+
+class IgnoreMatcher(object):
+    ''' Test paths (relative to the root of a module) against a list of
+        ignore patterns. Use matcherFor to get a (shared) instance.
+    '''
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        # a pattern with no parts (such as '.') can't be matched:
+        # PurePath.match raised ValueError for it, so a path that isn't
+        # ignored by one of the patterns before it does the same
+        self.empty_pattern = None
+        compiled = []
+        for p in self.patterns:
+            if not PurePath(_casefold(p)).parts:
+                self.empty_pattern = p
+                break
+            compiled.append(_Pattern(p))
+        self.anchored = [p for p in compiled if p.anchored]
+        # relative patterns of a single part (the most common sort) are
+        # combined into a single expression:
+        single = [p.part_patterns[0] for p in compiled if not p.anchored and len(p.parts) == 1]
+        if single:
+            self.single = re.compile('|'.join(
+                '(?:%s)' % fnmatch.translate(p) for p in single
+            )).match
+        else:
+            self.single = None
+        self.relative = [p for p in compiled if not p.anchored and len(p.parts) > 1]
+        # {(casefolded parts of a directory): ignored}
+        self.directories = {}
+        self.directories_lock = threading.Lock()
+
+    def _endIgnored(self, drive, root, parts):
+        ''' Return True if the path (drive, root, parts) itself matches any
+            pattern (ignoring its parents). parts includes the anchor.
+        '''
+        if self.single is not None and self.single(parts[-1]):
+            return True
+        for p in self.relative:
+            if p.matchesEnd(parts):
+                return True
+        # anchored patterns match paths with the same number of parts:
+        for p in self.anchored:
+            if len(p.parts) == len(parts) - 1 and p.matchesPrefix(drive, root, parts[1:]):
+                return True
+        return False
+
+    def _directoryIgnored(self, drive, root, parts):
+        key = tuple(parts)
+        with self.directories_lock:
+            r = self.directories.get(key, None)
+        if r is None:
+            r = self._endIgnored(drive, root, parts) or \
+                (len(parts) > 1 and self._directoryIgnored(drive, root, parts[:-1]))
+            with self.directories_lock:
+                self.directories[key] = r
+        return r
+
+    def ignores(self, path):
+        ''' Return True if the path, which must be relative to the root of
+            the module, is ignored (including because one of the directories
+            containing it is ignored). If a directory is ignored, then
+            everything in it is ignored.
+        '''
+        test_path = PurePath('/', path)
+        drive = _casefold(test_path.drive)
+        root = _casefold(test_path.root)
+        parts = [_casefold(p) for p in test_path.parts]
+        if len(parts) > 1 and self._directoryIgnored(drive, root, parts[:-1]):
+            return True
+        if self._endIgnored(drive, root, parts):
+            return True
+        if self.empty_pattern is not None:
+            raise ValueError('empty ignore pattern "%s"' % self.empty_pattern)
+        return False
+
+    def matchingPattern(self, path):
+        ''' Return the first pattern that matches the path or one of its
+            parent directories (for diagnostics), or None.
+        '''
+        test_path = PurePath('/', path)
+        test_paths = [test_path] + list(test_path.parents)
+        for p in self.patterns:
+            for tp in test_paths:
+                if tp.match(p):
+                    return p
+        return None
+
+
+def matcherFor(patterns):
+    ''' Return the IgnoreMatcher for the list of patterns (which is compiled
+        once, and shared by everything using the same patterns).
+    '''
+    key = tuple(patterns)
+    with _lock:
+        r = _matchers.get(key, None)
+    if r is None:
+        r = IgnoreMatcher(key)
+        with _lock:
+            r = _matchers.setdefault(key, r)
+    return r
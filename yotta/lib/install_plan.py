@@ -0,0 +1,302 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import os
+import logging
+from collections import OrderedDict
+
+# access, , get components, internal
+from yotta.lib import access
+# access_common, , things shared between different component access modules, internal
+from yotta.lib import access_common
+# Component, , represents an installed component, internal
+from yotta.lib import component
+# Pack, , common parts of Components/Targets, internal
+from yotta.lib import pack
+# module_store, , shared store of installed modules, internal
+from yotta.lib import module_store
+# pool, , shared thread pool, internal
+from yotta.lib import pool
+# search_paths, , index of directories searched for installed modules, internal
+from yotta.lib import search_paths
+# vcs, , represent version controlled directories, internal
+from yotta.lib import vcs
+
+# An install plan is built in two phases: first the dependency graph is
+# resolved using only metadata (the versions available from the registry, the
+# descriptions of already-installed modules, and the descriptions of
+# not-yet-installed modules where the registry provides them), then all of the
+# modules that need to be downloaded are fetched at once, in parallel.
+#
+# The resolution rules (and order) are the same as those used by
+# Component.satisfyDependenciesRecursive, which is still run after the plan
+# has been fetched to satisfy anything that could not be planned in advance
+# (for example the dependencies of modules fetched from git, whose
+# descriptions are not known until they have been downloaded).
+
+logger = logging.getLogger('install')
+
+class PlannedModule(object):
+    ''' A module that is not installed yet, but which has been selected to be
+        installed at `path` from `remote_version`.
+    '''
+    def __init__(self, name, version_required, remote_version, path, test_dependency=False, inherit_shrinkwrap=None):
+        self.name = name
+        self.version_required = version_required
+        self.remote_version = remote_version
+        self.path = path
+        self.is_test_dependency = test_dependency
+        self.inherited_shrinkwrap = inherit_shrinkwrap
+        self.description = remote_version.getDescription()
+
+    def getName(self):
+        return self.name
+
+    def getVersion(self):
+        return self.remote_version
+
+    def getShrinkwrap(self):
+        # published modules may include their own shrinkwrap, which we can't
+        # know about in advance, in which case its dependencies will be
+        # re-satisfied once it has been installed
+        return self.inherited_shrinkwrap
+
+    def getShrinkwrapMapping(self, variant='modules'):
+        shrinkwrap = self.getShrinkwrap()
+        if shrinkwrap and variant in shrinkwrap:
+            return {
+                x['name']: x['version'] for x in shrinkwrap[variant]
+            }
+        else:
+            return {}
+
+    def descriptionKnown(self):
+        return self.description is not None
+
+    def getDependencySpecs(self, target=None):
+        return component.dependencySpecsForDescription(
+                       self.description or {},
+            shrinkwrap_mapping = self.getShrinkwrapMapping(),
+                        target = target
+        )
+
+    def installedLinked(self):
+        return False
+
+    def setTestDependency(self, status):
+        self.is_test_dependency = status
+
+    def isTestDependency(self):
+        return self.is_test_dependency
+
+    def source(self):
+        return self.remote_version.friendly_source
+
+    def url(self):
+        return self.remote_version.url
+
+    def sha256(self):
+        return getattr(self.remote_version, 'sha256', None)
+
+    def __repr__(self):
+        return u'%s@%s from %s' % (self.name, self.remote_version.friendly_version, self.source())
+
+    # planned modules are always valid (they become invalid components after
+    # installation if the downloaded description is broken)
+    def __nonzero__(self):
+        return True
+    def __bool__(self):
+        return True
+
+
+class InstallPlan(object):
+    def __init__(self, top_component, modules, errors):
+        self.top_component = top_component
+        # OrderedDict of name:Component/PlannedModule, in resolution order
+        self.modules = modules
+        self.errors = errors
+
+    def toFetch(self):
+        ''' Return the list of PlannedModules that need to be downloaded. '''
+        return [m for m in self.modules.values() if isinstance(m, PlannedModule)]
+
+    def unresolved(self):
+        ''' Return the list of PlannedModules whose dependencies could not be
+            resolved in advance (they will be resolved after downloading).
+        '''
+        return [m for m in self.toFetch() if not m.descriptionKnown()]
+
+    def downloadSizes(self):
+        ''' Return [(PlannedModule, size in bytes or None)] for all of the
+            modules that need to be downloaded.
+        '''
+        to_fetch = self.toFetch()
+        return list(zip(to_fetch, pool.map(_downloadSizeSafe, to_fetch)))
+
+    def fetch(self):
+        ''' Download and unpack all of the planned modules in parallel, then
+            run their postInstall scripts (in plan order).
+
+            returns a list of errors
+        '''
+        to_fetch = self.toFetch()
+        errors = []
+        for m, error in zip(to_fetch, pool.map(_unpackPlanned, to_fetch)):
+            if error is not None:
+                errors.append(error)
+                continue
+            r = component.Component(m.path, inherit_shrinkwrap=m.getShrinkwrap())
+            if not r:
+                errors.append(Exception(
+                    'Dependency "%s":"%s" is not a valid module.' % (m.name, m.version_required)
+                ))
+            elif r.getName() != m.name:
+                errors.append(Exception('module %s (specification %s) has incorrect name %s' % (
+                    m.name, m.version_required, r.getName()
+                )))
+            else:
+                # error code deliberately ignored, as in
+                # access.satisfyVersionByInstalling
+                r.runScript('postInstall')
+        return errors
+
+
+def _downloadSizeSafe(planned):
+    try:
+        return planned.remote_version.downloadSize()
+    except Exception as e:
+        logger.debug('could not determine size of %s: %s', planned, e)
+        return None
+
+def _unpackPlanned(planned):
+    logger.info('download %s', planned.remote_version)
+    try:
+        planned.remote_version.unpackInto(planned.path)
+        pack.invalidate(planned.path)
+    except (access_common.AccessException, vcs.VCSError) as e:
+        return e
+    return None
+
+
+def resolve(top_component, target=None, test=False, traverse_links=True):
+    ''' Resolve the dependency graph of top_component without downloading
+        anything, and return an InstallPlan.
+
+        The arguments have the same meaning as for
+        Component.satisfyDependenciesRecursive.
+    '''
+    modules_path = top_component.modulesPath()
+    available = OrderedDict([(top_component.getName(), top_component)])
+    search_dirs = search_paths.SearchPaths()
+    processed = set()
+    errors = []
+
+    def satisfy(dspec, dep_of):
+        r = access.satisfyFromAvailable(dspec.name, available)
+        if r:
+            if r.isTestDependency() and not dspec.is_test_dependency:
+                r.setTestDependency(False)
+            return r
+        r = access.satisfyVersionFromSearchPaths(
+            dspec.name,
+            dspec.versionReq(),
+            search_dirs,
+            False,
+            inherit_shrinkwrap = dep_of.getShrinkwrap()
+        )
+        if r:
+            r.setTestDependency(dspec.is_test_dependency)
+            return r
+        default_path = os.path.join(modules_path, dspec.name)
+        if module_store.isUserLink(default_path):
+            return component.Component(
+                                   default_path,
+                 test_dependency = dspec.is_test_dependency,
+                installed_linked = True,
+              inherit_shrinkwrap = dep_of.getShrinkwrap()
+            )
+        v = access.latestSuitableVersion(dspec.name, dspec.versionReq(), registry='modules', quiet=True)
+        return PlannedModule(
+                           dspec.name,
+                           dspec.versionReq(),
+                           v,
+                           default_path,
+             test_dependency = dspec.is_test_dependency,
+          inherit_shrinkwrap = dep_of.getShrinkwrap()
+        )
+
+    def satisfyOrError(args):
+        dspec, dep_of = args
+        try:
+            return (satisfy(dspec, dep_of), None)
+        except (access_common.Unavailable, vcs.VCSError) as e:
+            return (None, e)
+
+    def process(node, test):
+        if isinstance(node, component.Component):
+            search_dirs.append(node.modulesPath())
+        if node.isTestDependency():
+            test = False
+        specs = node.getDependencySpecs(target=target)
+        if not test:
+            specs = [x for x in specs if not x.is_test_dependency]
+        results = pool.map(satisfyOrError, [(x, node) for x in specs])
+        processed.add(node.getName())
+        need_recursion = []
+        for dspec, (r, error) in zip(specs, results):
+            if error is not None:
+                errors.append(error)
+                continue
+            available[dspec.name] = r
+            if not r or r.getName() in processed:
+                continue
+            if r.installedLinked() and not traverse_links:
+                continue
+            if isinstance(r, PlannedModule) and not r.descriptionKnown():
+                continue
+            need_recursion.append(r)
+        if test == 'toplevel':
+            test = False
+        for r in need_recursion:
+            process(r, test)
+
+    process(top_component, test)
+    del available[top_component.getName()]
+    return InstallPlan(top_component, available, errors)
+
+
+def fetchAll(top_component, target=None, test=False, traverse_links=True):
+    ''' Repeatedly resolve and fetch install plans for top_component until
+        nothing more can be downloaded in advance.
+
+        Errors are only logged at debug level: the dependencies should be
+        subsequently satisfied with Component.satisfyDependenciesRecursive,
+        which will report them.
+
+        returns the number of modules that were fetched (or attempted)
+    '''
+    fetched = set()
+    while True:
+        plan = resolve(top_component, target=target, test=test, traverse_links=traverse_links)
+        for error in plan.errors:
+            logger.debug('resolving install plan: %s', error)
+        to_fetch = set(m.getName() for m in plan.toFetch())
+        # if something we already fetched is planned again, then it didn't
+        # turn out to be what was planned (for example a git repository
+        # providing the wrong version): leave it to be reported later
+        if not to_fetch or (to_fetch & fetched):
+            break
+        fetch_errors = plan.fetch()
+        fetched |= to_fetch
+        for error in fetch_errors:
+            logger.debug('fetching install plan: %s', error)
+        # if nothing was left unresolved then there's nothing more to do,
+        # otherwise the modules just installed may provide the descriptions
+        # needed to plan the next batch. Stop if there were errors, to avoid
+        # repeatedly re-trying a failing download:
+        if fetch_errors or not plan.unresolved():
+            break
+    return len(fetched)
@@ -0,0 +1,246 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import os
+import json
+import time
+import errno
+import hashlib
+import logging
+import tempfile
+import threading
+
+# folders, , where yotta stores things, internal
+from yotta.lib import folders
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# settings, , load and save settings, internal
+from yotta.lib import settings
+# sessions, , shared HTTP sessions, internal
+from yotta.lib import sessions
+# access_common, , things shared between different component access modules, internal
+from yotta.lib import access_common
+
+# This module caches registry metadata (currently versions listings) on disk,
+# in the metadata subdirectory of the cache directory. Each cached response is
+# stored with the ETag and Last-Modified headers that the server returned, so
+# that once it is older than the TTL ("metadataCacheTTL" setting, in seconds)
+# it can be cheaply revalidated with a conditional request.
+#
+# Responses may depend on the credentials that they were requested with (for
+# example listings of private modules), so they are cached separately for
+# each identity that the caller specifies (typically derived from the
+# credentials, but not the credentials themselves, which aren't saved).
+#
+# Within a single process each URL is requested at most once for each
+# identity: concurrent requests (for example from different threads of the
+# shared pool) are merged into a single request, and later requests use the
+# result.
+
+Default_TTL = 300
+Metadata_Subdirectory = 'metadata'
+
+logger = logging.getLogger('cache')
+
+# private state
+_ttl = None
+_memory = {}
+_inflight = {}
+_lock = threading.Lock()
+_stats = {'fresh': 0, 'revalidated': 0, 'fetched': 0}
+
+
+class CachedResponse(object):
+    ''' A response-like object representing a cached (or just fetched) GET
+        response that was successful (200) or not found (404).
+    '''
+    def __init__(self, entry):
+        self.status_code = entry['status']
+        self.text = entry['text']
+        self.headers = {}
+        if entry.get('etag'):
+            self.headers['ETag'] = entry['etag']
+
+    def raise_for_status(self):
+        # only 200 and 404 responses are cached, and neither is an error for
+        # the callers of this module
+        pass
+
+
+class _InFlight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+def setTTL(ttl):
+    ''' Override the "metadataCacheTTL" setting for this process: use 0 to
+        revalidate all cached metadata before use.
+    '''
+    global _ttl
+    _ttl = ttl
+
+def getTTL():
+    if _ttl is not None:
+        return _ttl
+    ttl = settings.get('metadataCacheTTL')
+    try:
+        return float(ttl)
+    except (TypeError, ValueError):
+        return Default_TTL
+
+def statistics():
+    ''' Return a copy of the number of requests that were satisfied fresh from
+        the cache, revalidated, or fetched in full during this process.
+    '''
+    with _lock:
+        return dict(_stats)
+
+def _cacheKey(url, identity):
+    return hashlib.sha256(
+        ('%s\n%s' % (url, identity or '')).encode('utf-8')
+    ).hexdigest()
+
+def _cachePath(key):
+    return os.path.join(folders.cacheDirectory(), Metadata_Subdirectory, key + '.json')
+
+def _readEntry(url, key):
+    try:
+        with open(_cachePath(key), 'r') as f:
+            entry = json.load(f)
+    except (IOError, OSError, ValueError):
+        # missing or corrupt entries are just not cached
+        return None
+    if entry.get('url') != url or entry.get('key') != key:
+        return None
+    return entry
+
+def _writeEntry(url, key, entry):
+    path = _cachePath(key)
+    dirname = os.path.dirname(path)
+    try:
+        fsutils.mkDirP(dirname)
+        fd, temp_path = tempfile.mkstemp(dir=dirname, suffix='.locked')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        try:
+            os.rename(temp_path, path)
+        except OSError as e:
+            # windows can't rename over an existing file
+            if e.errno != errno.EEXIST:
+                raise
+            fsutils.rmF(path)
+            os.rename(temp_path, path)
+    except (IOError, OSError) as e:
+        logger.debug('failed to write metadata cache for %s: %s', url, e)
+
+def _isFresh(entry):
+    return (time.time() - entry['fetched']) < getTTL()
+
+def _fetch(url, key, headers, entry):
+    request_headers = dict(headers or {})
+    if entry is not None and entry['status'] == 200:
+        if entry.get('etag'):
+            request_headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            request_headers['If-Modified-Since'] = entry['last_modified']
+    logger.debug('GET %s, %s', url, request_headers)
+    response = sessions.get(url, headers=request_headers)
+    if response.status_code == 304 and entry is not None:
+        logger.debug('%s not modified', url)
+        entry = dict(entry)
+        entry['fetched'] = time.time()
+        with _lock:
+            _stats['revalidated'] += 1
+    elif response.status_code in (200, 404):
+        entry = {
+                     'url': url,
+                     'key': key,
+                  'status': response.status_code,
+                    'text': response.text,
+                    'etag': response.headers.get('ETag', None),
+           'last_modified': response.headers.get('Last-Modified', None),
+                 'fetched': time.time()
+        }
+        with _lock:
+            _stats['fetched'] += 1
+    else:
+        # other responses are errors, which are not cached: return the
+        # response itself so that the caller can raise the error
+        return None, response
+    _writeEntry(url, key, entry)
+    return entry, None
+
+def _getOffline(url, key):
+    with _lock:
+        entry = _memory.get(key, None)
+    if entry is None:
+        entry = _readEntry(url, key)
+    if entry is None:
+        logger.debug('%s is not cached (offline)', url)
+        return None
+    with _lock:
+        _memory[key] = entry
+        _stats['fresh'] += 1
+    return CachedResponse(entry)
+
+def get(url, headers=None, identity=None):
+    ''' GET url, using the metadata cache. Returns a response object with
+        status_code, text and raise_for_status().
+
+        identity is a string identifying the credentials in headers (if
+        any): responses are only shared between requests made with the same
+        identity.
+
+        When offline (see access_common.isOffline) any cached response is
+        used regardless of its age, and None is returned if there isn't one.
+    '''
+    key = _cacheKey(url, identity)
+    if access_common.isOffline():
+        return _getOffline(url, key)
+    with _lock:
+        # anything already fetched (or revalidated) by this process is used
+        # for the rest of the process, so that the resolution of a single
+        # command always sees consistent metadata
+        entry = _memory.get(key, None)
+        if entry is not None:
+            _stats['fresh'] += 1
+            return CachedResponse(entry)
+        pending = _inflight.get(key, None)
+        owner = pending is None
+        if owner:
+            pending = _InFlight()
+            _inflight[key] = pending
+    if not owner:
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error #pylint: disable=raising-bad-type
+        return pending.entry
+    try:
+        entry = _readEntry(url, key)
+        if entry is not None and _isFresh(entry):
+            with _lock:
+                _stats['fresh'] += 1
+            result = CachedResponse(entry)
+        else:
+            entry, error_response = _fetch(url, key, headers, entry)
+            if error_response is not None:
+                result = error_response
+            else:
+                result = CachedResponse(entry)
+        if entry is not None:
+            with _lock:
+                _memory[key] = entry
+        pending.entry = result
+        return result
+    except Exception as e:
+        pending.error = e
+        raise
+    finally:
+        with _lock:
+            del _inflight[key]
+        pending.done.set()
@@ -0,0 +1,99 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import os
+import shutil
+import logging
+import tempfile
+
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# folders, , where yotta stores things, internal
+from yotta.lib import folders
+# settings, , load and save settings, internal
+from yotta.lib import settings
+
+# The module store is an opt-in ("moduleStore" setting) shared directory of
+# installed modules and targets, keyed by the same content-based keys as the
+# download cache (the sha256 hash of the tarball, for the registry). When it
+# is enabled, yotta_modules/<name> and yotta_targets/<name> are symlinks into
+# the store instead of separate copies, so any number of workspaces share
+# a single copy of each version of each module.
+#
+# Store entries are read-only, and are never modified once they have been
+# created. Modules with postInstall scripts (which may write into their own
+# directory) are always copied instead.
+#
+# Unlike links created by `yotta link`, links into the store are not treated
+# as "installed linked" modules: they are updated and replaced just like
+# modules that were copied into place.
+
+Origin_Info_Fname = '.yotta_origin.json'
+
+logger = logging.getLogger('cache')
+
+def isEnabled():
+    enabled = settings.get('moduleStore')
+    if hasattr(enabled, 'lower'):
+        return enabled.lower() in ('1', 'true', 'yes', 'on')
+    return bool(enabled)
+
+def storeDirectory():
+    return settings.get('moduleStoreDirectory') or \
+           os.path.join(folders.userSettingsDirectory(), 'store')
+
+def isStoreLink(path):
+    ''' Return True if path is a link into the module store. '''
+    if not fsutils.isLink(path):
+        return False
+    store = fsutils.realpath(storeDirectory())
+    return fsutils.realpath(path).startswith(store + os.sep)
+
+def isUserLink(path):
+    ''' Return True if path is a link created by `yotta link` (or by hand),
+        rather than a link into the module store.
+    '''
+    return fsutils.isLink(path) and not isStoreLink(path)
+
+def _storeEntry(key, tree, origin_info_path):
+    ''' Return the path of the store entry for key, creating it from the
+        (read-only) extracted tree if necessary.
+    '''
+    entry = os.path.join(storeDirectory(), key)
+    if os.path.isdir(entry):
+        return entry
+    fsutils.mkDirP(storeDirectory())
+    temp_directory = tempfile.mkdtemp(dir=storeDirectory(), suffix='.locked')
+    try:
+        os.rmdir(temp_directory)
+        # files are hard-linked from the tree in the cache where possible, so
+        # they remain valid even if the cache is pruned
+        fsutils.linkOrCopyTree(tree, temp_directory)
+        if os.path.isfile(origin_info_path):
+            fsutils.rmF(os.path.join(temp_directory, Origin_Info_Fname))
+            shutil.copy(origin_info_path, os.path.join(temp_directory, Origin_Info_Fname))
+        try:
+            os.rename(temp_directory, entry)
+            temp_directory = None
+        except OSError as e:
+            # someone else created the same entry first, which is fine
+            if not os.path.isdir(entry):
+                raise
+    finally:
+        if temp_directory is not None:
+            fsutils.rmRf(temp_directory)
+    return entry
+
+def linkInto(key, tree, origin_info_path, to_directory):
+    ''' Install the extracted tree for key at to_directory, as a link to an
+        entry in the module store.
+    '''
+    entry = _storeEntry(key, tree, origin_info_path)
+    fsutils.mkDirP(os.path.dirname(to_directory))
+    # (rmRf removes links without following them)
+    fsutils.rmRf(to_directory)
+    fsutils.symlink(entry, to_directory)
+    logger.debug('linked %s -> %s', to_directory, entry)
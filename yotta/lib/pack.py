@@ -4,7 +4,6 @@
 # See LICENSE file for details.
 
 # standard library modules, , ,
-import json
 import os
 from collections import OrderedDict
 import tarfile
@@ -13,18 +12,16 @@ import logging
 import errno
 import copy
 import hashlib
-
-# PyPi/standard library > 3.4
-# it has to be PurePath
-from pathlib import PurePath
-
-# JSON Schema, pip install jsonschema, Verify JSON Schemas, MIT
-import jsonschema
+import threading
 
 # Ordered JSON, , read & write json, internal
 from yotta.lib import ordered_json
 # fsutils, , misc filesystem utils, internal
 from yotta.lib import fsutils
+# ignores, , match paths against ignore patterns, internal
+from yotta.lib import ignores
+# schema_validation, , validate descriptions against JSON schemas, internal
+from yotta.lib import schema_validation
 # Registry Access, , access packages in the registry, internal
 from yotta.lib import registry_access
 
@@ -133,24 +130,239 @@ class DependencySpec(object):
 def tryReadJSON(filename, schemaname):
     r = None
     try:
-        with open(filename, 'r') as jsonfile:
-            r = ordered_json.load(filename)
-            if schemaname is not None:
-                with open(schemaname, 'r') as schema_file:
-                    schema = json.load(schema_file)
-                    validator = jsonschema.Draft4Validator(schema)
-                    for error in validator.iter_errors(r):
-                        logger.error(
-                            '%s is not valid under the schema: %s value %s',
-                            filename,
-                            u'.'.join([str(x) for x in error.path]),
-                            error.message
-                        )
+        with open(filename, 'rb') as jsonfile:
+            data = jsonfile.read()
+        r = ordered_json.loads(data.decode('utf-8'))
+        if schemaname is not None:
+            for error_path, message in schema_validation.errors(schemaname, data, r):
+                logger.error(
+                    '%s is not valid under the schema: %s value %s',
+                    filename,
+                    error_path,
+                    message
+                )
+    except IOError as e:
+        if e.errno != errno.ENOENT:
+            raise
+    return r
+
+# Reading the description, ignore file and shrinkwrap of a module or target
+# is relatively expensive, and the same directories are loaded many times
+# while resolving dependencies, so what is read from each directory is cached
+# for the rest of the process (or until the files it was read from change,
+# or invalidate() is called). Everything that depends on how a module is
+# being used (whether it is a test dependency, the shrinkwrap it inherits,
+# ...) belongs to the Pack objects, which are created for each use.
+_directory_cache = {}
+_description_cache = {}
+_directory_cache_lock = threading.Lock()
+
+class _DirectoryState(object):
+    ''' What was read from a module or target directory: shared between all
+        of the Pack objects for the directory, so must not be modified.
+    '''
+    def __init__(self, description, error, ignore_patterns, shrinkwrap, vcs):
+        self.description = description
+        self.error = error
+        self.ignore_patterns = ignore_patterns
+        self.shrinkwrap = shrinkwrap
+        self.vcs = vcs
+
+def _fileStamp(path):
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        if e.errno in (errno.ENOENT, errno.ENOTDIR):
+            return None
+        raise
+    return (getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size)
+
+def _directoryStamp(path, description_filename):
+    return (
+        description_filename,
+        _fileStamp(os.path.join(path, description_filename)),
+        _fileStamp(os.path.join(path, Ignore_List_Fname)),
+        _fileStamp(os.path.join(path, Shrinkwrap_Fname))
+    )
+
+def directoryStamp(path, description_filename):
+    ''' Return a (hashable) value which changes whenever any of the files
+        that a Pack reads from the directory path (or the directory it links
+        to) change.
+    '''
+    return _directoryStamp(path, description_filename)
+
+def invalidate(path):
+    ''' Discard anything cached about the module or target at path: this must
+        be called whenever the files in it are replaced or modified by yotta.
+    '''
+    path = fsutils.realpath(path)
+    with _directory_cache_lock:
+        _directory_cache.pop(path, None)
+        for key in [k for k in _description_cache if k[0] == path]:
+            del _description_cache[key]
+
+def _loadDirectory(path, description_filename, schema_filename):
+    ''' Return the _DirectoryState for the (real) path, reading it if it
+        isn't already cached. Raises InvalidDescription if the description
+        file can't be read.
+    '''
+    stamp = _directoryStamp(path, description_filename)
+    with _directory_cache_lock:
+        cached = _directory_cache.get(path, None)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    state = _readDirectory(path, description_filename, schema_filename)
+    # directories without a description are cheap to read, and are mostly
+    # the places where a module will be installed, so don't cache them:
+    if stamp[1] is not None:
+        with _directory_cache_lock:
+            _directory_cache[path] = (stamp, state)
+    return state
+
+def _readDescription(path, description_filename):
+    ''' Return (the contents, the parsed description) of the description
+        file in the (real) path, or (None, None) if there isn't one. The
+        description is shared, and must not be modified. Raises
+        InvalidDescription if the description can't be parsed, or is missing
+        the name or version.
+    '''
+    # version, , represent versions and specifications, internal
+    from yotta.lib import version
+
+    description_file = os.path.join(path, description_filename)
+    stamp = _fileStamp(description_file)
+    key = (path, description_filename)
+    with _directory_cache_lock:
+        cached = _description_cache.get(key, None)
+    if cached is not None and cached[0] == stamp:
+        return cached[1:]
+    if stamp is None or not os.path.isfile(description_file):
+        return (None, None)
+    try:
+        with open(description_file, 'rb') as f:
+            data = f.read()
+        description = ordered_json.loads(data.decode('utf-8'))
+        if description:
+            if not 'name' in description:
+                raise Exception('missing "name"')
+            if 'version' in description:
+                version.Version(description['version'])
+            else:
+                raise Exception('missing "version"')
+    except Exception as e:
+        error = "Description invalid %s: %s" % (description_file, e);
+        logger.debug(error)
+        raise InvalidDescription(error)
+    with _directory_cache_lock:
+        _description_cache[key] = (stamp, data, description)
+    return (data, description)
+
+def _readDirectory(path, description_filename, schema_filename):
+    # version, , represent versions and specifications, internal
+    from yotta.lib import version
+    # vcs, , represent version controlled directories, internal
+    from yotta.lib import vcs
+
+    error = None
+    description_data, description = _readDescription(path, description_filename)
+    if description_data is None:
+        error = "No %s file." % description_filename
+        description = OrderedDict()
+    ignore_patterns = copy.copy(Default_Publish_Ignore)
+    try:
+        with open(os.path.join(path, Ignore_List_Fname), 'r') as ignorefile:
+            ignore_patterns += _parseIgnoreFile(ignorefile)
     except IOError as e:
         if e.errno != errno.ENOENT:
             raise
+    # warn about invalid yotta versions before schema errors (as new yotta
+    # might introduce new schema)
+    yotta_version_spec = None
+    if description and description.get('yotta', None):
+        try:
+            yotta_version_spec = version.Spec(description['yotta'])
+        except ValueError as e:
+            logger.warning(
+                "could not parse yotta version spec '%s' from %s: it "+
+                "might require a newer version of yotta",
+                description['yotta'],
+                description['name']
+            )
+    if yotta_version_spec is not None:
+        import yotta
+        yotta_version = version.Version(yotta.__version__)
+        if not yotta_version_spec.match(yotta_version):
+            error = "requires yotta version %s (current version is %s). see http://yottadocs.mbed.com for update instructions" % (
+                str(yotta_version_spec),
+                str(yotta_version)
+            )
+
+    if description and schema_filename and not path in Pack.schema_errors_displayed:
+        Pack.schema_errors_displayed.add(path)
+        have_errors = False
+        for error_path, message in schema_validation.errors(schema_filename, description_data, description):
+            if not have_errors:
+                logger.warning(u'%s has invalid %s:' % (
+                    os.path.split(path.rstrip('/'))[1],
+                    description_filename
+                ))
+                have_errors = True
+            logger.warning(u"  %s value %s" % (error_path, message))
+        # for now schema validation errors aren't fatal... will be soon
+        # though!
+        #if have_errors:
+        #    raise InvalidDescription('Invalid %s' % description_filename)
+    shrinkwrap = None
+    if description:
+        shrinkwrap = tryReadJSON(os.path.join(path, Shrinkwrap_Fname), Shrinkwrap_Schema)
+    return _DirectoryState(description, error, ignore_patterns, shrinkwrap, vcs.getVCS(path))
+
+def _parseIgnoreFile(f):
+    r = []
+    for l in f:
+        l = l.rstrip('\n\r')
+        if not l.startswith('#') and len(l):
+            r.append(l)
     return r
 
+class PackHeader(object):
+    ''' The parts of a module or target description that are needed to
+        decide whether it satisfies a version requirement, which are much
+        cheaper to read than a whole Component or Target (see probe()).
+    '''
+    def __init__(self, path, description, installed_linked):
+        # version, , represent versions and specifications, internal
+        from yotta.lib import version
+        self.path = path
+        self.name = description['name']
+        self.version = version.Version(description['version'])
+        self.yotta_version_spec = description.get('yotta', None)
+        self.installed_linked = installed_linked
+
+    def getName(self):
+        return self.name
+
+    def getVersion(self):
+        return self.version
+
+    def installedLinked(self):
+        return self.installed_linked
+
+    def __repr__(self):
+        return '<%s %s@%s at %s>' % (type(self).__name__, self.name, self.version, self.path)
+
+def probe(path, description_filename, installed_linked, valid=None):
+    ''' Return a PackHeader for the module or target at path if it has a
+        valid description (for which valid(description) is also true, if
+        valid is specified), otherwise None. Raises InvalidDescription in the
+        same cases that constructing a Component or Target does.
+    '''
+    description_data, description = _readDescription(fsutils.realpath(path), description_filename)
+    if not description or (valid is not None and not valid(description)):
+        return None
+    return PackHeader(path, description, installed_linked)
+
 # Pack represents the common parts of Target and Component objects (versions,
 # VCS, etc.)
 
@@ -168,86 +380,25 @@ class Pack(object):
         ):
         # version, , represent versions and specifications, internal
         from yotta.lib import version
-        # vcs, , represent version controlled directories, internal
-        from yotta.lib import vcs
 
         # resolve links at creation time, to minimise path lengths:
         self.unresolved_path = path
         self.path = fsutils.realpath(path)
         self.installed_linked = installed_linked
-        self.vcs = None
-        self.error = None
         self.latest_suitable_version = latest_suitable_version
-        self.version = None
         self.description_filename = description_filename
         self.ignore_list_fname = Ignore_List_Fname
-        self.ignore_patterns = copy.copy(Default_Publish_Ignore)
         self.origin_info = None
-        description_file = os.path.join(path, description_filename)
-        if os.path.isfile(description_file):
-            try:
-                self.description = ordered_json.load(description_file)
-                if self.description:
-                    if not 'name' in self.description:
-                        raise Exception('missing "name"')
-                    if 'version' in self.description:
-                        self.version = version.Version(self.description['version'])
-                    else:
-                        raise Exception('missing "version"')
-            except Exception as e:
-                self.description = OrderedDict()
-                self.error = "Description invalid %s: %s" % (description_file, e);
-                logger.debug(self.error)
-                raise InvalidDescription(self.error)
-        else:
-            self.error = "No %s file." % description_filename
-            self.description = OrderedDict()
-        try:
-            with open(os.path.join(path, self.ignore_list_fname), 'r') as ignorefile:
-                self.ignore_patterns += self._parseIgnoreFile(ignorefile)
-        except IOError as e:
-            if e.errno != errno.ENOENT:
-                raise
-        # warn about invalid yotta versions before schema errors (as new yotta
-        # might introduce new schema)
-        yotta_version_spec = None
-        if self.description and self.description.get('yotta', None):
-            try:
-                yotta_version_spec = version.Spec(self.description['yotta'])
-            except ValueError as e:
-                logger.warning(
-                    "could not parse yotta version spec '%s' from %s: it "+
-                    "might require a newer version of yotta",
-                    self.description['yotta'],
-                    self.description['name']
-                )
-        if yotta_version_spec is not None:
-            import yotta
-            yotta_version = version.Version(yotta.__version__)
-            if not yotta_version_spec.match(yotta_version):
-                self.error = "requires yotta version %s (current version is %s). see http://yottadocs.mbed.com for update instructions" % (
-                    str(yotta_version_spec),
-                    str(yotta_version)
-                )
-
-        if self.description and schema_filename and not self.path in self.schema_errors_displayed:
-            self.schema_errors_displayed.add(self.path)
-            have_errors = False
-            with open(schema_filename, 'r') as schema_file:
-                schema = json.load(schema_file)
-                validator = jsonschema.Draft4Validator(schema)
-                for error in validator.iter_errors(self.description):
-                    if not have_errors:
-                        logger.warning(u'%s has invalid %s:' % (
-                            os.path.split(self.path.rstrip('/'))[1],
-                            description_filename
-                        ))
-                        have_errors = True
-                    logger.warning(u"  %s value %s" % (u'.'.join([str(x) for x in error.path]), error.message))
-            # for now schema validation errors aren't fatal... will be soon
-            # though!
-            #if have_errors:
-            #    raise InvalidDescription('Invalid %s' % description_filename)
+        # everything read from the directory is shared with other instances
+        # for the same directory, so take copies of anything that might be
+        # modified:
+        state = _loadDirectory(self.path, description_filename, schema_filename)
+        self.description = copy.deepcopy(state.description)
+        self.version = version.Version(self.description['version']) if self.description else None
+        self.error = state.error
+        self.ignore_patterns = copy.copy(state.ignore_patterns)
+        self.ignore_matcher = None
+        self.vcs = state.vcs
         self.inherited_shrinkwrap = None
         self.shrinkwrap = None
         # we can only apply shrinkwraps to instances with valid descriptions:
@@ -258,13 +409,12 @@ class Pack(object):
         # we are not fully constructed)
         if self.description:
             self.inherited_shrinkwrap = inherit_shrinkwrap
-            self.shrinkwrap = tryReadJSON(os.path.join(path, Shrinkwrap_Fname), Shrinkwrap_Schema)
+            self.shrinkwrap = state.shrinkwrap
             if self.shrinkwrap:
                 logger.warning('dependencies of %s are pegged by yotta-shrinkwrap.json', self.getName())
                 if self.inherited_shrinkwrap:
                     logger.warning('shrinkwrap in %s overrides inherited shrinkwrap', self.getName())
         #logger.info('%s created with inherited_shrinkwrap %s', self.getName(), self.inherited_shrinkwrap)
-        self.vcs = vcs.getVCS(path)
 
     def getShrinkwrap(self):
         return self.shrinkwrap or self.inherited_shrinkwrap
@@ -367,14 +517,6 @@ class Pack(object):
         else:
             return []
 
-    def _parseIgnoreFile(self, f):
-        r = []
-        for l in f:
-            l = l.rstrip('\n\r')
-            if not l.startswith('#') and len(l):
-                r.append(l)
-        return r
-
     def ignores(self, path):
         ''' Test if this module ignores the file at "path", which must be a
             path relative to the root of the module.
@@ -382,19 +524,26 @@ class Pack(object):
             If a file is within a directory that is ignored, the file is also
             ignored.
         '''
-        test_path = PurePath('/', path)
-
-        # also check any parent directories of this path against the ignore
-        # patterns:
-        test_paths = tuple([test_path] + list(test_path.parents))
-
-        for exp in self.ignore_patterns:
-            for tp in test_paths:
-                if tp.match(exp):
-                    logger.debug('"%s" ignored ("%s" matched "%s")', path, tp, exp)
-                    return True
+        if self.ignore_matcher is None:
+            self.ignore_matcher = ignores.matcherFor(self.ignore_patterns)
+        if self.ignore_matcher.ignores(path):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('"%s" ignored (matched "%s")', path, self.ignore_matcher.matchingPattern(path))
+            return True
         return False
 
+    def walk(self, directory):
+        ''' Like os.walk(directory) for a directory within this module, but
+            without descending into ignored subdirectories (everything in an
+            ignored directory is ignored). Files are not filtered.
+        '''
+        if self.ignores(os.path.relpath(directory, self.path)):
+            return
+        for root, dirs, files in os.walk(directory):
+            relroot = os.path.relpath(root, self.path)
+            dirs[:] = [d for d in dirs if not self.ignores(os.path.join(relroot, d))]
+            yield root, dirs, files
+
     def setVersion(self, version):
         self.version = version
         self.description['version'] = str(self.version)
@@ -407,6 +556,7 @@ class Pack(object):
             package description file in the component directory.
         '''
         ordered_json.dump(os.path.join(self.path, self.description_filename), self.description)
+        invalidate(self.path)
         if self.vcs:
             self.vcs.markForCommit(self.description_filename)
 
@@ -525,18 +675,21 @@ class Pack(object):
         return script
 
 
-    @fsutils.dropRootPrivs
     def runScript(self, scriptname, additional_environment=None):
         ''' Run the specified script from the scripts section of the
             module.json file in the directory of this module.
         '''
-        import subprocess
-        import shlex
-
         command = self.getScript(scriptname)
         if command is None:
             logger.debug('%s has no script %s', self, scriptname)
             return 0
+        # only start a process (to drop privileges in) for scripts that exist:
+        # most modules don't have most scripts
+        return self._runScript(scriptname, command, additional_environment)
+
+    @fsutils.dropRootPrivs
+    def _runScript(self, scriptname, command, additional_environment=None):
+        import subprocess
 
         if not len(command):
             logger.error("script %s of %s is empty", scriptname, self.getName())
@@ -1,13 +1,72 @@
-# Copyright 2014 ARM Limited
+# Copyright 2014-2016 ARM Limited
 #
 # Licensed under the Apache License, Version 2.0
 # See LICENSE file for details.
 
+# standard library modules, , ,
+import threading
 from multiprocessing.pool import ThreadPool
 
+# settings, , load and save settings, internal
+from yotta.lib import settings
+
 # this module just provides a shared thread pool for all multiprocessing users
-# to use: the number of threads is high because tasks are expected to be
-# IO-bound
+# to use. Tasks are expected to be IO-bound (downloading and unpacking
+# modules), so threads are used rather than processes.
+#
+# The number of threads is set by the --jobs command line option, or the
+# "jobs" setting. If neither is set then everything runs serially in the
+# calling thread, exactly as if the built-in map() was used.
+
+Default_Jobs = 1
+
+# private state
+_jobs = None
+_pool = None
+_pool_lock = threading.Lock()
+_worker_state = threading.local()
+
+def setJobs(jobs):
+    ''' Set the number of parallel jobs (overrides the "jobs" setting). Must
+        be called before the pool is first used.
+    '''
+    global _jobs
+    _jobs = max(int(jobs), 1)
+
+def getJobs():
+    ''' Return the number of parallel jobs to use. '''
+    if _jobs is not None:
+        return _jobs
+    # settings read from environment variables are strings, so convert:
+    jobs = settings.get('jobs')
+    try:
+        return max(int(jobs), 1)
+    except (TypeError, ValueError):
+        return Default_Jobs
+
+def _getPool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(getJobs(), initializer=_markWorker)
+        return _pool
+
+def _markWorker():
+    _worker_state.is_worker = True
+
+def _isWorker():
+    return getattr(_worker_state, 'is_worker', False)
 
-pool = ThreadPool(4)
+def map(fn, iterable):
+    ''' Call fn for each item in iterable, possibly in parallel, and return a
+        list of the results in the same order as the input (like the built-in
+        map() in python 2).
 
+        If only a single job is allowed, or if called from a task that is
+        already running in the pool (where waiting on the pool could
+        deadlock), then fn is called serially in the calling thread.
+    '''
+    items = list(iterable)
+    if getJobs() <= 1 or len(items) <= 1 or _isWorker():
+        return [fn(x) for x in items]
+    return _getPool().map(fn, items)
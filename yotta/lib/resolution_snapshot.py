@@ -0,0 +1,194 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import os
+import json
+import errno
+import hashlib
+import logging
+import tempfile
+
+# Ordered JSON, , read & write json, internal
+from yotta.lib import ordered_json
+# Pack, , common parts of Components/Targets, internal
+from yotta.lib import pack
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# dependency_graph, , the resolved graph of dependencies, internal
+from yotta.lib.dependency_graph import DependencyGraph
+
+# Save the result of resolving the target and dependencies for a build in the
+# build directory, so that the next build can re-use it without installing
+# or resolving anything (which means reading and searching for every module).
+#
+# The snapshot records where each target and module was found, and a
+# fingerprint of everything that resolution depends on:
+#
+#  * the command-line (target name and version, --config, and which test
+#    dependencies are wanted), and the version of yotta,
+#  * the module.json, shrinkwrap and config.json of the module being built,
+#  * the description, ignore and shrinkwrap files of every target and module,
+#    and where each one links to,
+#  * the contents of every directory that targets and modules are searched
+#    for in (so that installing or linking anything is noticed).
+#
+# If the fingerprint of the recorded modules and targets still matches, then
+# resolving again would find the same things.
+
+Snapshot_Fname = 'yotta_resolution.json'
+Snapshot_Format = 1
+
+logger = logging.getLogger('build')
+
+
+def _linkedTo(path):
+    # the directories being listed are real paths, so only the things in
+    # them which are links need resolving:
+    if fsutils.isLink(path):
+        return fsutils.realpath(path)
+    return None
+
+def _listingInputs(directory, description_filename):
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError as e:
+        if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+            raise
+        return None
+    r = []
+    for name in names:
+        path = os.path.join(directory, name)
+        r.append((name, _linkedTo(path), pack.directoryStamp(path, description_filename)))
+    return r
+
+def _fingerprint(component, target_paths, module_paths, invocation):
+    # Component, , represents an installed component, internal
+    from yotta.lib import component as component_module
+    # Target, , represents an installed target, internal
+    from yotta.lib import target as target_module
+    # yotta version
+    import yotta
+
+    inputs = [
+        ('invocation', yotta.__version__, invocation),
+        ('module', component.path, pack.directoryStamp(component.path, component_module.Component_Description_File)),
+        ('config', pack.directoryStamp(component.path, target_module.App_Config_File)),
+        ('targets', target_paths, _listingInputs(component.targetsPath(), target_module.Target_Description_File)),
+        ('dependencies', module_paths)
+    ]
+    # every module (and target) was found in one of these directories, so
+    # their listings include the state of each module:
+    modules_dirs = set([component.modulesPath()])
+    for path in module_paths:
+        modules_dirs.add(os.path.join(_linkedTo(path) or path, 'yotta_modules'))
+    for directory in sorted(modules_dirs):
+        inputs.append(('modules', directory, _listingInputs(directory, component_module.Component_Description_File)))
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _invocation(target_name_and_version, additional_config, install_test_deps):
+    return [target_name_and_version, additional_config, install_test_deps]
+
+def save(builddir, component, graph, target_name_and_version, additional_config, install_test_deps):
+    ''' Save the resolution of the target and dependencies in graph (a
+        DependencyGraph including test dependencies) for building component.
+    '''
+    target = graph.target
+    snapshot = {
+             'format': Snapshot_Format,
+        'fingerprint': None,
+             'target': [
+            {'path': t.unresolved_path, 'installed_linked': bool(t.installedLinked())} for t in target.hierarchy
+        ],
+            'modules': [
+            {
+                            'name': name,
+                            'path': c.unresolved_path,
+                'installed_linked': bool(c.installedLinked()),
+                 'test_dependency': bool(c.isTestDependency())
+            } for name, c in graph.components().items()
+        ]
+    }
+    snapshot['fingerprint'] = _fingerprint(
+        component,
+        [x['path'] for x in snapshot['target']],
+        [x['path'] for x in snapshot['modules']],
+        _invocation(target_name_and_version, additional_config, install_test_deps)
+    )
+    try:
+        fsutils.mkDirP(builddir)
+        fd, temp_path = tempfile.mkstemp(dir=builddir, suffix='.locked')
+        with os.fdopen(fd, 'w') as f:
+            f.write(ordered_json.dumps(snapshot))
+        fsutils.rmF(os.path.join(builddir, Snapshot_Fname))
+        os.rename(temp_path, os.path.join(builddir, Snapshot_Fname))
+    except (IOError, OSError) as e:
+        logger.debug('failed to save resolution snapshot: %s', e)
+
+def discard(builddir):
+    ''' Remove any saved resolution snapshot from builddir. '''
+    fsutils.rmF(os.path.join(builddir, Snapshot_Fname))
+
+def load(builddir, component, target_name_and_version, additional_config, install_test_deps):
+    ''' Return the DependencyGraph (including test dependencies, with the
+        derived target as its target) saved in builddir for building
+        component, if nothing it was resolved from has changed since,
+        otherwise None.
+    '''
+    # Component, , represents an installed component, internal
+    from yotta.lib import component as component_module
+    # Target, , represents an installed target, internal
+    from yotta.lib import target as target_module
+
+    try:
+        with open(os.path.join(builddir, Snapshot_Fname), 'r') as f:
+            snapshot = json.load(f)
+        if snapshot.get('format', None) != Snapshot_Format:
+            return None
+        target_records = snapshot['target']
+        module_records = snapshot['modules']
+        fingerprint = _fingerprint(
+            component,
+            [x['path'] for x in target_records],
+            [x['path'] for x in module_records],
+            _invocation(target_name_and_version, additional_config, install_test_deps)
+        )
+    except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+        logger.debug('no usable resolution snapshot in %s: %s', builddir, e)
+        return None
+    if fingerprint != snapshot['fingerprint']:
+        logger.debug('resolution snapshot in %s is out of date', builddir)
+        return None
+
+    shrinkwrap = component.getShrinkwrap()
+    hierarchy = [
+        target_module.Target(
+                          x['path'],
+            installed_linked = x['installed_linked'],
+          inherit_shrinkwrap = shrinkwrap
+        ) for x in target_records
+    ]
+    if not len(hierarchy) or not all(hierarchy):
+        return None
+    application_dir = None
+    if component.isApplication():
+        application_dir = component.path
+    target, errors = target_module.derivedTargetFromHierarchy(hierarchy, application_dir, additional_config)
+    if errors:
+        return None
+
+    components = []
+    for x in module_records:
+        c = component_module.Component(
+                          x['path'],
+             test_dependency = x['test_dependency'],
+            installed_linked = x['installed_linked'],
+          inherit_shrinkwrap = shrinkwrap
+        )
+        if c and c.getName() != x['name']:
+            return None
+        components.append((x['name'], c))
+    logger.debug('using resolution snapshot in %s', builddir)
+    return DependencyGraph(component, components, target, test=True)
@@ -0,0 +1,112 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import os
+import json
+import errno
+import hashlib
+import logging
+import tempfile
+import threading
+
+# JSON Schema, pip install jsonschema, Verify JSON Schemas, MIT
+import jsonschema
+
+# folders, , where yotta stores things, internal
+from yotta.lib import folders
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+
+# Validate module and target descriptions against their JSON schemas.
+#
+# Each schema is compiled into a validator once per process, and the result
+# of validating a description is saved in the validation subdirectory of the
+# cache directory, keyed by the sha256 of the schema and of the description
+# file, so that descriptions which haven't changed (which includes every
+# module installed from the registry) are only ever validated once.
+
+Validation_Subdirectory = 'validation'
+
+logger = logging.getLogger('components')
+
+# private state
+_validators = {}
+_results = {}
+_lock = threading.Lock()
+
+
+class _CompiledSchema(object):
+    def __init__(self, schema_filename):
+        with open(schema_filename, 'rb') as f:
+            data = f.read()
+        self.sha256 = hashlib.sha256(data).hexdigest()
+        self.validator = jsonschema.Draft4Validator(json.loads(data.decode('utf-8')))
+
+def _compiled(schema_filename):
+    with _lock:
+        r = _validators.get(schema_filename, None)
+    if r is None:
+        r = _CompiledSchema(schema_filename)
+        with _lock:
+            r = _validators.setdefault(schema_filename, r)
+    return r
+
+def validator(schema_filename):
+    ''' Return the (shared) jsonschema validator for the schema file. '''
+    return _compiled(schema_filename).validator
+
+def _resultPath(key):
+    return os.path.join(folders.cacheDirectory(), Validation_Subdirectory, key[:2], key)
+
+def _readResult(key):
+    try:
+        with open(_resultPath(key), 'r') as f:
+            return [tuple(x) for x in json.load(f)]
+    except (IOError, OSError, ValueError):
+        return None
+
+def _writeResult(key, errors):
+    path = _resultPath(key)
+    dirname = os.path.dirname(path)
+    try:
+        fsutils.mkDirP(dirname)
+        fd, temp_path = tempfile.mkstemp(dir=dirname, suffix='.locked')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(errors, f)
+        try:
+            os.rename(temp_path, path)
+        except OSError as e:
+            # windows can't rename over an existing file (which will have the
+            # same contents, as it has the same key)
+            if e.errno != errno.EEXIST:
+                raise
+            fsutils.rmF(temp_path)
+    except (IOError, OSError) as e:
+        logger.debug('failed to save validation result %s: %s', key, e)
+
+def errors(schema_filename, data, obj):
+    ''' Return a list of (path, message) for each error in obj (which was
+        parsed from the bytes data) when it is validated against the schema
+        file. The path is the dot-separated path of the invalid value.
+    '''
+    compiled = _compiled(schema_filename)
+    m = hashlib.sha256()
+    m.update(compiled.sha256.encode('ascii'))
+    m.update(data)
+    key = m.hexdigest()
+    with _lock:
+        r = _results.get(key, None)
+    if r is None:
+        r = _readResult(key)
+        if r is None:
+            r = [
+                (u'.'.join([str(x) for x in error.path]), error.message)
+                for error in compiled.validator.iter_errors(obj)
+            ]
+            _writeResult(key, r)
+        with _lock:
+            _results[key] = r
+    return r
@@ -0,0 +1,101 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import os
+import errno
+import bisect
+import threading
+
+class SearchPaths(object):
+    ''' The ordered list of directories that installed modules are looked for
+        in while resolving dependencies (the yotta_modules directory of every
+        module that has been visited), indexed by the names of the things in
+        each directory.
+
+        Each directory is listed once, when it is appended, so finding the
+        candidate locations of a module doesn't depend on the number of
+        directories. Modules installed into a directory after it was appended
+        should be recorded with installed(). Anything else put there since
+        (by yotta link, a script, or another process) is still found when
+        nothing of the same name was indexed, because then all of the
+        directories are checked for it directly.
+
+        Iterating over a SearchPaths gives the directories, so it can be used
+        anywhere a list of search directories is expected.
+    '''
+    def __init__(self, directories=()):
+        self.directories = []
+        self.positions = {}
+        # {name: [sorted positions of the directories that contain name]}
+        self.index = {}
+        self.lock = threading.Lock()
+        for directory in directories:
+            self.append(directory)
+
+    def append(self, directory):
+        ''' Add a directory to be searched after all of the existing ones (a
+            directory that is already present keeps its position).
+        '''
+        with self.lock:
+            if directory in self.positions:
+                return
+        try:
+            names = os.listdir(directory)
+        except OSError as e:
+            if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                raise
+            names = []
+        with self.lock:
+            if directory in self.positions:
+                return
+            position = len(self.directories)
+            self.directories.append(directory)
+            self.positions[directory] = position
+            for name in names:
+                self.index.setdefault(name, []).append(position)
+
+    def installed(self, directory, name):
+        ''' Record that name has been installed into directory (which has no
+            effect if the directory isn't one of the search directories).
+        '''
+        with self.lock:
+            position = self.positions.get(directory, None)
+            if position is None:
+                return
+            positions = self.index.setdefault(name, [])
+            if position not in positions:
+                bisect.insort(positions, position)
+
+    def candidates(self, name):
+        ''' Return the paths where name might be installed, in the order that
+            they should be searched.
+        '''
+        with self.lock:
+            directories = list(self.directories)
+            positions = self.index.get(name, None)
+            if positions is not None:
+                positions = list(positions)
+        if positions is None:
+            positions = [
+                i for i, directory in enumerate(directories) if os.path.lexists(os.path.join(directory, name))
+            ]
+            if positions:
+                with self.lock:
+                    indexed = self.index.setdefault(name, [])
+                    for position in positions:
+                        if position not in indexed:
+                            bisect.insort(indexed, position)
+        return [os.path.join(directories[i], name) for i in positions]
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.directories))
+
+    def __len__(self):
+        return len(self.directories)
+
+    def __repr__(self):
+        return '<SearchPaths %s>' % self.directories
@@ -0,0 +1,118 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import atexit
+import logging
+import threading
+try:
+    from urlparse import urlsplit
+except ImportError:
+    from urllib.parse import urlsplit #pylint: disable=no-name-in-module,import-error
+
+# requests, apache2
+import requests
+from requests.adapters import HTTPAdapter
+
+# pool, , shared thread pool, internal
+from yotta.lib import pool
+
+# This module provides shared HTTP sessions, so that connections to the
+# registry (and other servers we download from) are kept alive and re-used
+# rather than a new TCP connection and TLS handshake being made for every
+# request.
+#
+# There is one requests.Session per scheme://host:port. The connection pool of
+# each session is sized to match the number of parallel jobs, so that all of
+# the threads in the shared pool can have a connection open at once. Sessions
+# are safe to share between threads for the way they are used here: requests
+# never share a connection at the same time, and no per-request state is
+# stored on the session itself (headers are passed with each request).
+
+# allow a few extra connections beyond the number of jobs, as the main thread
+# may also be making requests
+Extra_Connections = 2
+
+logger = logging.getLogger('access')
+
+# private state
+_sessions = {}
+_lock = threading.Lock()
+
+def _hostKey(url):
+    parts = urlsplit(url)
+    return '%s://%s' % (parts.scheme, parts.netloc)
+
+def _newSession():
+    session = requests.Session()
+    pool_size = pool.getJobs() + Extra_Connections
+    for prefix in ('http://', 'https://'):
+        session.mount(prefix, HTTPAdapter(pool_connections=4, pool_maxsize=pool_size))
+    return session
+
+def sessionFor(url):
+    ''' Return the shared requests.Session to use for requests to url. '''
+    key = _hostKey(url)
+    with _lock:
+        session = _sessions.get(key, None)
+        if session is None:
+            if not _sessions:
+                atexit.register(logStatistics)
+            session = _newSession()
+            _sessions[key] = session
+        return session
+
+def request(method, url, **kwargs):
+    ''' Make a request using the shared session for the host of url. Takes
+        the same arguments as requests.request.
+
+        Streamed responses must be read to the end or closed for their
+        connection to be re-used.
+    '''
+    return sessionFor(url).request(method, url, **kwargs)
+
+def get(url, **kwargs):
+    kwargs.setdefault('allow_redirects', True)
+    return request('GET', url, **kwargs)
+
+def head(url, **kwargs):
+    kwargs.setdefault('allow_redirects', False)
+    return request('HEAD', url, **kwargs)
+
+def put(url, **kwargs):
+    return request('PUT', url, **kwargs)
+
+def delete(url, **kwargs):
+    return request('DELETE', url, **kwargs)
+
+def statistics():
+    ''' Return a dictionary of {host: {'requests':N, 'connections':M}} for
+        each host that requests have been made to, where connections is the
+        number of new connections that were opened (so requests - connections
+        requests re-used an existing connection).
+    '''
+    with _lock:
+        sessions = list(_sessions.items())
+    r = {}
+    for key, session in sessions:
+        for adapter in set(session.adapters.values()):
+            connection_pools = adapter.poolmanager.pools
+            for pool_key in connection_pools.keys():
+                connection_pool = connection_pools.get(pool_key)
+                if connection_pool is None:
+                    continue
+                host = '%s://%s:%s' % (pool_key.key_scheme, pool_key.key_host, pool_key.key_port)
+                stats = r.setdefault(host, {'requests': 0, 'connections': 0})
+                stats['requests'] += getattr(connection_pool, 'num_requests', 0)
+                stats['connections'] += getattr(connection_pool, 'num_connections', 0)
+    return r
+
+def logStatistics():
+    for host, stats in sorted(statistics().items()):
+        logger.debug(
+            '%s: %d requests, %d connections (%d re-used)',
+            host, stats['requests'], stats['connections'],
+            max(stats['requests'] - stats['connections'], 0)
+        )
@@ -193,8 +193,17 @@ def getDerivedTarget(
                 break
     if leaf_target is None:
         return (None, errors)
-    # if we have a valid target, try to load the app-specific config data (if
-    # any):
+    derived_target, config_errors = derivedTargetFromHierarchy(
+        target_hierarchy, application_dir, additional_config
+    )
+    return (derived_target, errors + config_errors)
+
+def derivedTargetFromHierarchy(target_hierarchy, application_dir=None, additional_config=None):
+    ''' Return (DerivedTarget, errors) for a list of already loaded Targets
+        (the leaf target first, followed by each of its base targets), with
+        the application config data from application_dir (if any).
+    '''
+    errors = []
     app_config = {}
     if application_dir is not None:
         app_config_fname = os.path.join(application_dir, App_Config_File)
@@ -203,7 +212,7 @@ def getDerivedTarget(
                 app_config = ordered_json.load(app_config_fname)
             except Exception as e:
                 errors.append(Exception("Invalid application config.json: %s" % (e)))
-    return (DerivedTarget(leaf_target, target_hierarchy[1:], app_config, additional_config), errors)
+    return (DerivedTarget(target_hierarchy[0], target_hierarchy[1:], app_config, additional_config), errors)
 
 class Target(pack.Pack):
     def __init__(
@@ -232,6 +241,14 @@ class Target(pack.Pack):
             if next((x for x in inherit_shrinkwrap.get('targets', []) if x['name'] == self.getName()), None) is None:
                 logger.warning("%s missing from shrinkwrap", self.getName())
 
+    @classmethod
+    def probe(cls, path, installed_linked=False):
+        ''' Return a pack.PackHeader for the target at path if a valid Target
+            would be created for it, otherwise None, without reading anything
+            except its description.
+        '''
+        return pack.probe(path, Target_Description_File, installed_linked)
+
     def baseTargetSpec(self):
         ''' returns pack.DependencySpec for the base target of this target (or
             None if this target does not inherit from another target.
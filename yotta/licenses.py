@@ -10,6 +10,8 @@ import logging
 
 # validate, , validate things, internal
 from yotta.lib import validate
+# dependency_graph, , the resolved graph of dependencies, internal
+from yotta.lib.dependency_graph import DependencyGraph
 
 def addOptions(parser):
     parser.add_argument('--all', '-a', dest='list_all', default=False, action='store_true',
@@ -31,10 +33,7 @@ def execCommand(args, following_args):
             logging.error(error)
         return 1
 
-    dependencies = c.getDependenciesRecursive(
-                      target = target,
-        available_components = [(c.getName(), c)]
-    )
+    dependencies = DependencyGraph.resolve(c, target).components()
 
     errors = []
     if args.list_all:
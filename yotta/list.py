@@ -19,6 +19,8 @@ from yotta.lib.utils import islast
 from yotta.lib import access
 # fsutils, , misc filesystem utils, internal
 from yotta.lib import fsutils
+# dependency_graph, , the resolved graph of dependencies, internal
+from yotta.lib.dependency_graph import DependencyGraph
 # Registry Access, , access packages in the registry, internal
 from yotta.lib.registry_access import friendlyRegistryName
 # --config option, , , internal
@@ -54,19 +56,14 @@ def execCommand(args, following_args):
 
     if args.show_all:
         args.display_origin = True
-    installed_modules = c.getDependenciesRecursive(
-                      target = target,
-        available_components = [(c.getName(), c)],
-                        test = True
-    )
+    graph = DependencyGraph.resolve(c, target, test=True)
     if args.json:
-        dependency_graph = resolveDependencyGraph(target, c, installed_modules)
+        dependency_graph = resolveDependencyGraph(graph)
         print(formatDependencyGraphAsJSON(dependency_graph))
     else:
         putln(
             ComponentDepsFormatter(
-                               target = target,
-                 available_components = installed_modules,
+                                graph = graph,
                                 plain = args.plain,
                              list_all = args.show_all,
                        display_origin = args.display_origin
@@ -79,10 +76,18 @@ def formatDependencyGraphAsJSON(dep_graph):
     from yotta.lib import ordered_json
     return ordered_json.dumps(dep_graph)
 
-def resolveDependencyGraph(target, top_component, available_modules, processed=None, test=True):
+def resolveDependencyGraph(graph, name=None, processed=None):
+    ''' Describe the modules in graph (a DependencyGraph), starting from the
+        named module (the root of the graph by default), in a form suitable
+        for formatting as JSON.
+    '''
     from collections import OrderedDict
     r = OrderedDict()
 
+    if name is None:
+        name = graph.root.getName()
+    top_component = graph[name]
+
     if processed is None:
         processed = set()
 
@@ -99,40 +104,32 @@ def resolveDependencyGraph(target, top_component, available_modules, processed=N
     if top_component.is_test_dependency:
          module_description['testOnly'] = True
 
-    specs = dict([(x.name, x) for x in top_component.getDependencySpecs(target=target)])
-    deps = top_component.getDependencies(
-         available_components = available_modules,
-                       target = target,
-                         test = test,
-                     warnings = False
-    )
+    specs = dict([(x.name, x.spec) for x in graph.edges(name)])
+    deps = graph.dependencies(name)
     if not top_component:
         module_description['errors'] = [top_component.getError()]
 
     specifications = []
-    for name, dep in deps.items():
+    for dep_name in deps:
         spec_info = {
-            'name': name,
-            'version': str(specs[name].nonShrinkwrappedVersionReq()),
+            'name': dep_name,
+            'version': str(specs[dep_name].nonShrinkwrappedVersionReq()),
         }
-        if specs[name].isShrinkwrapped():
-            spec_info['shrinkwrapped'] = str(specs[name].versionReq())
-        if specs[name].is_test_dependency:
+        if specs[dep_name].isShrinkwrapped():
+            spec_info['shrinkwrapped'] = str(specs[dep_name].versionReq())
+        if specs[dep_name].is_test_dependency:
             spec_info['testOnly'] = True
         specifications.append(spec_info)
 
     if len(specifications):
         module_description['specifications'] = specifications
 
-    processed.add(top_component.getName())
+    processed.add(name)
     r['modules'].append(module_description)
 
-    if test == 'toplevel':
-        test = False
-
-    for name, dep in deps.items():
-        if not name in processed:
-            r['modules'] += resolveDependencyGraph(target, dep, available_modules, processed, test=test)['modules']
+    for dep_name in deps:
+        if not dep_name in processed:
+            r['modules'] += resolveDependencyGraph(graph, dep_name, processed)['modules']
 
     return r
 
@@ -151,15 +148,14 @@ def relpathIfSubdir(path):
         return relpath
 
 class ComponentDepsFormatter(object):
-    def __init__(self, target=None, available_components=None, list_all=False, plain=False, display_origin=False):
+    def __init__(self, graph, list_all=False, plain=False, display_origin=False):
         # don't even try to do Unicode on windows. Even if we can encode it
         # correctly, the default terminal fonts don't support Unicode
         # characters :(
         self.use_unicode = not ((os.name == 'nt') or plain)
         self.use_colours = not plain
-        self.target    = target
+        self.graph     = graph
         self.list_all  = list_all
-        self.available = available_components
         self.display_origin = display_origin
         if plain:
             self.L_Char = u' '
@@ -200,13 +196,8 @@ class ComponentDepsFormatter(object):
             DIM = BRIGHT = GREEN = RED = RESET = u''
 
         mods_path = component.modulesPath()
-        deps = component.getDependencies(
-                available_components = self.available,
-                              target = self.target,
-                                test = True,
-                            warnings = False
-        )
-        specs = dict([(x.name, x) for x in component.getDependencySpecs(target=self.target)])
+        deps = self.graph.dependencies(component.getName())
+        specs = dict([(x.name, x.spec) for x in self.graph.edges(component.getName())])
 
         def isTestOnly(name):
             return specs[name].is_test_dependency
@@ -100,6 +100,7 @@ def main():
     options.debug.addTo(parser)
     options.plain.addTo(parser)
     options.noninteractive.addTo(parser)
+    options.offline.addTo(parser)
     options.registry.addTo(parser)
     options.target.addTo(parser)
     options.config.addTo(parser)
@@ -195,6 +196,25 @@ def main():
     addParser('clean', 'clean', 'Remove files created by yotta and the build.')
     addParser('config', 'config', 'Display the target configuration info.')
     addParser('shrinkwrap', 'shrinkwrap', 'Create a yotta-shrinkwrap.json file to freeze dependency versions.')
+    addParser('mirror', 'mirror',
+        'Copy the dependencies and target of the current module into a '+
+        'directory, which can then be used as a "directory" source instead '+
+        'of the registry.',
+        'Copy dependencies into a directory source.'
+    )
+    addParser('cache', 'cache',
+        'Inspect and maintain the download cache: display statistics '+
+        '(stats), check the hashes of cached tarballs (verify), apply the '+
+        'cache size limits (gc), or download the dependencies of the current '+
+        'module into the cache without installing them (warm).',
+        'Inspect and maintain the download cache.'
+    )
+    addParser('bundle', 'bundle',
+        'Write the dependencies and targets of the current module into a '+
+        'single file (create), or install them from that file without using '+
+        'the network (install).',
+        'Install dependencies from a single file.'
+    )
 
     # short synonyms, subparser.choices is a dictionary, so use update() to
     # merge in the keys from another dictionary
@@ -244,5 +264,9 @@ def main():
     except KeyboardInterrupt:
         logging.warning('interrupted')
         status = -1
+    finally:
+        # access_common, , things shared between different component access modules, internal
+        from yotta.lib import access_common
+        access_common.saveRunStatistics()
 
     sys.exit(status or 0)
@@ -0,0 +1,54 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import logging
+import os
+
+# validate, , validate things, internal
+from yotta.lib import validate
+# dependency_graph, , the resolved graph of dependencies, internal
+from yotta.lib.dependency_graph import DependencyGraph
+# directory_source, , directories used as registries, internal
+from yotta.lib import directory_source
+
+def addOptions(parser):
+    parser.add_argument('directory',
+        help='Directory to add the modules and targets to (it is created if '+
+             'it does not exist).'
+    )
+
+def execCommand(args, following_args):
+    c = validate.currentDirectoryModule()
+    if not c:
+        return 1
+
+    if not args.target:
+        logging.error('No target has been set, use "yotta target" to set one.')
+        return 1
+
+    target, errors = c.satisfyTarget(args.target)
+    if errors:
+        for error in errors:
+            logging.error(error)
+        return 1
+
+    dependencies = DependencyGraph.resolve(c, target, test='toplevel').components()
+
+    root = os.path.abspath(os.path.expanduser(args.directory))
+    status = 0
+    added = 0
+    things = [('modules', dep) for dep in dependencies.values()] + \
+             [('targets', t) for t in target.hierarchy]
+    for namespace, thing in things:
+        if not thing:
+            logging.error('%s is missing: use `yotta install` first', thing.getName())
+            status = 1
+            continue
+        if directory_source.add(root, namespace, thing):
+            logging.info('added %s %s', thing.getName(), thing.getVersion())
+            added += 1
+    logging.info('added %d new versions to %s', added, root)
+    return status
@@ -0,0 +1,36 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library options
+from argparse import Action, ArgumentError
+
+class JobsAction(Action):
+    def __init__(self, *args, **kwargs):
+        kwargs['nargs'] = 1
+        self.dest = kwargs['dest']
+        super(JobsAction, self).__init__(*args, **kwargs)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        # pool, , shared thread pool, internal
+        from yotta.lib import pool
+        try:
+            jobs = int(values[0])
+        except ValueError:
+            raise ArgumentError(self, 'invalid number of jobs: "%s"' % values[0])
+        if jobs < 1:
+            raise ArgumentError(self, 'the number of jobs must be at least 1')
+        pool.setJobs(jobs)
+        setattr(namespace, self.dest, jobs)
+
+def addTo(parser, short_option=True):
+    # build and test only have the long form: there -j would look like the
+    # number of parallel compile jobs, which is passed to the native build
+    # tool after --
+    flags = ['-j', '--jobs'] if short_option else ['--jobs']
+    parser.add_argument(*flags, dest='jobs', default=None,
+        action=JobsAction, metavar='N',
+        help='Download and unpack up to N modules in parallel (defaults to '+
+             'the "jobs" setting, or 1).'
+    )
@@ -0,0 +1,28 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library options
+from argparse import Action
+
+class OfflineAction(Action):
+    def __init__(self, *args, **kwargs):
+        kwargs['nargs'] = 0
+        kwargs['metavar'] = None
+        self.dest = kwargs['dest']
+        super(OfflineAction, self).__init__(*args, **kwargs)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        # access_common, , things shared between different component access modules, internal
+        from yotta.lib import access_common
+        access_common.setOffline(True)
+        setattr(namespace, self.dest, True)
+
+def addTo(parser):
+    parser.add_argument('--offline', dest='offline',
+        action=OfflineAction, default=False,
+        help='Do not use the network: resolve and install modules only from '+
+             'the cache and from modules that are already installed (also '+
+             'set by the "offline" setting).'
+    )
@@ -15,6 +15,14 @@ def addOptions(parser):
 def execCommand(args, following_args):
     # validate, , validate things, internal
     from yotta.lib import validate
+    # metadata_cache, , cache registry metadata, internal
+    from yotta.lib import metadata_cache
+    # dependency_graph, , the resolved graph of dependencies, internal
+    from yotta.lib.dependency_graph import DependencyGraph
+
+    # always check with the registry for newer versions (but unchanged
+    # metadata is still not re-downloaded):
+    metadata_cache.setTTL(0)
 
     c = validate.currentDirectoryModule()
     if not c:
@@ -26,11 +34,7 @@ def execCommand(args, following_args):
             logging.error(error)
         return 1
 
-    dependencies = c.getDependenciesRecursive(
-                      target = target,
-        available_components = [(c.getName(), c)],
-                        test = True
-    )
+    dependencies = DependencyGraph.resolve(c, target, test=True).components()
     specs = c.getDependencySpecs(target = target)
     for mod in dependencies.values():
         specs += mod.getDependencySpecs(target = target)
@@ -126,7 +126,7 @@ def execCommand(args, following_args):
         success= True
         if args.type == 'both' or args.type == result['type']:
             print(formatResult(result, args.plain, short=args.short))
-    for repo in filter(lambda s: 'type' in s and s['type'] == 'registry', settings.get('sources') or []) :
+    for repo in filter(lambda s: 'type' in s and s['type'] == 'registry' and s.get('url') != registry_access.Registry_Base_URL, settings.get('sources') or []) :
         count = 0
         print('')
         print('additional results from %s:' % repo['url'])
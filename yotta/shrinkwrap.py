@@ -19,6 +19,8 @@ def execCommand(args, following_args):
     from yotta.lib.fsutils import rmF
     # list, , the yotta list subcommand, internal
     from yotta import list as yotta_list
+    # dependency_graph, , the resolved graph of dependencies, internal
+    from yotta.lib.dependency_graph import DependencyGraph
 
     # first remove any existing shrinkwrap:
     rmF('yotta-shrinkwrap.json')
@@ -36,13 +38,9 @@ def execCommand(args, following_args):
             logging.error(error)
         return 1
 
-    installed_modules = c.getDependenciesRecursive(
-                      target = target,
-        available_components = [(c.getName(), c)],
-                        test = 'toplevel'
-    )
+    graph = DependencyGraph.resolve(c, target, test='toplevel')
 
-    dependency_list = yotta_list.resolveDependencyGraph(target, c, installed_modules, test='toplevel')
+    dependency_list = yotta_list.resolveDependencyGraph(graph)
 
     errors = checkDependenciesForShrinkwrap(dependency_list)
     if len(errors):
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# Benchmark CMakeLists generation for dependency graphs of increasing size.
+#
+# Run with:
+#
+#   python -m yotta.test.benchmark_generate [module counts...]
+#
+# Each module depends on the next few modules in its group, and the
+# application depends on the first module of every group, so the work per
+# module is bounded and the generation time should grow linearly with the
+# number of modules (the time per module should stay roughly constant).
+
+# standard library modules, , ,
+from __future__ import print_function
+import sys
+import json
+import time
+import tempfile
+import logging
+
+# internal modules:
+from yotta.lib import component
+from yotta.lib import cmakegen
+from yotta.lib.dependency_graph import DependencyGraph
+from yotta.lib.fsutils import rmRf
+from yotta.test.cli import util
+
+Default_Module_Counts = (50, 100, 200, 400)
+Group_Size = 10
+Fan_Out = 3
+
+def moduleName(i):
+    return 'bench-module-%d' % i
+
+def projectFiles(module_count):
+    files = {
+        'yotta_targets/bench-target/target.json': json.dumps({
+            'name': 'bench-target', 'version': '0.0.0', 'license': 'Apache-2.0'
+        }),
+        'module.json': json.dumps({
+            'name': 'bench-app', 'version': '0.0.0', 'license': 'Apache-2.0', 'bin': './source',
+            'dependencies': dict(
+                (moduleName(i), '*') for i in range(0, module_count, Group_Size)
+            )
+        }),
+        'source/main.c': 'int main(){ return 0; }\n'
+    }
+    for i in range(module_count):
+        group_end = (i // Group_Size + 1) * Group_Size
+        deps = range(i + 1, min(i + 1 + Fan_Out, group_end, module_count))
+        name = moduleName(i)
+        files['yotta_modules/%s/module.json' % name] = json.dumps({
+            'name': name, 'version': '0.0.0', 'license': 'Apache-2.0',
+            'dependencies': dict((moduleName(d), '*') for d in deps)
+        })
+        files['yotta_modules/%s/%s/%s.h' % (name, name, name)] = '\n'
+        files['yotta_modules/%s/source/%s.c' % (name, name)] = 'int f%d(){ return 0; }\n' % i
+        files['yotta_modules/%s/test/%s.c' % (name, name)] = 'int main(){ return 0; }\n'
+    return files
+
+def timeGenerate(module_count):
+    ''' Return (resolve seconds, generate seconds) for a project with
+        module_count modules.
+    '''
+    test_dir = util.writeTestFiles(projectFiles(module_count))
+    try:
+        c = component.Component(test_dir)
+        target, errors = c.satisfyTarget('bench-target,')
+        assert(not errors)
+        start = time.time()
+        graph = DependencyGraph.resolve(c, target, test=True)
+        resolved = time.time()
+        generator = cmakegen.CMakeGen(tempfile.mkdtemp(), target)
+        generator.configure(c, graph.components())
+        for error in generator.generateRecursive(c, graph, application=c):
+            raise Exception(error)
+        generated = time.time()
+        rmRf(generator.buildroot)
+        return (resolved - start, generated - resolved)
+    finally:
+        rmRf(test_dir)
+
+def main(argv):
+    logging.basicConfig(level=logging.ERROR)
+    module_counts = [int(x) for x in argv] or Default_Module_Counts
+    print('%8s %12s %12s %16s' % ('modules', 'resolve (s)', 'generate (s)', 'generate/module (ms)'))
+    for module_count in module_counts:
+        resolve_time, generate_time = timeGenerate(module_count)
+        print('%8d %12.3f %12.3f %16.2f' % (
+            module_count, resolve_time, generate_time, 1000.0 * generate_time / module_count
+        ))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# A minimal in-process stand-in for the yotta registry, and helpers to isolate
+# the user settings (and cache) of yotta while it is used.
+
+# standard library modules, , ,
+import unittest
+import os
+import io
+import re
+import json
+import tarfile
+import hashlib
+import tempfile
+import threading
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler #pylint: disable=import-error
+    from socketserver import ThreadingMixIn #pylint: disable=import-error
+
+# internal modules:
+from yotta.lib import settings
+from yotta.lib import registry_access
+from yotta.lib import globalconf
+from yotta.lib import metadata_cache
+from yotta.lib import access_common
+from yotta.lib.fsutils import rmRf
+
+_Versions_Re = re.compile('^/(modules|targets)/([^/]+)/versions$')
+_Tarball_Re = re.compile('^/(modules|targets)/([^/]+)/versions/([^/]+)/tarball$')
+_Range_Re = re.compile('^bytes=([0-9]+)-$')
+
+def makeTarball(name, version, files):
+    ''' Return the bytes of a gzipped tarball containing a single top-level
+        directory with the files {relative path: contents}.
+    '''
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w:gz') as tf:
+        top = tarfile.TarInfo('%s-%s' % (name, version))
+        top.type = tarfile.DIRTYPE
+        top.mode = 0o755
+        tf.addfile(top)
+        for path, contents in sorted(files.items()):
+            data = contents.encode('utf-8')
+            info = tarfile.TarInfo('%s-%s/%s' % (name, version, path))
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+def moduleDescription(name, version, dependencies=None, **kwargs):
+    description = {
+        'name': name,
+        'version': version,
+        'description': 'test module %s' % name,
+        'license': 'Apache-2.0',
+        'dependencies': dependencies or {}
+    }
+    description.update(kwargs)
+    return description
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class LocalRegistry(object):
+    ''' Serve versions listings and tarballs for modules and targets published
+        with publish(). Every request is recorded in self.requests as
+        (method, path, headers).
+
+        Range requests for tarballs are supported if support_ranges is True.
+        For each number of bytes in interrupt_tarballs, a tarball response is
+        cut short (by closing the connection) after sending that many bytes.
+        If fail_status is set, every request fails with that HTTP status.
+    '''
+    def __init__(self, include_descriptions=True):
+        self.include_descriptions = include_descriptions
+        self.support_ranges = True
+        self.fail_status = None
+        self.interrupt_tarballs = []
+        # (namespace, name) -> [(version_data, tarball_bytes)]
+        self.things = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        registry = self
+        class Handler(BaseHTTPRequestHandler):
+            # keep connections alive (every response has a Content-Length)
+            protocol_version = 'HTTP/1.1'
+            def log_message(self, *args):
+                pass
+            def do_GET(self):
+                registry._handle(self, send_body=True)
+            def do_HEAD(self):
+                registry._handle(self, send_body=False)
+        self.server = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%s' % self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        if self.thread.is_alive():
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+
+    def publish(self, name, version, dependencies=None, files=None, namespace='modules', description=None):
+        if description is None:
+            description = moduleDescription(name, version, dependencies)
+        all_files = {
+            ('module.json' if namespace == 'modules' else 'target.json'): json.dumps(description)
+        }
+        all_files.update(files or {})
+        tarball = makeTarball(name, version, all_files)
+        data = {
+            'version': version,
+            'hash': {'sha256': hashlib.sha256(tarball).hexdigest()}
+        }
+        if self.include_descriptions:
+            data['description'] = description
+        self.things.setdefault((namespace, name), []).append((data, tarball))
+        return data
+
+    def requestsMatching(self, method, pattern):
+        with self.lock:
+            return [r for r in self.requests if r[0] == method and re.search(pattern, r[1])]
+
+    def _handle(self, request, send_body):
+        with self.lock:
+            self.requests.append((request.command, request.path, dict(request.headers)))
+        if self.fail_status is not None:
+            request.send_response(self.fail_status)
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+        body = None
+        m = _Versions_Re.match(request.path)
+        if m and (m.group(1), m.group(2)) in self.things:
+            body = json.dumps([d for d, t in self.things[(m.group(1), m.group(2))]]).encode('utf-8')
+            content_type = 'application/json'
+        m = _Tarball_Re.match(request.path)
+        is_tarball = False
+        if m and (m.group(1), m.group(2)) in self.things:
+            for d, t in self.things[(m.group(1), m.group(2))]:
+                if d['version'] == m.group(3):
+                    body = t
+                    content_type = 'application/octet-stream'
+                    is_tarball = True
+        if body is None:
+            request.send_response(404)
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if request.headers.get('If-None-Match', None) == etag:
+            request.send_response(304)
+            request.send_header('ETag', etag)
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+        status = 200
+        m = _Range_Re.match(request.headers.get('Range', None) or '')
+        if is_tarball and m and self.support_ranges:
+            start = int(m.group(1))
+            if start >= len(body):
+                request.send_response(416)
+                request.send_header('Content-Range', 'bytes */%d' % len(body))
+                request.send_header('Content-Length', '0')
+                request.end_headers()
+                return
+            status = 206
+            content_range = 'bytes %d-%d/%d' % (start, len(body) - 1, len(body))
+            body = body[start:]
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(body)))
+        request.send_header('ETag', etag)
+        if status == 206:
+            request.send_header('Content-Range', content_range)
+        request.end_headers()
+        if send_body:
+            with self.lock:
+                interrupt_after = self.interrupt_tarballs.pop(0) if (is_tarball and self.interrupt_tarballs) else None
+            if interrupt_after is not None:
+                request.wfile.write(body[:interrupt_after])
+                request.wfile.flush()
+                request.close_connection = True
+            else:
+                request.wfile.write(body)
+
+
+class IsolatedSettings(object):
+    ''' Context manager that points the yotta user settings (and therefore the
+        download cache) at a new temporary directory, and the public registry
+        URL at registry_url.
+    '''
+    def __init__(self, registry_url, user_settings=None):
+        self.registry_url = registry_url
+        self.user_settings = user_settings or {}
+
+    def __enter__(self):
+        self.settings_dir = tempfile.mkdtemp()
+        self.saved_env = os.environ.get('YOTTA_USER_SETTINGS_DIR', None)
+        os.environ['YOTTA_USER_SETTINGS_DIR'] = self.settings_dir
+        self.saved_config_files = settings.config_files
+        self.saved_user_config_file = settings.user_config_file
+        settings.user_config_file = os.path.join(self.settings_dir, 'config.json')
+        settings.config_files = [settings.user_config_file]
+        with open(settings.user_config_file, 'w') as f:
+            json.dump(self.user_settings, f)
+        settings.parser = None
+        self.saved_registry_url = registry_access.Registry_Base_URL
+        registry_access.Registry_Base_URL = self.registry_url
+        globalconf.set('interactive', False)
+        return self
+
+    def __exit__(self, type, value, traceback):
+        registry_access.Registry_Base_URL = self.saved_registry_url
+        settings.config_files = self.saved_config_files
+        settings.user_config_file = self.saved_user_config_file
+        settings.parser = None
+        if self.saved_env is None:
+            del os.environ['YOTTA_USER_SETTINGS_DIR']
+        else:
+            os.environ['YOTTA_USER_SETTINGS_DIR'] = self.saved_env
+        rmRf(self.settings_dir)
+
+
+class LocalRegistryTestCase(unittest.TestCase):
+    ''' Base class for tests that use a LocalRegistry: each test starts with a
+        new registry (self.registry), an empty temporary directory
+        (self.work_dir), and nothing remembered in memory from the registry
+        requests or offline mode of earlier tests.
+    '''
+    def setUp(self):
+        metadata_cache._memory.clear()
+        self.registry = LocalRegistry()
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.registry.stop()
+        metadata_cache._memory.clear()
+        access_common._offline = None
+        rmRf(self.work_dir)
+
+    def isolatedSettings(self, user_settings=None):
+        return IsolatedSettings(self.registry.url, user_settings)
+
+    def moduleDirectory(self, name, dependencies=None):
+        ''' Create a directory in self.work_dir containing the module.json of
+            a module that has dependencies, and return its path.
+        '''
+        path = os.path.join(self.work_dir, name)
+        os.mkdir(path)
+        with open(os.path.join(path, 'module.json'), 'w') as f:
+            json.dump(moduleDescription(name, '0.0.1', dependencies), f)
+        return path
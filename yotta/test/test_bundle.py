@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import argparse
+import json
+import os
+
+# internal modules:
+from yotta import bundle
+from yotta.lib import component
+from yotta.lib import access_common
+from yotta.test.local_registry import LocalRegistryTestCase, moduleDescription
+
+def _targetDescription(name, version, inherits=None):
+    description = moduleDescription(name, version, similarTo=[name])
+    del description['dependencies']
+    if inherits:
+        description['inherits'] = inherits
+    return description
+
+class TestBundle(LocalRegistryTestCase):
+    def setUp(self):
+        super(TestBundle, self).setUp()
+        self.registry.publish('test-bundle-a', '1.0.0', {'test-bundle-b': '^1.0.0'})
+        self.registry.publish('test-bundle-b', '1.0.0')
+        self.registry.publish('test-bundle-b', '1.1.0')
+        self.registry.publish('test-bundle-base', '1.0.0', namespace='targets',
+            description=_targetDescription('test-bundle-base', '1.0.0')
+        )
+        self.registry.publish('test-bundle-target', '1.0.0', namespace='targets',
+            description=_targetDescription('test-bundle-target', '1.0.0', {'test-bundle-base': '*'})
+        )
+        self.bundle_path = os.path.join(self.work_dir, 'deps.bundle')
+
+    def args(self, **kwargs):
+        args = argparse.Namespace(target='test-bundle-target', config=None, path=self.bundle_path)
+        args.__dict__.update(kwargs)
+        return args
+
+    def installed(self, path):
+        r = []
+        for subdir in ('yotta_modules', 'yotta_targets'):
+            for name in sorted(os.listdir(os.path.join(path, subdir))):
+                with open(os.path.join(path, subdir, name, 'module.json' if subdir == 'yotta_modules' else 'target.json')) as f:
+                    r.append((name, json.load(f)['version']))
+        return r
+
+    def test_createAndInstall(self):
+        with self.isolatedSettings():
+            created_in = self.moduleDirectory('created', {'test-bundle-a': '*'})
+            c = component.Component(created_in)
+            self.assertEqual(bundle.createBundle(self.args(targets=[], install_test_deps='own'), c), 0)
+            self.assertTrue(os.path.isfile(self.bundle_path))
+        # install with an empty cache, and without the registry:
+        self.registry.stop()
+        with self.isolatedSettings():
+            installed_in = self.moduleDirectory('installed', {'test-bundle-a': '*'})
+            c = component.Component(installed_in)
+            self.assertEqual(bundle.installBundle(self.args(), c), 0)
+            self.assertFalse(access_common.isOffline())
+        self.assertEqual(self.installed(installed_in), self.installed(created_in))
+        self.assertEqual(self.installed(installed_in), [
+            ('test-bundle-a', '1.0.0'), ('test-bundle-b', '1.1.0'),
+            ('test-bundle-base', '1.0.0'), ('test-bundle-target', '1.0.0')
+        ])
+
+    def test_missingTarget(self):
+        with self.isolatedSettings():
+            c = component.Component(self.moduleDirectory('created', {'test-bundle-a': '*'}))
+            self.assertEqual(bundle.createBundle(self.args(targets=[], install_test_deps='own'), c), 0)
+            c = component.Component(self.moduleDirectory('installed', {'test-bundle-a': '*'}))
+            self.assertEqual(bundle.installBundle(self.args(target='test-bundle-base'), c), 1)
+            self.assertFalse(os.path.exists(os.path.join(c.path, 'yotta_modules')))
+
+if __name__ == '__main__':
+    unittest.main()
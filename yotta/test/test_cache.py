@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import threading
+import time
+import hashlib
+import stat
+import json
+import os
+import io
+
+# internal modules:
+from yotta.lib import access_common
+from yotta.lib import module_store
+from yotta.lib import cache_index
+from yotta.lib import settings
+from yotta.lib import folders
+from yotta.test.local_registry import LocalRegistryTestCase, makeTarball, moduleDescription
+
+class BytesStream(object):
+    ''' stand-in for a streaming requests response '''
+    def __init__(self, data):
+        self.f = io.BytesIO(data)
+
+    def iter_content(self, chunk_size):
+        return iter(lambda: self.f.read(chunk_size), b'')
+
+def tarballFor(name, version, scripts=None):
+    description = moduleDescription(name, version)
+    if scripts:
+        description['scripts'] = scripts
+    return makeTarball(name, version, {
+        'module.json': json.dumps(description),
+        'source/a.c': 'int a(){ return 1; }\n'
+    })
+
+class TestCache(LocalRegistryTestCase):
+    def unpack(self, data, name, cache=True):
+        key = hashlib.sha256(data).hexdigest()
+        into = os.path.join(self.work_dir, 'yotta_modules', name)
+        access_common.unpackTarballStream(
+            BytesStream(data), into, hash={'sha256': key}, cache_key=key if cache else None
+        )
+        return key, into
+
+    def test_treeLinked(self):
+        with self.isolatedSettings({'linkFromCache': True}):
+            data = tarballFor('test-cache-a', '1.0.0')
+            key, into = self.unpack(data, 'test-cache-a')
+            tree = access_common._treePath(key)
+            self.assertTrue(os.path.isdir(tree))
+            for d in (into, os.path.join(self.work_dir, 'again')):
+                access_common.unpackFromCache(key, d)
+                installed = os.path.join(d, 'source', 'a.c')
+                self.assertEqual(os.stat(installed).st_ino, os.stat(os.path.join(tree, 'source', 'a.c')).st_ino)
+                self.assertTrue(os.path.isfile(os.path.join(d, '.yotta_origin.json')))
+            # the shared tree must not be writable
+            self.assertFalse(os.stat(os.path.join(tree, 'source', 'a.c')).st_mode & stat.S_IWUSR)
+            # removing the cache entry removes the tree:
+            access_common.removeFromCache(key)
+            self.assertFalse(os.path.exists(tree))
+            self.assertRaises(access_common.NotInCache, access_common.unpackFromCache, key, into)
+
+    def test_treeCopiedByDefault(self):
+        with self.isolatedSettings():
+            data = tarballFor('test-cache-n', '1.0.0')
+            key, into = self.unpack(data, 'test-cache-n')
+            access_common.unpackFromCache(key, into)
+            installed = os.path.join(into, 'source', 'a.c')
+            tree_file = os.path.join(access_common._treePath(key), 'source', 'a.c')
+            self.assertNotEqual(os.stat(installed).st_ino, os.stat(tree_file).st_ino)
+            # editing the installed copy doesn't change the cache
+            with open(installed, 'w') as f:
+                f.write('modified\n')
+            with open(tree_file, 'r') as f:
+                self.assertEqual(f.read(), 'int a(){ return 1; }\n')
+
+    def test_postInstallCopied(self):
+        with self.isolatedSettings({'linkFromCache': True}):
+            data = tarballFor('test-cache-b', '1.0.0', scripts={'postInstall': ['true']})
+            key, into = self.unpack(data, 'test-cache-b')
+            installed = os.path.join(into, 'source', 'a.c')
+            tree_file = os.path.join(access_common._treePath(key), 'source', 'a.c')
+            self.assertNotEqual(os.stat(installed).st_ino, os.stat(tree_file).st_ino)
+            self.assertTrue(os.stat(installed).st_mode & stat.S_IWUSR)
+
+    def test_uncached(self):
+        with self.isolatedSettings():
+            data = tarballFor('test-cache-c', '1.0.0')
+            key, into = self.unpack(data, 'test-cache-c', cache=False)
+            self.assertTrue(os.path.isfile(os.path.join(into, 'source', 'a.c')))
+            self.assertFalse(os.path.exists(access_common._treePath(key)))
+            self.assertFalse(access_common.isInCache(key))
+
+    def test_extractedWhileDownloading(self):
+        with self.isolatedSettings():
+            data = tarballFor('test-cache-l', '1.0.0')
+            extract = access_common._extractTarball
+            def notExtracted(*args):
+                raise AssertionError('tarball extracted from disk')
+            access_common._extractTarball = notExtracted
+            try:
+                key, into = self.unpack(data, 'test-cache-l')
+            finally:
+                access_common._extractTarball = extract
+            self.assertTrue(os.path.isfile(os.path.join(into, 'source', 'a.c')))
+            with open(access_common.cachedTarballPath(key), 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+    def test_hashFailureRolledBack(self):
+        with self.isolatedSettings():
+            data = tarballFor('test-cache-m', '1.0.0')
+            key = hashlib.sha256(b'something else').hexdigest()
+            into = os.path.join(self.work_dir, 'yotta_modules', 'test-cache-m')
+            for cache_key in (key, None):
+                self.assertRaises(
+                    Exception, access_common.unpackTarballStream,
+                    BytesStream(data), into, hash={'sha256': key}, cache_key=cache_key
+                )
+                self.assertFalse(os.path.exists(into))
+                self.assertFalse(access_common.isInCache(key))
+                cache_dir = folders.cacheDirectory()
+                self.assertEqual([f for f in os.listdir(cache_dir) if f.endswith('.locked')], [])
+                trees_dir = os.path.join(cache_dir, access_common.Trees_Subdirectory)
+                self.assertEqual(os.listdir(trees_dir) if os.path.isdir(trees_dir) else [], [])
+            self.assertEqual(os.listdir(os.path.dirname(into)), [])
+
+    def evictAfterUse(self, policy, uses):
+        with self.isolatedSettings({'cacheEvictionPolicy': policy}):
+            keys = {}
+            for name in ('test-cache-f', 'test-cache-g'):
+                keys[name], into = self.unpack(tarballFor(name, '1.0.0'), name)
+            for name in uses:
+                access_common.unpackFromCache(keys[name], os.path.join(self.work_dir, 'again', name))
+            entry_size = max(e.totalSize() for e in cache_index.entries())
+            settings.set('maxCacheBytes', int(entry_size * 2.5))
+            keys['test-cache-h'], into = self.unpack(tarballFor('test-cache-h', '1.0.0'), 'test-cache-h')
+            self.assertEqual(len(cache_index.entries()), 2)
+            return sorted(n for n, k in keys.items() if access_common.isInCache(k))
+
+    def test_evictLeastRecentlyUsed(self):
+        self.assertEqual(self.evictAfterUse('lru', ['test-cache-g', 'test-cache-g', 'test-cache-f']), ['test-cache-f', 'test-cache-h'])
+
+    def test_evictLeastFrequentlyUsed(self):
+        self.assertEqual(self.evictAfterUse('lfu', ['test-cache-g', 'test-cache-g', 'test-cache-f']), ['test-cache-g', 'test-cache-h'])
+
+    def test_indexRebuilt(self):
+        with self.isolatedSettings():
+            key, into = self.unpack(tarballFor('test-cache-i', '1.0.0'), 'test-cache-i')
+            path = access_common.cachedTarballPath(key)
+            self.assertEqual(os.path.basename(os.path.dirname(path)), key[:2])
+            # move the tarball to where older versions of yotta kept it, and
+            # remove the index:
+            legacy_path = os.path.join(folders.cacheDirectory(), key)
+            os.rename(path, legacy_path)
+            os.rename(path + '.json', legacy_path + '.json')
+            os.remove(cache_index.indexPath())
+            self.assertEqual([e.key for e in cache_index.entries()], [key])
+            self.assertTrue(access_common.isInCache(key))
+            self.assertFalse(os.path.exists(legacy_path))
+            self.assertEqual([k for k, origin in access_common.cachedOrigins()], [key])
+
+    def test_concurrentFetch(self):
+        with self.isolatedSettings():
+            data = tarballFor('test-cache-j', '1.0.0')
+            key = hashlib.sha256(data).hexdigest()
+            fetched = []
+            errors = []
+            def install(into):
+                def fetch():
+                    fetched.append(into)
+                    # give the other threads time to start waiting:
+                    time.sleep(0.2)
+                    access_common.unpackTarballStream(BytesStream(data), into, hash={'sha256': key}, cache_key=key)
+                try:
+                    access_common.unpackFromCacheOrFetch(key, into, fetch)
+                except Exception as e:
+                    errors.append(e)
+            dirs = [os.path.join(self.work_dir, str(i), 'test-cache-j') for i in range(8)]
+            threads = [threading.Thread(target=install, args=(d,)) for d in dirs]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(errors, [])
+            self.assertEqual(len(fetched), 1)
+            for d in dirs:
+                self.assertTrue(os.path.isfile(os.path.join(d, 'source', 'a.c')))
+
+    def test_inUseNotRemoved(self):
+        with self.isolatedSettings():
+            key, into = self.unpack(tarballFor('test-cache-k', '1.0.0'), 'test-cache-k')
+            locked = threading.Event()
+            done = threading.Event()
+            def use():
+                with access_common.cacheLock(key, shared=True):
+                    locked.set()
+                    done.wait()
+            t = threading.Thread(target=use)
+            t.start()
+            locked.wait()
+            try:
+                access_common.removeFromCache(key)
+                self.assertTrue(access_common.isInCache(key))
+            finally:
+                done.set()
+                t.join()
+            access_common.removeFromCache(key)
+            self.assertFalse(access_common.isInCache(key))
+
+    def test_sharedLockNotUpgraded(self):
+        with self.isolatedSettings():
+            key, into = self.unpack(tarballFor('test-cache-o', '1.0.0'), 'test-cache-o')
+            with access_common.cacheLock(key, shared=True):
+                self.assertFalse(access_common.cacheLock(key).acquire(blocking=False))
+                self.assertRaises(RuntimeError, access_common.cacheLock(key).acquire)
+                # so removing an entry in use by this thread leaves it alone
+                access_common.removeFromCache(key)
+                self.assertTrue(access_common.isInCache(key))
+                with access_common.cacheLock(key, shared=True):
+                    pass
+            # an exclusive lock covers shared use:
+            with access_common.cacheLock(key):
+                with access_common.cacheLock(key, shared=True):
+                    pass
+
+    def test_moduleStore(self):
+        with self.isolatedSettings({'moduleStore': True}):
+            data = tarballFor('test-cache-d', '1.0.0')
+            key, into = self.unpack(data, 'test-cache-d')
+            other = os.path.join(self.work_dir, 'other', 'yotta_modules', 'test-cache-d')
+            access_common.unpackFromCache(key, other)
+            for d in (into, other):
+                self.assertTrue(module_store.isStoreLink(d))
+                self.assertFalse(module_store.isUserLink(d))
+                self.assertTrue(os.path.isfile(os.path.join(d, '.yotta_origin.json')))
+            self.assertEqual(os.path.realpath(into), os.path.realpath(other))
+            # removing the cache entry must not break installed modules:
+            access_common.removeFromCache(key)
+            self.assertTrue(os.path.isfile(os.path.join(into, 'source', 'a.c')))
+            # replacing the installed module must not modify the store:
+            access_common.unpackTarballStream(BytesStream(data), into, hash={'sha256': key}, cache_key=None)
+            self.assertFalse(module_store.isStoreLink(into))
+            self.assertTrue(os.path.isfile(os.path.join(other, 'source', 'a.c')))
+
+    def test_moduleStorePostInstallCopied(self):
+        with self.isolatedSettings({'moduleStore': True}):
+            data = tarballFor('test-cache-e', '1.0.0', scripts={'postInstall': ['true']})
+            key, into = self.unpack(data, 'test-cache-e')
+            self.assertFalse(os.path.islink(into))
+            self.assertTrue(os.path.isfile(os.path.join(into, 'source', 'a.c')))
+
+if __name__ == '__main__':
+    unittest.main()
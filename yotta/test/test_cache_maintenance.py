@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import hashlib
+import os
+
+# internal modules:
+from yotta.lib import access_common
+from yotta.lib import cache_maintenance
+from yotta.lib import folders
+from yotta.test.local_registry import LocalRegistryTestCase
+from yotta.test.test_cache import BytesStream, tarballFor
+
+class TestCacheMaintenance(LocalRegistryTestCase):
+    def setUp(self):
+        super(TestCacheMaintenance, self).setUp()
+        self.saved_statistics = dict(access_common._run_statistics)
+        for k in access_common._run_statistics:
+            access_common._run_statistics[k] = 0
+
+    def tearDown(self):
+        access_common._run_statistics.update(self.saved_statistics)
+        super(TestCacheMaintenance, self).tearDown()
+
+    def install(self, name):
+        data = tarballFor(name, '1.0.0')
+        key = hashlib.sha256(data).hexdigest()
+        into = os.path.join(self.work_dir, 'yotta_modules', name)
+        access_common.unpackFromCacheOrFetch(key, into, lambda: access_common.unpackTarballStream(
+            BytesStream(data), into, hash={'sha256': key}, cache_key=key, origin_info={'url': name}
+        ))
+        return key, data
+
+    def test_stats(self):
+        with self.isolatedSettings():
+            key, data = self.install('test-maint-a')
+            self.install('test-maint-a')
+            self.install('test-maint-a')
+            self.assertEqual(access_common.runStatistics(), {'hits': 2, 'misses': 1, 'downloaded_bytes': len(data)})
+            access_common.saveRunStatistics()
+            stats = cache_maintenance.statistics()
+            self.assertEqual(stats['entries'], 1)
+            self.assertTrue(stats['bytes'] > len(data))
+            self.assertEqual(len(stats['runs']), 1)
+            self.assertAlmostEqual(stats['hit_rate'], 2.0 / 3)
+            self.assertEqual([e.key for e in stats['largest']], [key])
+            self.assertEqual(cache_maintenance.describe(key), 'test-maint-a')
+
+    def test_verify(self):
+        with self.isolatedSettings():
+            good, data = self.install('test-maint-b')
+            bad, data = self.install('test-maint-c')
+            path = access_common.cachedTarballPath(bad)
+            os.chmod(path, 0o644)
+            with open(path, 'ab') as f:
+                f.write(b'corruption')
+            results = cache_maintenance.verify()
+            self.assertEqual(results['ok'], [good])
+            self.assertEqual(results['corrupt'], [bad])
+            self.assertTrue(access_common.isInCache(bad))
+            cache_maintenance.verify(repair=True)
+            self.assertFalse(access_common.isInCache(bad))
+            self.assertEqual(cache_maintenance.verify()['ok'], [good])
+
+    def test_gc(self):
+        with self.isolatedSettings():
+            key, data = self.install('test-maint-d')
+            stale = os.path.join(folders.cacheDirectory(), 'tmpstale.locked')
+            fresh = os.path.join(folders.cacheDirectory(), 'tmpfresh.locked')
+            for path in (stale, fresh):
+                with open(path, 'w') as f:
+                    f.write('x')
+            os.utime(stale, (0, 0))
+            orphan = access_common._treePath('0' * 64)
+            os.mkdir(orphan)
+            removed = cache_maintenance.collectGarbage()
+            self.assertEqual(removed, {'evicted': 0, 'temporary': 1, 'trees': 1, 'partial': 0, 'validation': 0})
+            self.assertFalse(os.path.exists(stale))
+            self.assertTrue(os.path.exists(fresh))
+            self.assertFalse(os.path.exists(orphan))
+            self.assertTrue(os.path.isdir(access_common._treePath(key)))
+
+if __name__ == '__main__':
+    unittest.main()
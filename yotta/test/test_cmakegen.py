@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import os
+import json
+import time
+
+# internal modules:
+from yotta.lib import component
+from yotta.lib import cmakegen
+from yotta.lib.dependency_graph import DependencyGraph
+from yotta.lib.fsutils import rmRf
+from yotta.test.cli import util
+from yotta.test.benchmark_generate import projectFiles, moduleName
+
+class RecordingCMakeGen(cmakegen.CMakeGen):
+    def __init__(self, directory, target):
+        super(RecordingCMakeGen, self).__init__(directory, target)
+        self.generated = []
+
+    def generate(self, builddir, modbuilddir, component, *args, **kwargs):
+        self.generated.append(component.getName())
+        return super(RecordingCMakeGen, self).generate(builddir, modbuilddir, component, *args, **kwargs)
+
+class TestIncrementalGeneration(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = util.writeTestFiles(projectFiles(6))
+        self.builddir = os.path.join(self.test_dir, 'build', 'bench-target')
+        # directories modified in the last couple of seconds are always
+        # walked again, so make everything older than that:
+        long_ago = time.time() - 60
+        for root, dirs, files in os.walk(self.test_dir):
+            os.utime(root, (long_ago, long_ago))
+
+    def tearDown(self):
+        rmRf(self.test_dir)
+
+    def generate(self):
+        c = component.Component(self.test_dir)
+        target, errors = c.satisfyTarget('bench-target,')
+        self.assertFalse(errors)
+        graph = DependencyGraph.resolve(c, target, test=True)
+        generator = RecordingCMakeGen(self.builddir, target)
+        generator.configure(c, graph.components())
+        self.assertEqual(list(generator.generateRecursive(c, graph, application=c)), [])
+        return sorted(generator.generated)
+
+    def modulePath(self, i, *path):
+        return os.path.join(self.test_dir, 'yotta_modules', moduleName(i), *path)
+
+    def test_unchanged(self):
+        self.assertEqual(len(self.generate()), 7)
+        # the top-level module is always generated, because its build files
+        # include the time of the build
+        self.assertEqual(self.generate(), ['bench-app'])
+
+    def test_sourceAdded(self):
+        self.generate()
+        with open(self.modulePath(2, 'source', 'added.c'), 'w') as f:
+            f.write('int added(){ return 0; }\n')
+        self.assertEqual(self.generate(), ['bench-app', moduleName(2)])
+        with open(os.path.join(self.builddir, 'ym', moduleName(2), 'source', 'CMakeLists.txt')) as f:
+            self.assertIn('added.c', f.read())
+
+    def test_descriptionChanged(self):
+        self.generate()
+        with open(self.modulePath(3, 'module.json'), 'r') as f:
+            description = json.load(f)
+        description['extraIncludes'] = ['source']
+        with open(self.modulePath(3, 'module.json'), 'w') as f:
+            json.dump(description, f)
+        # the modules that depend on module 3 (directly or indirectly) include
+        # its extra include directory too:
+        self.assertEqual(
+            self.generate(),
+            ['bench-app'] + [moduleName(i) for i in range(4)]
+        )
+
+    def test_recentlyModified(self):
+        self.generate()
+        # a module modified just before (or while) it was generated is
+        # generated again, in case it was modified again within the
+        # resolution of the filesystem's clock:
+        with open(self.modulePath(2, 'source', 'added.c'), 'w') as f:
+            f.write('int added(){ return 0; }\n')
+        self.generate()
+        self.assertEqual(self.generate(), ['bench-app', moduleName(2)])
+
+    def test_generatedFileRemoved(self):
+        self.generate()
+        os.remove(os.path.join(self.builddir, 'ym', moduleName(4), 'CMakeLists.txt'))
+        self.assertEqual(self.generate(), ['bench-app', moduleName(4)])
+
+    def test_manifestRemoved(self):
+        self.generate()
+        os.remove(os.path.join(self.builddir, cmakegen.Generation_Manifest_Fname))
+        self.assertEqual(len(self.generate()), 7)
+
+if __name__ == '__main__':
+    unittest.main()
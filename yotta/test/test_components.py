@@ -11,6 +11,9 @@ import logging
 import tempfile
 
 from yotta.lib import component
+from yotta.lib import access
+from yotta.lib import pack
+from yotta.lib import version
 from yotta.lib.fsutils import rmRf
 
 test_json = '''{
@@ -99,5 +102,51 @@ class ComponentTestCase(unittest.TestCase):
         test_deps = c.getDependencies(test=True)
         self.assertEqual(list(test_deps.keys()), test_deps_in_order)
 
+    def test_sharedDirectoryState(self):
+        with open(os.path.join(self.test_dir, 'module.json'), 'w') as f:
+            f.write(test_json)
+
+        a = component.Component(self.test_dir, test_dependency=True)
+        b = component.Component(self.test_dir)
+        # what's read from the directory is only read once, but per-use
+        # state isn't shared:
+        self.assertTrue(a.getShrinkwrap() is None)
+        self.assertTrue(pack._loadDirectory(a.path, 'module.json', None) is pack._loadDirectory(b.path, 'module.json', None))
+        self.assertTrue(a.isTestDependency())
+        self.assertFalse(b.isTestDependency())
+        a.setVersion(version.Version('1.0.0'))
+        a.getVersion().bump('major')
+        self.assertEqual(str(b.getVersion()), '0.0.7')
+        self.assertEqual(b.description['version'], '0.0.7')
+
+        # writing the description replaces what was cached:
+        a.writeDescription()
+        self.assertEqual(str(component.Component(self.test_dir).getVersion()), '1.0.0')
+
+    def test_modifiedDescriptionReloaded(self):
+        with open(os.path.join(self.test_dir, 'module.json'), 'w') as f:
+            f.write(test_json)
+        self.assertEqual(str(component.Component(self.test_dir).getVersion()), '0.0.7')
+        with open(os.path.join(self.test_dir, 'module.json'), 'w') as f:
+            f.write(test_json.replace('0.0.7', '0.0.10'))
+        self.assertEqual(str(component.Component(self.test_dir).getVersion()), '0.0.10')
+
+    def test_probe(self):
+        for v in ('1.0.0', '2.0.0'):
+            os.makedirs(os.path.join(self.test_dir, v, 'something'))
+            with open(os.path.join(self.test_dir, v, 'something', 'module.json'), 'w') as f:
+                f.write(test_json.replace('0.0.7', v))
+        header = component.Component.probe(os.path.join(self.test_dir, '1.0.0', 'something'))
+        self.assertEqual((header.getName(), str(header.getVersion())), ('something', '1.0.0'))
+        self.assertEqual(component.Component.probe(self.test_dir), None)
+
+        # only the directory that is chosen is fully read:
+        found = access.searchPathsFor(
+            'something', version.Spec('^2.0.0'), [os.path.join(self.test_dir, v) for v in ('1.0.0', '2.0.0')]
+        )
+        self.assertEqual(str(found.getVersion()), '2.0.0')
+        self.assertFalse(os.path.realpath(os.path.join(self.test_dir, '1.0.0', 'something')) in pack._directory_cache)
+        self.assertTrue(found.path in pack._directory_cache)
+
 if __name__ == '__main__':
     unittest.main()
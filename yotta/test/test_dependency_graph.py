@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import json
+import os
+
+# internal modules:
+from yotta.lib import validate
+from yotta.lib.dependency_graph import DependencyGraph
+from yotta.test.cli import util
+
+def moduleJSON(name, dependencies=None, **kwargs):
+    description = {'name': name, 'version': '0.0.0', 'license': 'Apache-2.0'}
+    description['dependencies'] = dependencies or {}
+    description.update(kwargs)
+    return json.dumps(description)
+
+Test_Graph = {
+'module.json': moduleJSON(
+    'testapp', {'dep-a': '*', 'dep-b': '*'},
+    testDependencies = {'dep-t': '*'},
+    targetDependencies = {'foo': {'dep-cond': '*'}}
+),
+'yotta_modules/dep-a/module.json': moduleJSON('dep-a', {'dep-c': '*'}),
+'yotta_modules/dep-b/module.json': moduleJSON('dep-b', {'dep-c': '*'}, testDependencies={'dep-u': '*'}),
+# dep-a and dep-c depend on each other:
+'yotta_modules/dep-c/module.json': moduleJSON('dep-c', {'dep-a': '*'}),
+'yotta_modules/dep-cond/module.json': moduleJSON('dep-cond'),
+# test dependencies of test dependencies are never followed:
+'yotta_modules/dep-t/module.json': moduleJSON('dep-t', testDependencies={'dep-x': '*'}),
+'yotta_targets/foo/target.json': '''{
+  "name": "foo",
+  "version": "0.0.0",
+  "license": "Apache-2.0",
+  "config": { "foo": { "a": 123 } }
+}'''
+}
+
+class TestDependencyGraph(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.restore_cwd = os.getcwd()
+        cls.test_dir = util.writeTestFiles(Test_Graph)
+        os.chdir(cls.test_dir)
+        cls.c = validate.currentDirectoryModule()
+        cls.target, errors = cls.c.satisfyTarget('foo,')
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.restore_cwd)
+        util.rmRf(cls.test_dir)
+
+    def test_edges(self):
+        graph = DependencyGraph.resolve(self.c, self.target, test=True)
+        self.assertEqual(
+            [(e.name, e.kind) for e in graph.edges('testapp')],
+            [('dep-a', 'normal'), ('dep-b', 'normal'), ('dep-cond', 'target'), ('dep-t', 'test')]
+        )
+        self.assertEqual(list(graph.dependencies('dep-b').keys()), ['dep-c', 'dep-u'])
+        self.assertFalse(graph['dep-u'])
+        self.assertEqual(list(graph.dependencies('dep-b', available_only=True).keys()), ['dep-c'])
+        self.assertEqual(graph.edges('dep-t'), ())
+        self.assertEqual(graph.dependents('dep-c'), ('dep-a', 'dep-b'))
+        self.assertEqual(graph.dependents('testapp'), ())
+
+    def test_sameAsRecursiveDependencies(self):
+        for test in (True, False, 'toplevel'):
+            graph = DependencyGraph.resolve(self.c, self.target, test=test)
+            components = self.c.getDependenciesRecursive(
+                              target = self.target,
+                available_components = [(self.c.getName(), self.c)],
+                                test = test
+            )
+            self.assertEqual(list(graph.components().keys()), list(components.keys()))
+        graph = DependencyGraph.resolve(self.c, self.target, test=False)
+        self.assertFalse('dep-t' in graph)
+        self.assertTrue('dep-cond' in graph)
+        graph = DependencyGraph.resolve(self.c, self.target, test='toplevel')
+        self.assertTrue('dep-t' in graph)
+        self.assertFalse('dep-u' in graph)
+
+    def test_orderAndCycles(self):
+        graph = DependencyGraph.resolve(self.c, self.target, test=True)
+        self.assertEqual(graph.cycles(), (('dep-a', 'dep-c'),))
+        order = graph.topologicalOrder()
+        self.assertEqual(sorted(order), sorted(graph))
+        self.assertEqual(order[-1], 'testapp')
+        for name in graph:
+            for dep in graph.dependencies(name):
+                if (name, dep) not in (('dep-a', 'dep-c'), ('dep-c', 'dep-a')):
+                    self.assertTrue(order.index(dep) < order.index(name))
+
+    def test_transitiveClosure(self):
+        graph = DependencyGraph.resolve(self.c, self.target, test=True)
+        self.assertEqual(graph.transitiveClosure('dep-b'), frozenset(['dep-a', 'dep-c', 'dep-u']))
+        # members of a cycle depend on themselves:
+        self.assertEqual(graph.transitiveClosure('dep-a'), frozenset(['dep-a', 'dep-c']))
+        self.assertEqual(graph.transitiveClosure('dep-cond'), frozenset())
+        self.assertEqual(graph.transitiveClosure('testapp'), frozenset(graph.components().keys()))
+        self.assertEqual(list(graph.recursiveDependencies('dep-b', available_only=True).keys()), ['dep-c', 'dep-a'])
+
+    def test_recursiveDependenciesOrder(self):
+        graph = DependencyGraph.resolve(self.c, self.target, test=True)
+        for name in graph:
+            components = graph[name].getDependenciesRecursive(
+                available_components = graph.components(),
+                              target = self.target,
+                      available_only = True,
+                                test = True
+            )
+            self.assertEqual(
+                list(graph.recursiveDependencies(name, available_only=True).keys()),
+                list(components.keys())
+            )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import os
+
+# internal modules:
+from yotta.lib import component
+from yotta.lib import directory_source
+from yotta.lib import metadata_cache
+from yotta.lib import folders
+from yotta.lib.fsutils import rmRf
+from yotta.test.local_registry import LocalRegistryTestCase
+
+class TestDirectorySource(LocalRegistryTestCase):
+    def setUp(self):
+        super(TestDirectorySource, self).setUp()
+        self.registry.publish('test-dir-a', '1.0.0', {'test-dir-b': '^1.0.0'})
+        self.registry.publish('test-dir-b', '1.0.0')
+        self.registry.publish('test-dir-b', '1.1.0')
+        self.test_dir = self.moduleDirectory('test-dir-top', {'test-dir-a': '*'})
+        self.mirror_dir = os.path.join(self.work_dir, 'mirror')
+
+    def install(self):
+        c = component.Component(self.test_dir)
+        components, errors = c.satisfyDependenciesRecursive(
+            available_components = [(c.getName(), c)]
+        )
+        return [(n, str(m.getVersion())) for n, m in components.items() if m], errors, components
+
+    def mirrorAndClear(self, components):
+        for dep in components.values():
+            self.assertTrue(directory_source.add(self.mirror_dir, 'modules', dep))
+            self.assertFalse(directory_source.add(self.mirror_dir, 'modules', dep))
+        rmRf(os.path.join(self.test_dir, 'yotta_modules'))
+        rmRf(folders.cacheDirectory())
+        metadata_cache._memory.clear()
+
+    def mirrorSettings(self):
+        return {'sources': [
+            {'type': 'directory', 'path': self.mirror_dir, 'policy': 'authoritative'},
+            {'type': 'registry', 'url': self.registry.url, 'policy': 'fallback-only'}
+        ]}
+
+    def test_installFromDirectory(self):
+        with self.isolatedSettings():
+            online, errors, components = self.install()
+            self.assertEqual(errors, [])
+            self.mirrorAndClear(components)
+        with self.isolatedSettings(self.mirrorSettings()):
+            request_count = len(self.registry.requests)
+            installed, errors, components = self.install()
+            self.assertEqual((installed, errors), (online, []))
+            self.assertEqual(len(self.registry.requests), request_count)
+
+    def test_generatedTarball(self):
+        with self.isolatedSettings():
+            online, errors, components = self.install()
+            # without the cached tarballs, new ones are generated:
+            rmRf(folders.cacheDirectory())
+            self.mirrorAndClear(components)
+        with self.isolatedSettings(self.mirrorSettings()):
+            installed, errors, components = self.install()
+            self.assertEqual((installed, errors), (online, []))
+
+    def test_hashChecked(self):
+        with self.isolatedSettings():
+            online, errors, components = self.install()
+            self.mirrorAndClear(components)
+        tarball = os.path.join(
+            directory_source.versionsDirectory(self.mirror_dir, 'modules', 'test-dir-a'), '1.0.0', 'tarball'
+        )
+        with open(tarball, 'ab') as f:
+            f.write(b'corrupted')
+        with self.isolatedSettings(self.mirrorSettings()):
+            self.assertRaises(Exception, self.install)
+            self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'yotta_modules', 'test-dir-a')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,10 +8,13 @@
 # standard library modules, , ,
 import unittest
 import os
+from pathlib import PurePath
 
 # internal modules:
 from yotta.lib.detect import systemDefaultTarget
 from yotta.lib import component
+from yotta.lib import pack
+from yotta.lib import ignores
 from yotta.test.cli import cli
 from yotta.test.cli import util
 
@@ -193,6 +196,61 @@ class TestPackIgnores(unittest.TestCase):
         self.assertEqual(statuscode, 0)
         return stdout or stderr
 
+def referenceIgnores(patterns, path):
+    # how ignores were tested before they were compiled:
+    test_path = PurePath('/', path)
+    test_paths = tuple([test_path] + list(test_path.parents))
+    for exp in patterns:
+        for tp in test_paths:
+            if tp.match(exp):
+                return True
+    return False
+
+class TestIgnoreMatcher(unittest.TestCase):
+    def test_sameAsPathMatch(self):
+        patterns = pack.Default_Publish_Ignore + [
+            '/moo', 'b/c/d', 'b/c/*.txt', '/a/b/test.txt', 'b/*.c', '*/top',
+            '/test/foo', 'sometest/a', 'x/*/z', '/*/y', '[ab]?', '/', 'q/..',
+            'build/', './test', '*.o/', 'somedir/', './a/./b/', '.'
+        ]
+        paths = [
+            '', '.', 'moo', 'moo/x.c', 'a/moo', 'a/b/c/d', 'a/b/c/d/e', 'b/c/d',
+            'b/c/x.txt', 'b/c/e/x.txt', 'a/b/test.txt', 'x/a/b/test.txt',
+            'b/x.c', 'a/b/x.c', 'top', 'a/top', 'test/foo/a.c', 'a/test/foo',
+            'sometest/a/b', 'x/1/z', 'x/z', 'x/1/2/z', 'a/y', 'a/b/y', 'ab',
+            'c/ab/d', 'abc', 'q/../r', 'source/.DS_Store', 'build', 'a/build',
+            'yotta_modules/x', 'src/yotta_modules', 'a.swp', 'dir/.a.swo',
+            'upload.tar.gz', 'a/upload.tar.bz', './a//b/./c.c', 'build/foo.c',
+            'test/a.c', 'x.o', 'a/x.o/y', 'somedir/a/b.c', 'a/b/c.c'
+        ]
+        def outcome(ignores, path):
+            try:
+                return ignores(path)
+            except ValueError:
+                return ValueError
+        for patterns_used in (
+                patterns, [p for p in patterns if p not in ('/', '.')],
+                [p for p in patterns if p != '/'], ['*.c'], ['.'], []
+            ):
+            matcher = ignores.IgnoreMatcher(patterns_used)
+            for path in paths:
+                self.assertEqual(
+                    outcome(matcher.ignores, path),
+                    outcome(lambda p: referenceIgnores(patterns_used, p), path),
+                    '%s with %s' % (path, patterns_used)
+                )
+
+    def test_walkPrunesIgnored(self):
+        test_dir = util.writeTestFiles(Test_Files)
+        try:
+            c = component.Component(test_dir)
+            walked = [os.path.relpath(root, test_dir) for root, dirs, files in c.walk(os.path.join(test_dir, 'source'))]
+            self.assertIn(os.path.join('source', 'a', 'b', 'c'), walked)
+            self.assertNotIn(os.path.join('source', 'a', 'b', 'c', 'd'), walked)
+            self.assertEqual(list(c.walk(os.path.join(test_dir, 'test', 'foo'))), [])
+        finally:
+            util.rmRf(test_dir)
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+
+# internal modules:
+from yotta.lib import component
+from yotta.lib import install_plan
+from yotta.test.local_registry import LocalRegistryTestCase
+
+class TestInstallPlan(LocalRegistryTestCase):
+    def setUp(self):
+        super(TestInstallPlan, self).setUp()
+        self.registry.publish('test-plan-a', '1.0.0', {'test-plan-b': '^1.0.0', 'test-plan-c': '*'})
+        self.registry.publish('test-plan-b', '1.0.0')
+        self.registry.publish('test-plan-b', '1.2.0', {'test-plan-c': '^2.0.0'})
+        self.registry.publish('test-plan-b', '2.0.0')
+        self.registry.publish('test-plan-c', '2.0.1')
+        self.test_dir = self.moduleDirectory('test-plan-top', {'test-plan-a': '*'})
+
+    def test_resolveWithoutDownloading(self):
+        with self.isolatedSettings():
+            c = component.Component(self.test_dir)
+            plan = install_plan.resolve(c)
+            self.assertEqual(plan.errors, [])
+            self.assertEqual(
+                [(m.getName(), str(m.getVersion().version)) for m in plan.toFetch()],
+                [('test-plan-a', '1.0.0'), ('test-plan-b', '1.2.0'), ('test-plan-c', '2.0.1')]
+            )
+            self.assertEqual(plan.unresolved(), [])
+            self.assertEqual(self.registry.requestsMatching('GET', '/tarball$'), [])
+            sizes = dict((m.getName(), size) for m, size in plan.downloadSizes())
+            self.assertTrue(all(sizes.values()))
+            self.assertEqual(self.registry.requestsMatching('GET', '/tarball$'), [])
+
+    def test_fetchMatchesSatisfy(self):
+        with self.isolatedSettings():
+            c = component.Component(self.test_dir)
+            self.assertEqual(install_plan.fetchAll(c), 3)
+            self.assertEqual(len(self.registry.requestsMatching('GET', '/tarball$')), 3)
+            components, errors = component.Component(self.test_dir).satisfyDependenciesRecursive(
+                available_components = [(c.getName(), c)]
+            )
+            self.assertEqual(errors, [])
+            self.assertEqual(
+                [(n, str(m.getVersion())) for n, m in components.items()],
+                [('test-plan-a', '1.0.0'), ('test-plan-b', '1.2.0'), ('test-plan-c', '2.0.1')]
+            )
+            # nothing more should have been downloaded:
+            self.assertEqual(len(self.registry.requestsMatching('GET', '/tarball$')), 3)
+
+    def test_resolveInRoundsWithoutDescriptions(self):
+        self.registry.include_descriptions = False
+        for things in self.registry.things.values():
+            for data, tarball in things:
+                del data['description']
+        with self.isolatedSettings():
+            c = component.Component(self.test_dir)
+            plan = install_plan.resolve(c)
+            self.assertEqual([m.getName() for m in plan.unresolved()], ['test-plan-a'])
+            self.assertEqual(install_plan.fetchAll(c), 3)
+            self.assertEqual(install_plan.resolve(c).toFetch(), [])
+
+if __name__ == '__main__':
+    unittest.main()
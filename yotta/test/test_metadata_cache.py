@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import threading
+
+# internal modules:
+from yotta.lib import registry_access
+from yotta.lib import metadata_cache
+from yotta.test.local_registry import LocalRegistryTestCase
+
+def _newProcess():
+    # forget everything that has been cached in memory, as if a new yotta
+    # process was starting
+    metadata_cache._memory.clear()
+    metadata_cache._ttl = None
+
+class TestMetadataCache(LocalRegistryTestCase):
+    def setUp(self):
+        super(TestMetadataCache, self).setUp()
+        self.registry.publish('test-cache-a', '1.0.0')
+        self.registry.publish('test-cache-a', '1.1.0')
+        metadata_cache._ttl = None
+
+    def tearDown(self):
+        super(TestMetadataCache, self).tearDown()
+        metadata_cache._ttl = None
+
+    def versionsRequests(self):
+        return self.registry.requestsMatching('GET', '/modules/test-cache-a/versions$')
+
+    def test_sameProcessRequestsOnce(self):
+        with self.isolatedSettings():
+            for x in range(3):
+                versions = registry_access._listVersions('modules', 'test-cache-a')
+                self.assertEqual([str(v.version) for v in versions], ['1.0.0', '1.1.0'])
+            self.assertEqual(len(self.versionsRequests()), 1)
+
+    def test_freshFromDisk(self):
+        with self.isolatedSettings():
+            registry_access._listVersions('modules', 'test-cache-a')
+            _newProcess()
+            versions = registry_access._listVersions('modules', 'test-cache-a')
+            self.assertEqual([str(v.version) for v in versions], ['1.0.0', '1.1.0'])
+            self.assertEqual(len(self.versionsRequests()), 1)
+
+    def test_revalidate(self):
+        with self.isolatedSettings({'metadataCacheTTL': 0}):
+            registry_access._listVersions('modules', 'test-cache-a')
+            _newProcess()
+            versions = registry_access._listVersions('modules', 'test-cache-a')
+            self.assertEqual([str(v.version) for v in versions], ['1.0.0', '1.1.0'])
+            requests = self.versionsRequests()
+            self.assertEqual(len(requests), 2)
+            self.assertTrue('If-None-Match' in requests[1][2])
+            # after a change the new listing is fetched:
+            self.registry.publish('test-cache-a', '1.2.0')
+            _newProcess()
+            versions = registry_access._listVersions('modules', 'test-cache-a')
+            self.assertEqual([str(v.version) for v in versions], ['1.0.0', '1.1.0', '1.2.0'])
+
+    def test_notSharedBetweenIdentities(self):
+        with self.isolatedSettings():
+            registry_access._listVersions('modules', 'test-cache-a')
+            # a listing requested with another user's credentials isn't used
+            registry_access._clearAuthCache()
+            registry_access._generateAndSaveKeys(self.registry.url)
+            _newProcess()
+            registry_access._listVersions('modules', 'test-cache-a')
+            self.assertEqual(len(self.versionsRequests()), 2)
+
+    def test_concurrentRequestsMerged(self):
+        with self.isolatedSettings():
+            url = self.registry.url + '/modules/test-cache-a/versions'
+            results = []
+            def fetch():
+                results.append(metadata_cache.get(url).text)
+            threads = [threading.Thread(target=fetch) for x in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(len(results), 8)
+            self.assertEqual(len(set(results)), 1)
+            self.assertEqual(len(self.versionsRequests()), 1)
+
+if __name__ == '__main__':
+    unittest.main()
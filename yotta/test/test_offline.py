@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import os
+
+# internal modules:
+from yotta.lib import component
+from yotta.lib import access_common
+from yotta.lib import metadata_cache
+from yotta.lib import folders
+from yotta.lib.fsutils import rmRf
+from yotta.test.local_registry import LocalRegistryTestCase
+
+class TestOffline(LocalRegistryTestCase):
+    def setUp(self):
+        super(TestOffline, self).setUp()
+        self.registry.publish('test-offline-a', '1.0.0', {'test-offline-b': '^1.0.0'})
+        self.registry.publish('test-offline-b', '1.0.0')
+        self.registry.publish('test-offline-b', '1.1.0')
+        self.test_dir = self.moduleDirectory('test-offline-top', {'test-offline-a': '*'})
+
+    def install(self):
+        c = component.Component(self.test_dir)
+        components, errors = c.satisfyDependenciesRecursive(
+            available_components = [(c.getName(), c)]
+        )
+        return [(n, str(m.getVersion())) for n, m in components.items() if m], errors
+
+    def installOnlineThenGoOffline(self):
+        installed, errors = self.install()
+        self.assertEqual(errors, [])
+        rmRf(os.path.join(self.test_dir, 'yotta_modules'))
+        metadata_cache._memory.clear()
+        access_common.setOffline(True)
+        return installed
+
+    def test_installFromCache(self):
+        with self.isolatedSettings():
+            online = self.installOnlineThenGoOffline()
+            request_count = len(self.registry.requests)
+            self.assertEqual(self.install(), (online, []))
+            self.assertEqual(len(self.registry.requests), request_count)
+
+    def test_installFromCachedTarballs(self):
+        with self.isolatedSettings():
+            online = self.installOnlineThenGoOffline()
+            rmRf(os.path.join(folders.cacheDirectory(), metadata_cache.Metadata_Subdirectory))
+            request_count = len(self.registry.requests)
+            self.assertEqual(self.install(), (online, []))
+            self.assertEqual(len(self.registry.requests), request_count)
+
+    def test_missingReported(self):
+        with self.isolatedSettings({'offline': True}):
+            installed, errors = self.install()
+            self.assertEqual(installed, [])
+            offline_errors = [e for e in errors if isinstance(e, access_common.OfflineUnavailable)]
+            self.assertEqual(len(offline_errors), 1)
+            self.assertTrue('test-offline-a' in str(offline_errors[0]))
+            self.assertEqual(self.registry.requests, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import threading
+import argparse
+import time
+
+# internal modules:
+from yotta.lib import pool
+
+class TestPool(unittest.TestCase):
+    def setUp(self):
+        self.restore_jobs = pool._jobs
+
+    def tearDown(self):
+        pool._jobs = self.restore_jobs
+
+    def test_serialByDefault(self):
+        pool._jobs = None
+        threads = set()
+        def fn(x):
+            threads.add(threading.current_thread())
+            return x * 2
+        self.assertEqual(pool.map(fn, range(10)), [x * 2 for x in range(10)])
+        self.assertEqual(threads, set([threading.current_thread()]))
+
+    def test_orderPreserved(self):
+        pool.setJobs(4)
+        def fn(x):
+            # finish in the reverse order to the order of submission
+            time.sleep(0.01 * (5 - x))
+            return x
+        self.assertEqual(pool.map(fn, range(5)), list(range(5)))
+
+    def test_nestedMapIsSerial(self):
+        pool.setJobs(2)
+        def inner(x):
+            return x + 1
+        def outer(x):
+            return pool.map(inner, [x, x])
+        # with two threads, nested maps that waited on the pool would
+        # deadlock:
+        self.assertEqual(pool.map(outer, range(4)), [[x+1, x+1] for x in range(4)])
+
+    def test_invalidJobsSetting(self):
+        pool._jobs = None
+        import os
+        os.environ['YOTTA_JOBS'] = 'lots'
+        try:
+            self.assertEqual(pool.getJobs(), pool.Default_Jobs)
+        finally:
+            del os.environ['YOTTA_JOBS']
+
+    def test_jobsOption(self):
+        # build and test (which install missing dependencies) accept --jobs
+        from yotta import build
+        from yotta import test_subcommand
+        for jobs, module in enumerate((build, test_subcommand), 2):
+            parser = argparse.ArgumentParser()
+            module.addOptions(parser)
+            self.assertEqual(parser.parse_args(['--jobs', str(jobs)]).jobs, jobs)
+            self.assertEqual(pool.getJobs(), jobs)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+
+# internal modules:
+from yotta.lib import registry_access
+from yotta.test.local_registry import IsolatedSettings
+
+class TestRegistryAuth(unittest.TestCase):
+    def setUp(self):
+        registry_access._clearAuthCache()
+        self.signed = []
+        self.original_generate = registry_access._generateJWTToken
+        def countingGenerate(private_key, registry=None):
+            r = self.original_generate(private_key, registry)
+            self.signed.append(r)
+            return r
+        registry_access._generateJWTToken = countingGenerate
+
+    def tearDown(self):
+        registry_access._generateJWTToken = self.original_generate
+        registry_access._clearAuthCache()
+
+    def test_tokenReused(self):
+        with IsolatedSettings('http://localhost:1'):
+            h1 = registry_access._headersForRegistry(None)
+            h2 = registry_access._headersForRegistry(None)
+            self.assertEqual(h1, h2)
+            self.assertEqual(len(self.signed), 1)
+            # modifying the returned headers must not affect later requests
+            h1['X-Something'] = 'x'
+            self.assertFalse('X-Something' in registry_access._headersForRegistry(None))
+            self.assertEqual(len(self.signed), 1)
+
+    def test_tokenRefreshedBeforeExpiry(self):
+        with IsolatedSettings('http://localhost:1'):
+            registry_access._headersForRegistry(None)
+            for k, (token, expires) in list(registry_access._tokens.items()):
+                registry_access._tokens[k] = (token, expires - registry_access._Token_Lifetime.total_seconds())
+            registry_access._headersForRegistry(None)
+            self.assertEqual(len(self.signed), 2)
+
+    def test_keyChangeInvalidatesToken(self):
+        with IsolatedSettings('http://localhost:1'):
+            h1 = registry_access._headersForRegistry(None)
+            registry_access.deauthorize()
+            h2 = registry_access._headersForRegistry(None)
+            self.assertNotEqual(h1['Authorization'], h2['Authorization'])
+            self.assertEqual(len(self.signed), 2)
+
+if __name__ == '__main__':
+    unittest.main()
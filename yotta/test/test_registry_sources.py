@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+
+# requests, apache2
+import requests
+
+# internal modules:
+from yotta.lib import registry_access
+from yotta.lib import access_common
+from yotta.test.local_registry import LocalRegistry, LocalRegistryTestCase
+
+class TestRegistrySources(LocalRegistryTestCase):
+    def setUp(self):
+        super(TestRegistrySources, self).setUp()
+        self.public = self.registry
+        self.public.publish('test-sources-a', '1.0.0')
+        self.public.publish('test-sources-a', '2.0.0')
+        self.public.publish('test-sources-b', '1.0.0')
+        self.mirror = LocalRegistry()
+        self.mirror.publish('test-sources-a', '1.0.0')
+        self.mirror.publish('test-sources-a', '1.5.0')
+
+    def tearDown(self):
+        self.mirror.stop()
+        super(TestRegistrySources, self).tearDown()
+
+    def settingsWithPolicies(self, mirror_policy=None, public_policy=None):
+        sources = [{'type': 'registry', 'url': self.mirror.url}]
+        if mirror_policy:
+            sources[0]['policy'] = mirror_policy
+        if public_policy:
+            sources.append({'type': 'registry', 'url': self.public.url, 'policy': public_policy})
+        return self.isolatedSettings({'sources': sources})
+
+    def listVersions(self, name):
+        return [
+            (str(v.version), v.url.split('/modules/')[0]) for v in registry_access._listVersions('modules', name)
+        ]
+
+    def test_merged(self):
+        with self.settingsWithPolicies():
+            self.assertEqual(self.listVersions('test-sources-a'), [
+                ('1.0.0', self.mirror.url), ('1.5.0', self.mirror.url), ('2.0.0', self.public.url)
+            ])
+            self.assertEqual(self.listVersions('test-sources-b'), [('1.0.0', self.public.url)])
+
+    def test_authoritative(self):
+        with self.settingsWithPolicies('authoritative'):
+            self.assertEqual(self.listVersions('test-sources-a'), [
+                ('1.0.0', self.mirror.url), ('1.5.0', self.mirror.url)
+            ])
+            self.assertEqual(self.listVersions('test-sources-b'), [('1.0.0', self.public.url)])
+
+    def test_fallbackOnly(self):
+        with self.settingsWithPolicies('authoritative', 'fallback-only'):
+            self.assertEqual(self.listVersions('test-sources-a'), [
+                ('1.0.0', self.mirror.url), ('1.5.0', self.mirror.url)
+            ])
+            self.assertEqual(self.public.requestsMatching('GET', 'test-sources-a'), [])
+            self.assertEqual(self.listVersions('test-sources-b'), [('1.0.0', self.public.url)])
+            self.assertRaises(access_common.Unavailable, self.listVersions, 'test-sources-c')
+
+    def test_otherSourceFails(self):
+        self.public.fail_status = 503
+        with self.settingsWithPolicies('authoritative'):
+            # the public registry isn't needed for modules the mirror has
+            self.assertEqual(self.listVersions('test-sources-a'), [
+                ('1.0.0', self.mirror.url), ('1.5.0', self.mirror.url)
+            ])
+            self.assertEqual(self.public.requestsMatching('GET', 'test-sources-a'), [])
+            # but its errors are still reported for modules it would provide
+            self.assertRaises(requests.exceptions.HTTPError, self.listVersions, 'test-sources-b')
+
+if __name__ == '__main__':
+    unittest.main()
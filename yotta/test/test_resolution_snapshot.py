@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import os
+
+# internal modules:
+from yotta.lib import validate
+from yotta.lib import resolution_snapshot
+from yotta.lib.dependency_graph import DependencyGraph
+from yotta.lib.fsutils import mkDirP, rmRf
+from yotta.test.cli import util
+from yotta.test.test_dependency_graph import Test_Graph
+
+class TestResolutionSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.restore_cwd = os.getcwd()
+        self.test_dir = util.writeTestFiles(Test_Graph)
+        self.builddir = os.path.join(self.test_dir, 'build', 'foo')
+        os.chdir(self.test_dir)
+        self.c = validate.currentDirectoryModule()
+        target, errors = self.c.satisfyTarget('foo,')
+        self.graph = DependencyGraph.resolve(self.c, target, test=True)
+        resolution_snapshot.save(self.builddir, self.c, self.graph, 'foo,', None, 'own')
+
+    def tearDown(self):
+        os.chdir(self.restore_cwd)
+        rmRf(self.test_dir)
+
+    def load(self, additional_config=None):
+        return resolution_snapshot.load(self.builddir, validate.currentDirectoryModule(), 'foo,', additional_config, 'own')
+
+    def test_unchanged(self):
+        graph = self.load()
+        self.assertTrue(graph is not None)
+        self.assertEqual(graph.target.getName(), 'foo')
+        self.assertEqual(
+            [(name, c.path, c.isTestDependency(), bool(c)) for name, c in graph.components().items()],
+            [(name, c.path, c.isTestDependency(), bool(c)) for name, c in self.graph.components().items()]
+        )
+        self.assertEqual(graph.cycles(), self.graph.cycles())
+
+    def test_invocationChanged(self):
+        self.assertTrue(self.load({'foo': {'a': 1}}) is None)
+        self.assertTrue(resolution_snapshot.load(self.builddir, self.c, 'foo,', None, 'all') is None)
+
+    def test_moduleChanged(self):
+        with open(os.path.join(self.test_dir, 'yotta_modules', 'dep-cond', 'module.json'), 'a') as f:
+            f.write('\n')
+        self.assertTrue(self.load() is None)
+
+    def test_moduleInstalled(self):
+        # installing the missing test dependency of dep-b changes what would
+        # be resolved:
+        mkDirP(os.path.join(self.test_dir, 'yotta_modules', 'dep-u'))
+        self.assertTrue(self.load() is None)
+
+    def test_moduleRemoved(self):
+        rmRf(os.path.join(self.test_dir, 'yotta_modules', 'dep-cond'))
+        self.assertTrue(self.load() is None)
+
+    def test_discard(self):
+        resolution_snapshot.discard(self.builddir)
+        self.assertTrue(self.load() is None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import binascii
+import os
+
+# internal modules:
+from yotta.lib import registry_access
+from yotta.lib import access_common
+from yotta.lib import folders
+from yotta.test.local_registry import LocalRegistryTestCase
+
+class TestResumableDownload(LocalRegistryTestCase):
+    def setUp(self):
+        super(TestResumableDownload, self).setUp()
+        # (random contents, so that the tarball is too big to be sent at once)
+        data = binascii.hexlify(os.urandom(256 * 1024)).decode('ascii')
+        self.version = self.registry.publish('test-resume-a', '1.0.0', files={'source/data.c': data})
+        self.url = '%s/modules/test-resume-a/versions/1.0.0/tarball' % self.registry.url
+        self.into = os.path.join(self.work_dir, 'test-resume-a')
+
+    def download(self):
+        registry_access._getTarball(self.url, self.into, self.version['hash']['sha256'])
+        self.assertTrue(os.path.isfile(os.path.join(self.into, 'source', 'data.c')))
+        self.assertTrue(access_common.isInCache(self.version['hash']['sha256']))
+        self.assertEqual(
+            [f for f in os.listdir(folders.cacheDirectory()) if f.endswith(access_common.Partial_Suffix)], []
+        )
+        return [r[2].get('Range', None) for r in self.registry.requestsMatching('GET', '/tarball$')]
+
+    def test_resumed(self):
+        self.registry.interrupt_tarballs = [150000]
+        with self.isolatedSettings():
+            ranges = self.download()
+        self.assertEqual(len(ranges), 2)
+        self.assertEqual(ranges[0], None)
+        self.assertTrue(ranges[1].startswith('bytes='))
+        self.assertTrue(int(ranges[1][len('bytes='):-1]) > 0)
+
+    def test_restartedWithoutRangeSupport(self):
+        self.registry.support_ranges = False
+        self.registry.interrupt_tarballs = [150000]
+        with self.isolatedSettings():
+            ranges = self.download()
+        self.assertEqual(len(ranges), 2)
+
+if __name__ == '__main__':
+    unittest.main()
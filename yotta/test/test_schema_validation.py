@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import json
+import os
+
+# internal modules:
+from yotta.lib import schema_validation
+from yotta.lib import component
+from yotta.lib import folders
+from yotta.lib import ordered_json
+from yotta.test.local_registry import IsolatedSettings
+
+class TestSchemaValidation(unittest.TestCase):
+    def setUp(self):
+        schema_validation._results.clear()
+
+    def tearDown(self):
+        schema_validation._results.clear()
+
+    def validate(self, description):
+        data = json.dumps(description).encode('utf-8')
+        return schema_validation.errors(component.Schema_File, data, ordered_json.loads(data.decode('utf-8')))
+
+    def test_compiledOnce(self):
+        self.assertTrue(
+            schema_validation.validator(component.Schema_File) is schema_validation.validator(component.Schema_File)
+        )
+
+    def test_resultSaved(self):
+        description = {'name': 'test-schema-a', 'version': '1.0.0', 'dependencies': 'invalid'}
+        with IsolatedSettings('http://localhost:1'):
+            errors = self.validate(description)
+            self.assertTrue('dependencies' in [e[0] for e in errors])
+            self.assertTrue(os.path.isdir(os.path.join(folders.cacheDirectory(), schema_validation.Validation_Subdirectory)))
+            # in a new process, the saved result is used instead of validating:
+            schema_validation._results.clear()
+            compiled = schema_validation._compiled(component.Schema_File)
+            saved_validator = compiled.validator
+            compiled.validator = None
+            try:
+                self.assertEqual(self.validate(description), errors)
+            finally:
+                compiled.validator = saved_validator
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+import tempfile
+import os
+
+# internal modules:
+from yotta.lib.search_paths import SearchPaths
+from yotta.lib.fsutils import rmRf, mkDirP
+
+class TestSearchPaths(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.dirs = [os.path.join(self.test_dir, d) for d in ('a', 'b', 'c')]
+        for d, names in zip(self.dirs, (['x', 'y'], ['y'], [])):
+            mkDirP(d)
+            for name in names:
+                mkDirP(os.path.join(d, name))
+
+    def tearDown(self):
+        rmRf(self.test_dir)
+
+    def test_precedence(self):
+        paths = SearchPaths(self.dirs)
+        # directories that don't exist (yet) are allowed:
+        paths.append(os.path.join(self.test_dir, 'missing'))
+        paths.append(self.dirs[0])
+        self.assertEqual(list(paths), self.dirs + [os.path.join(self.test_dir, 'missing')])
+        self.assertEqual(paths.candidates('y'), [os.path.join(d, 'y') for d in self.dirs[:2]])
+        self.assertEqual(paths.candidates('x'), [os.path.join(self.dirs[0], 'x')])
+        self.assertEqual(paths.candidates('z'), [])
+
+    def test_installed(self):
+        paths = SearchPaths(self.dirs)
+        paths.installed(self.dirs[2], 'x')
+        paths.installed(self.dirs[1], 'x')
+        paths.installed(os.path.join(self.test_dir, 'elsewhere'), 'x')
+        self.assertEqual(paths.candidates('x'), [os.path.join(d, 'x') for d in self.dirs])
+
+    def test_addedElsewhere(self):
+        paths = SearchPaths(self.dirs)
+        # added without installed() being called (for example by yotta link)
+        mkDirP(os.path.join(self.dirs[2], 'z'))
+        mkDirP(os.path.join(self.dirs[1], 'z'))
+        self.assertEqual(paths.candidates('z'), [os.path.join(d, 'z') for d in self.dirs[1:]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import unittest
+
+# internal modules:
+from yotta.lib import sessions
+from yotta.lib import pool
+from yotta.test.local_registry import LocalRegistryTestCase
+
+class TestSessions(LocalRegistryTestCase):
+    def setUp(self):
+        super(TestSessions, self).setUp()
+        self.registry.publish('test-sessions-a', '1.0.0')
+
+    def hostStatistics(self):
+        port = self.registry.url.split(':')[-1]
+        return sessions.statistics()['http://127.0.0.1:%s' % port]
+
+    def test_connectionReused(self):
+        url = self.registry.url + '/modules/test-sessions-a/versions'
+        self.assertTrue(sessions.sessionFor(url) is sessions.sessionFor(self.registry.url + '/'))
+        for x in range(5):
+            self.assertEqual(sessions.get(url).status_code, 200)
+        stats = self.hostStatistics()
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['connections'], 1)
+
+    def test_parallelRequests(self):
+        url = self.registry.url + '/modules/test-sessions-a/versions/1.0.0/tarball'
+        restore_jobs = pool._jobs
+        pool.setJobs(4)
+        try:
+            results = pool.map(lambda x: len(sessions.get(url, stream=True).content), range(16))
+        finally:
+            pool._jobs = restore_jobs
+        self.assertEqual(len(set(results)), 1)
+        stats = self.hostStatistics()
+        self.assertEqual(stats['requests'], 16)
+        self.assertTrue(stats['connections'] <= 4 + sessions.Extra_Connections)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,12 +16,15 @@ from yotta.lib import target
 from yotta.lib import fsutils
 # build, , build subcommand, internal
 from yotta import build
+# dependency_graph, , the resolved graph of dependencies, internal
+from yotta.lib.dependency_graph import DependencyGraph
 # --config option, , , internal
 from yotta import options
 
 
 def addOptions(parser):
     options.config.addTo(parser)
+    options.jobs.addTo(parser, short_option=False)
     parser.add_argument(
         "--list", '-l', dest='list_only', default=False, action='store_true',
         help='List the tests that would be run, but don\'t run them. Implies --no-build'
@@ -95,6 +98,7 @@ def execCommand(args, following_args):
         args.tests.remove('all')
 
     returncode = 0
+    graph = None
     if args.build and not args.list_only:
         # we need to build before testing, make sure that any tests needed are
         # built:
@@ -111,25 +115,27 @@ def execCommand(args, following_args):
             return 1
         else:
             returncode = build_status['status']
+            # re-use the dependencies resolved for the build
+            graph = build_status.get('graph', None)
 
     cwd = os.getcwd()
 
-    c = validate.currentDirectoryModule()
-    if not c:
-        return 1
+    if graph is None:
+        c = validate.currentDirectoryModule()
+        if not c:
+            return 1
 
-    target, errors = c.satisfyTarget(args.target, additional_config=args.config)
-    if errors:
-        for error in errors:
-            logging.error(error)
-        return 1
+        target, errors = c.satisfyTarget(args.target, additional_config=args.config)
+        if errors:
+            for error in errors:
+                logging.error(error)
+            return 1
 
-    all_modules = c.getDependenciesRecursive(
-                      target = target,
-        available_components = [(c.getName(), c)],
-                        test = True
-    )
+        graph = DependencyGraph.resolve(c, target, test=True)
 
+    c = graph.root
+    target = graph.target
+    all_modules = graph.components()
 
     builddir = os.path.join(cwd, 'build', target.getName())
 
@@ -8,11 +8,14 @@ import logging
 
 # validate, , validate things, internal
 from yotta.lib import validate
+# dependency_graph, , the resolved graph of dependencies, internal
+from yotta.lib.dependency_graph import DependencyGraph
 # --config option, , , internal
 from yotta import options
 
 def addOptions(parser):
     options.config.addTo(parser)
+    options.jobs.addTo(parser)
     parser.add_argument('component', default=None, nargs='?',
         help='If specified, update (and if necessary install) this module '+
              'instead of updating the dependencies of the current module.'
@@ -27,6 +30,11 @@ def addOptions(parser):
     )
 
 def execCommand(args, following_args):
+    # metadata_cache, , cache registry metadata, internal
+    from yotta.lib import metadata_cache
+    # always check with the registry for newer versions when updating (but
+    # unchanged metadata is still not re-downloaded):
+    metadata_cache.setTTL(0)
     c = validate.currentDirectoryModule()
     if not c:
         return 1
@@ -74,27 +82,19 @@ def updateComponent(c, target, args):
         'none': False
     }[args.update_test_deps]
 
-    dependencies = c.getDependenciesRecursive(
-                      target = target,
-        available_components = [(c.getName(), c)],
-                        test = update_test_deps
-    )
-    if not args.component in dependencies:
+    graph = DependencyGraph.resolve(c, target, test=update_test_deps)
+    if not args.component in graph.components():
         logging.error('%s is not a dependency of this module. Maybe you meant to "yotta install" it?', args.component)
         return 1
-    #if not dependencies[args.component]:
-    #    logging.error('%s is not valid: %s', args.component, dependencies[args.component].getError())
+    #if not graph[args.component]:
+    #    logging.error('%s is not valid: %s', args.component, graph[args.component].getError())
     #    return 1
 
-    update_dependencies = dependencies[args.component].getDependenciesRecursive(
-                      target = target,
-        available_components = [(c.getName(), c)] + list(dependencies.items()),
-                        test = update_test_deps
-    )
+    update_dependencies = graph.transitiveClosure(args.component)
 
     components, errors = c.satisfyDependenciesRecursive(
                       target = target,
-            update_installed = set(list(update_dependencies.keys()) + [args.component]),
+            update_installed = set(update_dependencies) | set([args.component]),
               traverse_links = args.update_linked,
         available_components = [(c.getName(), c)],
                         test = update_test_deps